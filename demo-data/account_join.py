@@ -0,0 +1,435 @@
+"""
+Сквозное соединение биллинга, CRM и ЛК по лицевому счёту (ЛС-…).
+Источники хранят счета по-разному: в CRM они склеены через ';' в account_numbers,
+в биллинге — строка на счёт x период, в ЛК — один необязательный account_number.
+Результат — одна широкая запись на счёт:
+  CRM     — клиент, которому принадлежит счёт (первая строка CRM, если счёт
+            заявлен несколькими строками, crm_claims > 1);
+  биллинг — начислено/оплачено за все периоды, сальдо последнего периода,
+            флаг повторного периода (дубль строки биллинга);
+  ЛК      — логин первой учётки, суммы активности по всем учёткам счёта.
+Соединение хэш-based, без сортировки: каждый файл читается потоково один раз,
+состояние — dict "счёт -> запись". Если оценка состояния не влезает
+в бюджет памяти, все три файла раскладываются по crc32 счёта на партиции
+(как в reconcile.py) и партиции соединяются по одной.
+
+Запуск:
+    python account_join.py --output accounts_joined.csv
+    python account_join.py --bench 10000000 --memory-mb 1024
+"""
+
+import argparse
+import csv
+import math
+import os
+import resource
+import shutil
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from reconcile import _read_header, _read_rows
+
+JOIN_COLUMNS = [
+    'account_number',
+    'client_id', 'segment', 'company_name', 'contact_name', 'crm_inn', 'crm_status', 'crm_claims',
+    'billing_periods', 'total_charged', 'total_paid', 'final_balance', 'last_period',
+    'last_payment_date', 'tariff', 'billing_status', 'billing_inn', 'duplicate_period',
+    'portal_login', 'portal_type', 'last_login_date', 'logins_q4', 'tickets_q4', 'payments_online_q4',
+    'portal_users',
+]
+_POS = {name: i for i, name in enumerate(JOIN_COLUMNS)}
+# Скрытое поле записи: периоды биллинга через запятую, для флага повтора
+_PERIODS = len(JOIN_COLUMNS)
+
+# Поля CRM, переносимые в запись счёта; строки CRM "разворачиваются" по счетам
+CRM_FIELDS = ['client_id', 'segment', 'company_name', 'contact_name', 'inn', 'status']
+_CRM_TARGETS = ['client_id', 'segment', 'company_name', 'contact_name', 'crm_inn', 'crm_status']
+
+# Оценка: байт состояния на байт входных CSV (замер на --bench, dict + списки записей)
+STATE_BYTES_PER_INPUT_BYTE = 2.5
+DEFAULT_MEMORY_MB = 1024
+
+
+def _new_record(account: str) -> list:
+    record = [None] * (len(JOIN_COLUMNS) + 1)
+    record[0] = account
+    for name in ('crm_claims', 'billing_periods', 'logins_q4', 'tickets_q4', 'payments_online_q4', 'portal_users'):
+        record[_POS[name]] = 0
+    record[_POS['total_charged']] = 0.0
+    record[_POS['total_paid']] = 0.0
+    record[_POS['duplicate_period']] = False
+    record[_PERIODS] = ''
+    return record
+
+
+def _amount(value: str) -> float:
+    return float(value) if value else 0.0
+
+
+def _count(value: str) -> int:
+    return int(value) if value else 0
+
+
+def _record(accounts: dict, account: str) -> list:
+    record = accounts.get(account)
+    if record is None:
+        record = accounts[account] = _new_record(account)
+    return record
+
+
+def _add_billing(accounts: dict, rows, header: list, stats: dict):
+    """Агрегаты биллинга по счёту за один проход: суммы, последний период, повторы."""
+    p_acc, p_period = header.index('account_number'), header.index('period')
+    p_charged, p_paid = header.index('charged_amount'), header.index('paid_amount')
+    p_balance, p_paydate = header.index('balance'), header.index('last_payment_date')
+    p_tariff, p_status, p_inn = header.index('tariff'), header.index('status'), header.index('inn')
+    # Позиции полей записи — в локальные переменные: цикл идёт по каждой строке биллинга
+    r_dup, r_periods, r_charged, r_paid = (
+        _POS['duplicate_period'], _POS['billing_periods'], _POS['total_charged'], _POS['total_paid'])
+    r_last, r_balance, r_tariff, r_status, r_inn, r_paydate = (
+        _POS['last_period'], _POS['final_balance'], _POS['tariff'], _POS['billing_status'],
+        _POS['billing_inn'], _POS['last_payment_date'])
+    n_rows = 0
+    for values in rows:
+        n_rows += 1
+        record = accounts.get(values[p_acc])
+        if record is None:
+            record = accounts[values[p_acc]] = _new_record(values[p_acc])
+        period = values[p_period]
+        repeated = period + ',' in record[_PERIODS]
+        if repeated:
+            record[r_dup] = True
+        else:
+            record[_PERIODS] += period + ','
+        record[r_periods] += 1
+        record[r_charged] += _amount(values[p_charged])
+        record[r_paid] += _amount(values[p_paid])
+        # Сторно и корректировки — повторные строки периода: сальдо, тариф и статус
+        # счёта берутся из первой строки периода, как и в самом биллинге
+        last_period = record[r_last]
+        if not repeated and (last_period is None or period > last_period):
+            record[r_last] = period
+            record[r_balance] = _amount(values[p_balance])
+            record[r_tariff] = values[p_tariff]
+            record[r_status] = values[p_status]
+            record[r_inn] = values[p_inn] or None
+        paydate = values[p_paydate]
+        if paydate and (record[r_paydate] or '') < paydate:
+            record[r_paydate] = paydate
+    stats['billing_rows'] += n_rows
+
+
+def _crm_account_rows(path: str, stats: dict):
+    """Строки CRM, развёрнутые по счетам: [счёт, *CRM_FIELDS]."""
+    header = _read_header(path, ';')
+    p_accounts = header.index('account_numbers')
+    positions = [header.index(name) for name in CRM_FIELDS]
+    for values in _read_rows(path, ';'):
+        stats['crm_rows'] += 1
+        accounts = [acc.strip() for acc in values[p_accounts].split(';') if acc.strip()]
+        if not accounts:
+            stats['crm_without_accounts'] += 1
+        for acc in accounts:
+            yield [acc] + [values[p] for p in positions]
+
+
+def _add_crm(accounts: dict, rows):
+    """Счёт -> клиент CRM; при повторном заявлении счёта остаётся первая строка."""
+    targets = [_POS[name] for name in _CRM_TARGETS]
+    claims = _POS['crm_claims']
+    for values in rows:
+        record = _record(accounts, values[0])
+        record[claims] += 1
+        if record[claims] == 1:
+            for target, value in zip(targets, values[1:]):
+                record[target] = value or None
+
+
+def _portal_account_rows(path: str, stats: dict):
+    """Строки ЛК с непустым account_number (без счёта соединять не по чему)."""
+    header = _read_header(path, ';')
+    p_acc = header.index('account_number')
+    for values in _read_rows(path, ';'):
+        stats['portal_rows'] += 1
+        if not values[p_acc]:
+            stats['portal_without_account'] += 1
+            continue
+        yield values
+
+
+def _add_portal(accounts: dict, rows, header: list):
+    p_acc, p_login, p_type = header.index('account_number'), header.index('user_login'), header.index('portal_type')
+    p_last_login = header.index('last_login_date')
+    sums = [(header.index(src), _POS[dst]) for src, dst in (
+        ('logins_count_q4', 'logins_q4'), ('tickets_count_q4', 'tickets_q4'), ('payments_online_q4', 'payments_online_q4'),
+    )]
+    for values in rows:
+        record = _record(accounts, values[p_acc])
+        record[_POS['portal_users']] += 1
+        if record[_POS['portal_users']] == 1:
+            record[_POS['portal_login']] = values[p_login]
+            record[_POS['portal_type']] = values[p_type]
+        last_login = values[p_last_login]
+        if last_login and (record[_POS['last_login_date']] or '') < last_login:
+            record[_POS['last_login_date']] = last_login
+        for src, dst in sums:
+            record[dst] += _count(values[src])
+
+
+def _emit(accounts: dict, writer, stats: dict):
+    """Пишет записи партиции и досчитывает stats по источникам."""
+    p_charged, p_paid = _POS['total_charged'], _POS['total_paid']
+    for record in accounts.values():
+        in_billing = record[_POS['billing_periods']] > 0
+        in_crm = record[_POS['crm_claims']] > 0
+        in_portal = record[_POS['portal_users']] > 0
+        stats['accounts'] += 1
+        stats['in_all_three'] += in_billing and in_crm and in_portal
+        stats['billing_only'] += in_billing and not in_crm and not in_portal
+        stats['without_billing'] += not in_billing
+        stats['duplicate_period'] += record[_POS['duplicate_period']]
+        stats['crm_conflicts'] += record[_POS['crm_claims']] > 1
+        stats['multi_portal'] += record[_POS['portal_users']] > 1
+        record[p_charged] = round(record[p_charged], 2)
+        record[p_paid] = round(record[p_paid], 2)
+        writer.writerow(record[:_PERIODS])
+
+
+def _new_stats() -> dict:
+    return {
+        'billing_rows': 0,
+        'crm_rows': 0,
+        'crm_without_accounts': 0,
+        'portal_rows': 0,
+        'portal_without_account': 0,
+        'accounts': 0,
+        'in_all_three': 0,
+        'billing_only': 0,
+        'without_billing': 0,
+        'duplicate_period': 0,
+        'crm_conflicts': 0,
+        'multi_portal': 0,
+        'partitions': 1,
+    }
+
+
+def _partition_rows(rows, key_pos: int, partitions: int, tmp_dir: str, prefix: str):
+    """Раскладывает строки по партициям по crc32 счёта."""
+    files = [open(os.path.join(tmp_dir, f'{prefix}{k}.csv'), 'w', encoding='utf-8', newline='') for k in range(partitions)]
+    writers = [csv.writer(f, delimiter=';') for f in files]
+    try:
+        for values in rows:
+            writers[zlib.crc32(values[key_pos].encode()) % partitions].writerow(values)
+    finally:
+        for f in files:
+            f.close()
+
+
+def partitions_for(paths, memory_mb=DEFAULT_MEMORY_MB) -> int:
+    """Число партиций, при котором состояние одной партиции укладывается в бюджет."""
+    estimate = sum(os.path.getsize(p) for p in paths) * STATE_BYTES_PER_INPUT_BYTE
+    return max(1, math.ceil(estimate / (memory_mb * 2 ** 20)))
+
+
+def join_accounts(billing_path: str, crm_path: str, portal_path: str, output_path: str,
+                  memory_mb=DEFAULT_MEMORY_MB, partitions=None) -> dict:
+    """Соединяет три выгрузки по счёту и пишет широкий CSV. Возвращает stats.
+
+    partitions=None — подобрать по memory_mb; порядок записей в выходе —
+    порядок первого появления счёта внутри партиции (биллинг, CRM, ЛК).
+    """
+    if partitions is None:
+        partitions = partitions_for([billing_path, crm_path, portal_path], memory_mb)
+    stats = _new_stats()
+    stats['partitions'] = partitions
+    billing_header = _read_header(billing_path, ';')
+    portal_header = _read_header(portal_path, ';')
+
+    with open(output_path, 'w', encoding='utf-8-sig', newline='') as out:
+        writer = csv.writer(out, delimiter=';')
+        writer.writerow(JOIN_COLUMNS)
+        if partitions == 1:
+            accounts = {}
+            _add_billing(accounts, _read_rows(billing_path, ';'), billing_header, stats)
+            _add_crm(accounts, _crm_account_rows(crm_path, stats))
+            _add_portal(accounts, _portal_account_rows(portal_path, stats), portal_header)
+            _emit(accounts, writer, stats)
+            return stats
+
+        tmp_dir = tempfile.mkdtemp(prefix='account-join-')
+        try:
+            _partition_rows(_read_rows(billing_path, ';'), billing_header.index('account_number'),
+                            partitions, tmp_dir, 'billing')
+            _partition_rows(_crm_account_rows(crm_path, stats), 0, partitions, tmp_dir, 'crm')
+            _partition_rows(_portal_account_rows(portal_path, stats), portal_header.index('account_number'),
+                            partitions, tmp_dir, 'portal')
+            for k in range(partitions):
+                part = lambda name: _read_rows(os.path.join(tmp_dir, f'{name}{k}.csv'), ';', skip_header=False)
+                accounts = {}
+                _add_billing(accounts, part('billing'), billing_header, stats)
+                _add_crm(accounts, part('crm'))
+                _add_portal(accounts, part('portal'), portal_header)
+                _emit(accounts, writer, stats)
+                del accounts
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return stats
+
+
+def _write_bench_inputs(n_accounts: int, out_dir: str, seed=42, chunk=500_000):
+    """Синтетические выгрузки на n_accounts счетов в схемах биллинга, CRM и ЛК.
+
+    Пишутся кусками, чтобы подготовка данных не раздувала пиковую память:
+    3 периода на счёт (+1% повторов), 1-3 счёта на клиента, 95% счетов
+    в CRM, 80% в ЛК.
+    """
+    rng = np.random.default_rng(seed)
+    paths = {name: os.path.join(out_dir, f'{name}.csv') for name in ('billing', 'crm', 'portal')}
+    headers = {
+        'billing': ['account_number', 'period', 'tariff', 'charged_amount', 'paid_amount', 'balance',
+                    'last_payment_date', 'inn', 'phone', 'status'],
+        'crm': ['client_id', 'segment', 'company_name', 'contact_name', 'inn', 'phone', 'email', 'region',
+                'manager', 'contract_date', 'account_numbers', 'status', 'last_activity_date'],
+        'portal': ['user_login', 'portal_type', 'account_number', 'display_name', 'email', 'phone',
+                   'last_login_date', 'logins_count_q4', 'tickets_count_q4', 'payments_online_q4',
+                   'services_active', 'registered_date'],
+    }
+    for name, path in paths.items():
+        pd.DataFrame(columns=headers[name]).to_csv(path, sep=';', index=False, encoding='utf-8-sig')
+
+    for start in range(0, n_accounts, chunk):
+        n = min(chunk, n_accounts - start)
+        acc_num = start + np.arange(n)
+        accounts = pd.Series(acc_num).map('ЛС-{:09d}'.format)
+        inn = pd.Series(rng.integers(10 ** 11, 10 ** 12, size=n)).astype(str)
+        charged = np.round(rng.uniform(300, 5000, size=(n, 3)), 2)
+
+        billing = pd.DataFrame({
+            'account_number': np.repeat(accounts.to_numpy(), 3),
+            'period': np.tile(['2025-10', '2025-11', '2025-12'], n),
+            'tariff': 'Домашний-300',
+            'charged_amount': charged.ravel(),
+            'paid_amount': charged.ravel(),
+            'balance': 0.0,
+            'last_payment_date': np.tile(['2025-10-05', '2025-11-05', '2025-12-05'], n),
+            'inn': np.repeat(inn.to_numpy(), 3),
+            'phone': '+7(903)123-45-67',
+            'status': 'active',
+        })
+        dup = billing.sample(frac=0.01, random_state=int(rng.integers(2 ** 31)))
+        pd.concat([billing, dup]).to_csv(paths['billing'], sep=';', index=False, header=False, mode='a', encoding='utf-8')
+
+        # Клиент владеет 1-3 подряд идущими счетами
+        owner = np.cumsum(rng.random(n) < 0.6)
+        crm = pd.DataFrame({'owner': owner, 'account': accounts, 'inn': inn})
+        crm = crm[rng.random(n) < 0.95].groupby('owner', sort=False).agg(
+            account_numbers=('account', ';'.join), inn=('inn', 'first'))
+        crm = pd.DataFrame({
+            'client_id': [f'CLT-{start + o:09d}' for o in crm.index],
+            'segment': 'B2C', 'company_name': '', 'contact_name': 'Иванов Иван Иванович',
+            'inn': crm['inn'].to_numpy(), 'phone': '+7(903)123-45-67', 'email': 'ivanov@mail.ru',
+            'region': 'Москва', 'manager': '', 'contract_date': '2024-01-01',
+            'account_numbers': crm['account_numbers'].to_numpy(), 'status': 'active',
+            'last_activity_date': '2025-12-01',
+        })
+        crm.to_csv(paths['crm'], sep=';', index=False, header=False, mode='a', encoding='utf-8')
+
+        registered = accounts[rng.random(n) < 0.8]
+        m = len(registered)
+        portal = pd.DataFrame({
+            'user_login': 'ivanov@mail.ru', 'portal_type': 'b2c', 'account_number': registered.to_numpy(),
+            'display_name': 'Иванов Иван Иванович', 'email': 'ivanov@mail.ru', 'phone': '+7(903)123-45-67',
+            'last_login_date': '2025-12-01', 'logins_count_q4': rng.integers(0, 50, size=m),
+            'tickets_count_q4': rng.integers(0, 3, size=m), 'payments_online_q4': rng.integers(0, 3, size=m),
+            'services_active': 'Интернет', 'registered_date': '2023-01-01',
+        })
+        portal.to_csv(paths['portal'], sep=';', index=False, header=False, mode='a', encoding='utf-8')
+    return paths
+
+
+def check_final_balance(billing_path: str, joined_path: str) -> list:
+    """Сверяет сальдо, тариф и статус счёта с первой строкой биллинга последнего периода.
+
+    Независимый расчёт на pandas: повторы (счёт, период) — сторно и
+    корректировки — отбрасываются, остаётся первая строка периода в порядке файла.
+    Возвращает счета, у которых поля в joined_path расходятся.
+    """
+    fields = {'balance': 'final_balance', 'tariff': 'tariff', 'status': 'billing_status'}
+    billing = pd.read_csv(billing_path, sep=';', encoding='utf-8-sig', dtype=str, keep_default_na=False,
+                          usecols=['account_number', 'period', *fields])
+    first = billing.drop_duplicates(['account_number', 'period'], keep='first')
+    last = first.sort_values('period', kind='stable').drop_duplicates('account_number', keep='last')
+    joined = pd.read_csv(joined_path, sep=';', encoding='utf-8-sig', dtype=str, keep_default_na=False,
+                         usecols=['account_number', *fields.values()])
+    merged = last.merge(joined, on='account_number', how='left', indicator=True)
+    bad = merged['_merge'] != 'both'
+    bad |= (pd.to_numeric(merged['balance']) - pd.to_numeric(merged['final_balance'])).abs().gt(0.005)
+    bad |= merged['tariff_x'] != merged['tariff_y']
+    bad |= merged['status'] != merged['billing_status']
+    return merged.loc[bad, 'account_number'].tolist()
+
+
+def _print_stats(stats: dict):
+    print(f'Строк биллинга: {stats["billing_rows"]:,}, CRM: {stats["crm_rows"]:,}, ЛК: {stats["portal_rows"]:,}')
+    print(f'Счетов: {stats["accounts"]:,} (во всех трёх: {stats["in_all_three"]:,}, '
+          f'только биллинг: {stats["billing_only"]:,}, без биллинга: {stats["without_billing"]:,})')
+    print(f'Повторный период в биллинге: {stats["duplicate_period"]:,}')
+    print(f'Счёт у нескольких строк CRM: {stats["crm_conflicts"]:,}, строк CRM без счетов: {stats["crm_without_accounts"]:,}')
+    print(f'Несколько учёток ЛК на счёт: {stats["multi_portal"]:,}, учёток без счёта: {stats["portal_without_account"]:,}')
+    print(f'Партиций: {stats["partitions"]}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Соединение биллинга, CRM и ЛК по лицевому счёту')
+    parser.add_argument('--billing', default=None)
+    parser.add_argument('--crm', default=None)
+    parser.add_argument('--portal', default=None)
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--memory-mb', type=int, default=DEFAULT_MEMORY_MB, help='бюджет памяти на состояние join')
+    parser.add_argument('--partitions', type=int, default=None, help='число партиций (по умолчанию — из бюджета)')
+    parser.add_argument('--bench', type=int, default=None, help='синтетические выгрузки на N счетов')
+    parser.add_argument('--check', action='store_true',
+                        help='сверить сальдо последнего периода с биллингом после соединения')
+    args = parser.parse_args()
+
+    base = os.path.dirname(os.path.abspath(__file__))
+    tmp_dir = None
+    if args.bench:
+        tmp_dir = tempfile.mkdtemp(prefix='account-join-bench-')
+        started = time.perf_counter()
+        # Подготовка в отдельном процессе — пиковая память ниже относится только к соединению
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            paths = pool.submit(_write_bench_inputs, args.bench, tmp_dir).result()
+        print(f'=== Синтетические выгрузки: {args.bench:,} счетов, {time.perf_counter() - started:.1f} с ===')
+        billing, crm, portal = paths['billing'], paths['crm'], paths['portal']
+        output = args.output or os.path.join(tmp_dir, 'joined.csv')
+    else:
+        billing = args.billing or os.path.join(base, 'billing_q4_2025.csv')
+        crm = args.crm or os.path.join(base, 'crm_clients.csv')
+        portal = args.portal or os.path.join(base, 'portal_activity_q4_2025.csv')
+        output = args.output or os.path.join(base, 'accounts_joined.csv')
+
+    try:
+        started = time.perf_counter()
+        stats = join_accounts(billing, crm, portal, output, memory_mb=args.memory_mb, partitions=args.partitions)
+        elapsed = time.perf_counter() - started
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+        print('=== Соединение по лицевому счёту ===')
+        _print_stats(stats)
+        print(f'Время: {elapsed:.1f} с ({stats["accounts"] / elapsed:,.0f} счетов/с)')
+        print(f'Пиковая память процесса: {rss:.0f} МБ (бюджет состояния {args.memory_mb} МБ)')
+        print(f'Файл: {output} ({os.path.getsize(output) / (1024 * 1024):.2f} MB)')
+        if args.check:
+            mismatched = check_final_balance(billing, output)
+            print(f'Сверка сальдо последнего периода: {"OK" if not mismatched else f"расхождений {len(mismatched):,}"}')
+            for account in mismatched[:10]:
+                print(f'  {account}')
+    finally:
+        if tmp_dir and not args.output:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
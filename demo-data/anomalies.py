@@ -0,0 +1,147 @@
+"""
+Декларативные аномалии выгрузок.
+
+Раньше каждый генератор заранее тянул set(random.sample(...)) на каждую
+аномалию и проверял `if idx in ..._indices` в цикле по строкам. Здесь
+аномалия — объявление:
+
+    Anomaly('null_phone', 'phone', set_null(), count=25)
+    Anomaly('alt_phone_format', 'phone', _phone_alt_format, rate=0.3, skip=['null_phone'])
+
+  column    — целевая колонка (или список колонок);
+  rate/count — доля кандидатов или их точное число;
+  where     — кандидаты: функция df -> булева маска (по умолчанию все строки);
+  skip      — аномалии, объявленные раньше, чьи строки эта не трогает
+              (выборка делается по всем кандидатам, пересечение отбрасывается,
+              как было с elif в циклах генераторов);
+  transform — (values, rows, rng) -> новые значения для выбранных строк:
+              values — колонка (DataFrame при списке колонок), rows — все
+              колонки этих строк, rng — numpy.random.Generator.
+
+apply_anomalies применяет список по порядку булевыми масками к колонкам
+DataFrame целиком и возвращает манифест: имя аномалии -> отсортированный
+int64-массив позиций затронутых строк. Новая аномалия — ещё одна строка
+в списке генератора, цикл по строкам не меняется.
+
+Для генераторов с «глобальным» засевом (как random.seed при импорте) есть
+общий генератор: seed(n) и rng() — так же, как в name_pools.
+"""
+
+import numpy as np
+import pandas as pd
+
+_rng = np.random.default_rng(42)
+
+
+def seed(value: int):
+    """Пересевает общий генератор аномалий."""
+    global _rng
+    _rng = np.random.default_rng(value)
+
+
+def rng() -> np.random.Generator:
+    return _rng
+
+
+class Anomaly:
+    """Одна аномалия: какие строки (rate/count среди where) и что transform делает с column."""
+
+    def __init__(self, name: str, column, transform, rate=None, count=None, where=None, skip=()):
+        if (rate is None) == (count is None):
+            raise ValueError(f'{name}: нужен ровно один из rate и count')
+        self.name = name
+        self.column = column
+        self.transform = transform
+        self.rate = rate
+        self.count = count
+        self.where = where
+        self.skip = tuple(skip)
+
+    def size(self, n_candidates: int) -> int:
+        if self.rate is not None:
+            return int(n_candidates * self.rate)
+        return min(self.count, n_candidates)
+
+    def __repr__(self):
+        amount = f'rate={self.rate}' if self.rate is not None else f'count={self.count}'
+        return f'Anomaly({self.name!r}, {self.column!r}, {amount})'
+
+
+def select(df: pd.DataFrame, anomaly: Anomaly, rng: np.random.Generator) -> np.ndarray:
+    """Булева маска строк, выбранных аномалией (без учёта skip)."""
+    n = len(df)
+    if anomaly.where is None:
+        candidates = np.arange(n)
+    else:
+        candidates = np.flatnonzero(np.asarray(anomaly.where(df), dtype=bool))
+    mask = np.zeros(n, dtype=bool)
+    mask[rng.choice(candidates, size=anomaly.size(len(candidates)), replace=False)] = True
+    return mask
+
+
+def apply_anomalies(df: pd.DataFrame, anomalies: list, rng: np.random.Generator = None) -> dict:
+    """Применяет аномалии по порядку к df (на месте); возвращает манифест
+    {имя: отсортированные позиции строк, int64}.
+
+    where и transform видят df с уже применёнными предыдущими аномалиями.
+    """
+    if rng is None:
+        rng = _rng
+    manifest = {}
+    for anomaly in anomalies:
+        unknown = [name for name in anomaly.skip if name not in manifest]
+        if unknown:
+            raise ValueError(f'{anomaly.name}: skip ссылается на неприменённые аномалии {unknown}')
+        mask = select(df, anomaly, rng)
+        for name in anomaly.skip:
+            mask[manifest[name]] = False
+        if mask.any():
+            rows = df.loc[mask]
+            values = anomaly.transform(rows[anomaly.column], rows, rng)
+            if isinstance(values, (pd.Series, pd.DataFrame)):
+                values = values.to_numpy()
+            df.loc[mask, anomaly.column] = values
+        manifest[anomaly.name] = np.flatnonzero(mask).astype(np.int64)
+    return manifest
+
+
+def count_stats(manifest: dict) -> dict:
+    """Манифест -> {имя: число строк}, для stats генераторов."""
+    return {name: len(positions) for name, positions in manifest.items()}
+
+
+# --- Типовые преобразования ---
+
+def set_null():
+    """Значение пропадает (None)."""
+    def transform(values, rows, rng):
+        return np.full(len(values), None, dtype=object)
+    return transform
+
+
+def constant(value):
+    def transform(values, rows, rng):
+        return np.full(len(values), value, dtype=object)
+    return transform
+
+
+def choice(options: list):
+    """Случайное значение из options для каждой строки."""
+    options = np.asarray(options, dtype=object)
+
+    def transform(values, rows, rng):
+        return options[rng.integers(0, len(options), size=len(values))]
+    return transform
+
+
+def swap(a, b):
+    """a <-> b; прочие значения не меняются."""
+    def transform(values, rows, rng):
+        return values.where(values != a, b).where(values != b, a)
+    return transform
+
+
+def lstrip(chars: str):
+    def transform(values, rows, rng):
+        return values.str.lstrip(chars)
+    return transform
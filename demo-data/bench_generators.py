@@ -0,0 +1,225 @@
+"""
+Бенчмарк генераторов демо-данных на нескольких масштабах.
+Для каждого размера базы (по умолчанию 1K, 100K, 1M клиентов) замеряются
+generate_shared_clients, generate_billing, generate_crm и generate_portal:
+время, строк/с, пиковая память (RSS) и размер выгрузки в байтах.
+Каждый замер идёт в свежем процессе (spawn), поэтому пик RSS не смешивается
+между генераторами, а random и генератор имён засеяны так же, как при обычном запуске.
+Генераторы билинга, CRM и ЛК открывают базу из кэша, который готовит
+замер shared_clients, и пишут во временный каталог, а не поверх демо-выгрузок.
+
+Результаты пишутся в JSON; два файла результатов можно сравнить:
+    python bench_generators.py run --sizes 1000,100000 --output bench_results.json
+    python bench_generators.py compare old.json new.json --threshold 0.1
+compare завершается с кодом 1, если время или память выросли больше порога.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+GENERATORS = ['shared_clients', 'billing', 'crm', 'portal']
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+# Доли B2C/B2B как в демо-базе (700 + 300)
+B2C_SHARE = 0.7
+# Метрики, рост которых считается регрессией
+REGRESSION_METRICS = ['wall_s', 'peak_rss_mb']
+
+
+def _split_clients(n_clients: int):
+    n_b2c = round(n_clients * B2C_SHARE)
+    return n_b2c, n_clients - n_b2c
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _count_rows(path: str) -> int:
+    """Строк данных в CSV (без заголовка); переводы строк внутри полей не встречаются."""
+    with open(path, 'rb') as f:
+        return sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 20), b'')) - 1
+
+
+def _dir_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def _run_case(generator: str, n_clients: int, engine: str, work_dir: str) -> dict:
+    """Один замер в процессе-воркере. Вывод генератора глушится."""
+    import shared_clients
+
+    n_b2c, n_b2b = _split_clients(n_clients)
+    params = {'n_b2c': n_b2c, 'n_b2b': n_b2b, 'seed': 42, 'engine': engine}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if generator == 'shared_clients':
+            started = time.perf_counter()
+            clients = shared_clients.write_client_cache(
+                work_dir, params, shared_clients.generate_shared_clients(**params))
+            wall = time.perf_counter() - started
+            rows = len(clients)
+            output_bytes = _dir_bytes(shared_clients.client_cache_path(work_dir, params))
+        else:
+            clients = shared_clients.get_or_create_clients(cache_dir=work_dir, **params)
+            output_path = os.path.join(work_dir, f'{generator}.csv')
+            if generator == 'billing':
+                from gen_billing import generate_billing as generate
+            elif generator == 'crm':
+                from gen_crm import generate_crm as generate
+            elif generator == 'portal':
+                from gen_portal import generate_portal as generate
+            else:
+                raise ValueError(f'Неизвестный генератор: {generator}')
+            started = time.perf_counter()
+            generate(clients=clients, output_path=output_path)
+            wall = time.perf_counter() - started
+            rows = _count_rows(output_path)
+            output_bytes = os.path.getsize(output_path)
+            os.remove(output_path)
+
+    return {
+        'generator': generator,
+        'clients': n_clients,
+        'engine': engine,
+        'wall_s': round(wall, 4),
+        'rows': rows,
+        'rows_per_s': round(rows / wall, 1) if wall > 0 else None,
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+        'output_bytes': output_bytes,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, generators=GENERATORS, engine='python') -> dict:
+    """Прогоняет генераторы на каждом размере базы; возвращает результаты для JSON."""
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for n_clients in sizes:
+        work_dir = tempfile.mkdtemp(prefix='bench-generators-')
+        try:
+            # Замер shared_clients заодно готовит кэш базы для остальных генераторов
+            cases = ['shared_clients'] + [g for g in generators if g != 'shared_clients']
+            for generator in cases:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    result = pool.submit(_run_case, generator, n_clients, engine, work_dir).result()
+                if generator in generators:
+                    results.append(result)
+                    _print_result(result)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'engine': engine,
+        },
+        'results': results,
+    }
+
+
+def _print_result(r: dict):
+    print(f'{r["generator"]:>14} {r["clients"]:>10,} клиентов: {r["wall_s"]:8.2f} с, '
+          f'{r["rows_per_s"] or 0:>12,.0f} строк/с, RSS {r["peak_rss_mb"]:8.1f} МБ, '
+          f'{r["output_bytes"] / (1024 * 1024):8.2f} MB')
+
+
+def compare_results(old: dict, new: dict, threshold=0.1) -> list:
+    """Регрессии new относительно old: рост wall_s / peak_rss_mb больше чем на threshold.
+
+    Замеры сопоставляются по (generator, clients, engine); без пары — пропускаются.
+    """
+    key = lambda r: (r['generator'], r['clients'], r['engine'])
+    baseline = {key(r): r for r in old['results']}
+    regressions = []
+    for r in new['results']:
+        base = baseline.get(key(r))
+        if base is None:
+            continue
+        for metric in REGRESSION_METRICS:
+            before, after = base[metric], r[metric]
+            if before and after > before * (1 + threshold):
+                regressions.append({
+                    'generator': r['generator'], 'clients': r['clients'], 'engine': r['engine'],
+                    'metric': metric, 'old': before, 'new': after, 'change': round(after / before - 1, 4),
+                })
+    return regressions
+
+
+def _print_comparison(old: dict, new: dict, regressions: list):
+    key = lambda r: (r['generator'], r['clients'], r['engine'])
+    baseline = {key(r): r for r in old['results']}
+    flagged = {(g['generator'], g['clients'], g['engine'], g['metric']) for g in regressions}
+    for r in new['results']:
+        base = baseline.get(key(r))
+        if base is None:
+            print(f'{r["generator"]:>14} {r["clients"]:>10,}: нет в базовом файле')
+            continue
+        parts = []
+        for metric in REGRESSION_METRICS:
+            change = r[metric] / base[metric] - 1 if base[metric] else 0.0
+            mark = ' РЕГРЕССИЯ' if key(r) + (metric,) in flagged else ''
+            parts.append(f'{metric} {base[metric]} -> {r[metric]} ({change:+.1%}){mark}')
+        print(f'{r["generator"]:>14} {r["clients"]:>10,}: ' + ', '.join(parts))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Бенчмарк генераторов демо-данных')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='прогнать генераторы и записать JSON')
+    run.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES), help='число клиентов через запятую')
+    run.add_argument('--generators', default=','.join(GENERATORS))
+    run.add_argument('--engine', choices=['python', 'vectorized', 'counter'], default='python')
+    run.add_argument('--output', default='bench_results.json')
+
+    cmp = sub.add_parser('compare', help='сравнить два файла результатов')
+    cmp.add_argument('old')
+    cmp.add_argument('new')
+    cmp.add_argument('--threshold', type=float, default=0.1, help='допустимый рост, доля (0.1 = 10%%)')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        generators = args.generators.split(',')
+        unknown = set(generators) - set(GENERATORS)
+        if unknown:
+            parser.error(f'неизвестные генераторы: {", ".join(sorted(unknown))}')
+        print('=== Бенчмарк генераторов ===')
+        report = run_benchmarks([int(s) for s in args.sizes.split(',')], generators, args.engine)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'Результаты: {args.output}')
+    else:
+        with open(args.old, encoding='utf-8') as f:
+            old = json.load(f)
+        with open(args.new, encoding='utf-8') as f:
+            new = json.load(f)
+        regressions = compare_results(old, new, args.threshold)
+        _print_comparison(old, new, regressions)
+        print(f'Регрессий (порог {args.threshold:.0%}): {len(regressions)}')
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,74 @@
+"""
+Колоночный кэш общей базы клиентов вместо shared_clients.pkl.
+Каталог кэша client_cache/<ключ>/ определяется параметрами генерации
+(n_b2c, n_b2b, seed, engine) и версией формата, поэтому кэш от других
+параметров никогда не подхватывается молча. Внутри — ClientTable,
+сохранённая по .npy-файлу на колонку (см. client_table.py).
+Колонки открываются через np.load(mmap_mode='r'), так что открытие кэша
+почти бесплатно, а страницы делят все генераторы.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from client_table import ClientTable
+
+# 2 — ФИО и компании из name_pools.py (согласованные по полу), старые кэши не годятся
+CACHE_FORMAT_VERSION = 2
+
+
+def cache_key(params: dict) -> str:
+    payload = json.dumps({'format': CACHE_FORMAT_VERSION, **params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def cache_path(cache_dir: str, params: dict) -> str:
+    return os.path.join(cache_dir, 'client_cache', cache_key(params))
+
+
+def write_client_cache(cache_dir: str, params: dict, clients) -> ClientTable:
+    """Сохраняет базу клиентов в колоночный кэш и открывает его.
+
+    Пишется во временный каталог и переименовывается целиком, поэтому
+    параллельно стартующие генераторы не увидят недописанный кэш. Готовый
+    кэш с тем же ключом не удаляется (его может читать другой процесс) —
+    открывается он; негодный сначала атомарно отодвигается в сторону.
+    """
+    path = cache_path(cache_dir, params)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix='.tmp-', dir=os.path.dirname(path))
+    ClientTable.from_records(clients).save(tmp_path, {'format': CACHE_FORMAT_VERSION, 'params': params})
+
+    if os.path.exists(path):
+        existing = open_client_cache(cache_dir, params)
+        if existing is not None:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return existing
+        stale_path = tempfile.mkdtemp(prefix='.stale-', dir=os.path.dirname(path))
+        try:
+            os.replace(path, stale_path)
+        except OSError:
+            pass
+        shutil.rmtree(stale_path, ignore_errors=True)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        # Кэш с тем же ключом успел записать другой процесс
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return ClientTable.load(path)
+
+
+def open_client_cache(cache_dir: str, params: dict):
+    """Открывает кэш для params или возвращает None, если его нет или он устарел."""
+    path = cache_path(cache_dir, params)
+    meta_path = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('format') != CACHE_FORMAT_VERSION or meta.get('params') != params:
+        return None
+    return ClientTable.load(path, meta=meta)
@@ -0,0 +1,257 @@
+"""
+Компактная колоночная база клиентов (struct-of-arrays) вместо list of dict.
+  строки    — StringColumn: UTF-8 байты подряд + offsets (+ маска None);
+  категории — int16-коды + список значений (segment, region, tariff, manager);
+  счета     — плоская StringColumn номеров + account_index (границы по клиентам).
+Строка клиента — ClientRow с __slots__, читается как dict: client['inn'].
+Клиент обходится в ~200 байт против ~1.2 КБ у dict из 12 ключей (замер на 100K).
+Таблица сохраняется по .npy-файлу на колонку и открывается через mmap
+(см. client_cache.py).
+"""
+
+import json
+import os
+from array import array
+from collections.abc import Sequence
+
+import numpy as np
+
+STRING_FIELDS = ['client_id', 'company_name', 'contact_name', 'inn', 'phone', 'email', 'contract_date']
+CATEGORY_FIELDS = ['segment', 'region', 'manager', 'tariff']
+FIELDS = [
+    'client_id', 'segment', 'company_name', 'contact_name', 'inn', 'phone', 'email',
+    'region', 'manager', 'contract_date', 'accounts', 'tariff',
+]
+
+
+class StringColumn:
+    """Колонка строк: UTF-8 байты подряд, offsets и необязательная маска None."""
+
+    __slots__ = ('data', 'offsets', 'nulls')
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray, nulls: np.ndarray = None):
+        self.data = data
+        self.offsets = offsets
+        self.nulls = nulls
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int):
+        if self.nulls is not None and self.nulls[i]:
+            return None
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode()
+
+    def save(self, path: str, name: str):
+        np.save(os.path.join(path, f'{name}.data.npy'), self.data)
+        np.save(os.path.join(path, f'{name}.offsets.npy'), self.offsets)
+        if self.nulls is not None:
+            np.save(os.path.join(path, f'{name}.nulls.npy'), self.nulls)
+
+    @classmethod
+    def load(cls, path: str, name: str, mmap_mode=None) -> 'StringColumn':
+        nulls_path = os.path.join(path, f'{name}.nulls.npy')
+        return cls(
+            np.load(os.path.join(path, f'{name}.data.npy'), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, f'{name}.offsets.npy'), mmap_mode=mmap_mode),
+            np.load(nulls_path, mmap_mode=mmap_mode) if os.path.exists(nulls_path) else None,
+        )
+
+
+class _StringBuilder:
+    """Накапливает строки сразу в байтах, без промежуточного списка str."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.lengths = array('q')
+        self.nulls = array('b')
+
+    def append(self, value):
+        encoded = b'' if value is None else value.encode()
+        self.data += encoded
+        self.lengths.append(len(encoded))
+        self.nulls.append(value is None)
+
+    def build(self) -> StringColumn:
+        # int32-offsets, пока колонка меньше 2 ГБ: минус 4 байта на строку
+        dtype = np.int32 if len(self.data) < 2 ** 31 else np.int64
+        offsets = np.zeros(len(self.lengths) + 1, dtype=dtype)
+        np.cumsum(np.frombuffer(self.lengths, dtype=np.int64), out=offsets[1:])
+        nulls = np.frombuffer(self.nulls, dtype=np.int8).astype(bool)
+        return StringColumn(np.frombuffer(bytes(self.data), dtype=np.uint8), offsets, nulls if nulls.any() else None)
+
+
+class ClientRow:
+    """Лёгкое представление клиента i в ClientTable; читается как dict."""
+
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table: 'ClientTable', index: int):
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, field: str):
+        return self.table.value(field, self.index)
+
+    def get(self, field: str, default=None):
+        return self.table.value(field, self.index) if field in FIELDS else default
+
+    def keys(self):
+        return list(FIELDS)
+
+    def to_dict(self) -> dict:
+        return {field: self.table.value(field, self.index) for field in FIELDS}
+
+    def __repr__(self):
+        return f'ClientRow({self.to_dict()!r})'
+
+
+class AccountRow:
+    """Лицевой счёт j из плоского массива счетов и поля его клиента."""
+
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table: 'ClientTable', index: int):
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, field: str):
+        if field == 'account_number':
+            return self.table.accounts[self.index]
+        return self.table.value(field, int(self.table.account_owner[self.index]))
+
+
+class AccountRows(Sequence):
+    """Все лицевые счета таблицы как последовательность AccountRow."""
+
+    def __init__(self, table: 'ClientTable'):
+        self.table = table
+
+    def __len__(self):
+        return self.table.total_accounts
+
+    def __getitem__(self, j):
+        if isinstance(j, slice):
+            return [AccountRow(self.table, k) for k in range(*j.indices(len(self)))]
+        if j < 0:
+            j += len(self)
+        if not 0 <= j < len(self):
+            raise IndexError('account index out of range')
+        return AccountRow(self.table, j)
+
+
+class ClientTable(Sequence):
+    """База клиентов struct-of-arrays. Элементы — ClientRow."""
+
+    def __init__(self, strings: dict, codes: dict, categories: dict, accounts: StringColumn, account_index: np.ndarray):
+        self.strings = strings
+        self.codes = codes
+        self.categories = categories
+        self.accounts = accounts
+        self.account_index = account_index
+        self._account_owner = None
+
+    @classmethod
+    def from_records(cls, clients) -> 'ClientTable':
+        """Собирает таблицу из любой последовательности dict-подобных клиентов."""
+        if isinstance(clients, ClientTable):
+            return clients
+        strings = {field: _StringBuilder() for field in STRING_FIELDS}
+        lookups = {field: {} for field in CATEGORY_FIELDS}
+        codes = {field: array('h') for field in CATEGORY_FIELDS}
+        accounts = _StringBuilder()
+        account_counts = array('q')
+
+        for client in clients:
+            for field in STRING_FIELDS:
+                strings[field].append(client[field])
+            for field in CATEGORY_FIELDS:
+                value = client[field]
+                codes[field].append(-1 if value is None else lookups[field].setdefault(value, len(lookups[field])))
+            for acc in client['accounts']:
+                accounts.append(acc)
+            account_counts.append(len(client['accounts']))
+
+        account_index = np.zeros(len(account_counts) + 1, dtype=np.int64)
+        np.cumsum(np.frombuffer(account_counts, dtype=np.int64), out=account_index[1:])
+        return cls(
+            {field: builder.build() for field, builder in strings.items()},
+            {field: np.frombuffer(codes[field], dtype=np.int16).copy() for field in CATEGORY_FIELDS},
+            {field: list(lookups[field]) for field in CATEGORY_FIELDS},
+            accounts.build(),
+            account_index,
+        )
+
+    def __len__(self):
+        return len(self.account_index) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [ClientRow(self, j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('client index out of range')
+        return ClientRow(self, i)
+
+    def value(self, field: str, i: int):
+        column = self.strings.get(field)
+        if column is not None:
+            return column[i]
+        codes = self.codes.get(field)
+        if codes is not None:
+            code = codes[i]
+            return None if code < 0 else self.categories[field][code]
+        if field == 'accounts':
+            return self.accounts_of(i)
+        raise KeyError(field)
+
+    def accounts_of(self, i: int) -> list:
+        return [self.accounts[j] for j in range(self.account_index[i], self.account_index[i + 1])]
+
+    @property
+    def total_accounts(self) -> int:
+        return int(self.account_index[-1])
+
+    @property
+    def account_owner(self) -> np.ndarray:
+        """Индекс клиента для каждого счёта плоского массива."""
+        if self._account_owner is None:
+            self._account_owner = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.account_index))
+        return self._account_owner
+
+    def account_rows(self) -> AccountRows:
+        return AccountRows(self)
+
+    def nbytes(self) -> int:
+        """Объём колонок в байтах."""
+        columns = list(self.strings.values()) + [self.accounts]
+        total = sum(c.data.nbytes + c.offsets.nbytes + (0 if c.nulls is None else c.nulls.nbytes) for c in columns)
+        return total + sum(c.nbytes for c in self.codes.values()) + self.account_index.nbytes
+
+    def save(self, path: str, meta: dict = None):
+        """Пишет таблицу в каталог path: .npy на колонку + meta.json."""
+        os.makedirs(path, exist_ok=True)
+        for field, column in self.strings.items():
+            column.save(path, field)
+        for field, codes in self.codes.items():
+            np.save(os.path.join(path, f'{field}.codes.npy'), codes)
+        self.accounts.save(path, 'accounts')
+        np.save(os.path.join(path, 'accounts.index.npy'), self.account_index)
+        meta = dict(meta or {}, n_clients=len(self), categories=self.categories)
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode='r', meta: dict = None) -> 'ClientTable':
+        """Открывает сохранённую таблицу; по умолчанию колонки memory-mapped."""
+        if meta is None:
+            with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+        return cls(
+            {field: StringColumn.load(path, field, mmap_mode) for field in STRING_FIELDS},
+            {field: np.load(os.path.join(path, f'{field}.codes.npy'), mmap_mode=mmap_mode) for field in CATEGORY_FIELDS},
+            meta['categories'],
+            StringColumn.load(path, 'accounts', mmap_mode),
+            np.load(os.path.join(path, 'accounts.index.npy'), mmap_mode=mmap_mode),
+        )
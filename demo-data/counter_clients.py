@@ -0,0 +1,301 @@
+"""
+Counter-based движок общей базы клиентов (engine='counter').
+
+python- и vectorized-движки тянут один последовательный поток ГСЧ и в конце
+перемешивают базу, поэтому клиента #N не получить, не сгенерировав всех до
+него. Здесь всё, что нужно клиенту, — функция (seed, номер):
+
+  * позиция в базе -> номер клиента: ключевая перестановка (сеть Фейстеля
+    на 2^k >= n элементов с cycle-walking) вместо shuffle;
+  * номер клиента -> поля: случайные слова Philox4x32-10 со счётчиком
+    (номер клиента, номер блока) и ключом из seed; у каждого поля своё
+    слово, так что поля не зависят друг от друга и от соседних клиентов.
+
+client_at(i) — O(1), clients_in_range(a, b) — O(b - a) массивами NumPy;
+шард или одного клиента можно пересобрать, не трогая остальную базу, а
+диапазоны генерируются параллельно без общего состояния. Распределения как
+у vectorized-движка (те же словари, коды, диапазоны дат), но значения другие:
+у движков разные ГСЧ.
+
+    python counter_clients.py --at 123456              # один клиент
+    python counter_clients.py --bench 1000000          # пропускная способность диапазона
+"""
+
+import argparse
+import time
+from collections.abc import Sequence
+
+import numpy as np
+
+from identities import PHONE_CODES, digits_to_bytes, format_phones, inns_from_digits
+from name_pools import load_name_pools
+from shared_clients import B2B_COMPANY_FORMS, B2B_DOMAINS, EMAIL_DOMAINS_B2C, MANAGERS, REGIONS, TARIFFS_B2B, TARIFFS_B2C
+from vectorized_clients import B2B_CONTRACT_RANGE, B2C_CONTRACT_RANGE, REGION_NAMES, VectorizedClients
+
+# Константы Philox4x32-10 (Salmon et al., Random123)
+_PHILOX_M = (0xD2511F53, 0xCD9E8D57)
+_PHILOX_W = (0x9E3779B9, 0xBB67AE85)
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+# Слова Philox на клиента: по одному на поле, цифры ИНН и счетов — по _DIGITS_PER_WORD на слово
+_FIELDS = [
+    'region', 'tariff', 'manager', 'male', 'last', 'first', 'middle', 'form', 'company',
+    'ip_last', 'ip_first', 'ip_middle', 'domain', 'email_suffix', 'n_accounts', 'contract_date',
+    'phone_code', 'phone_n1', 'phone_n2', 'phone_n3', 'inn_first',
+]
+_DIGITS_PER_WORD = 4
+_INN_WORDS = 3
+_ACCOUNT_WORDS = 5 * 2
+_WORDS = len(_FIELDS) + _INN_WORDS + _ACCOUNT_WORDS
+_BLOCKS = -(-_WORDS // 4)
+_FIELD = {name: k for k, name in enumerate(_FIELDS)}
+# Четвёртое слово счётчика разводит потоки: поля клиентов и раунды перестановки
+_STREAM_FIELDS = 0
+_STREAM_PERMUTATION = 1
+_FEISTEL_ROUNDS = 4
+_ITER_CHUNK = 65_536
+_PHILOX_CHUNK = 4096
+
+
+def philox4x32(c0, c1, c2, c3, key) -> tuple:
+    """Philox4x32-10: четыре слова счётчика (массивы одной формы) и ключ из двух
+    uint32 -> четыре слова результата (uint64-массивы со значениями < 2^32).
+    """
+    c0, c1, c2, c3 = (np.array(c, dtype=np.uint64) for c in np.broadcast_arrays(c0, c1, c2, c3))
+    k0, k1 = int(key[0]), int(key[1])
+    p0, p1 = np.empty_like(c0), np.empty_like(c0)
+    m0, m1, shift = np.uint64(_PHILOX_M[0]), np.uint64(_PHILOX_M[1]), np.uint64(32)
+    for _ in range(10):
+        np.multiply(c0, m0, out=p0)
+        np.multiply(c2, m1, out=p1)
+        # (hi(p1) ^ c1 ^ k0, lo(p1), hi(p0) ^ c3 ^ k1, lo(p0)) — на месте, без временных массивов
+        np.right_shift(p1, shift, out=c0)
+        c0 ^= c1
+        c0 ^= np.uint64(k0)
+        np.right_shift(p0, shift, out=c2)
+        c2 ^= c3
+        c2 ^= np.uint64(k1)
+        np.bitwise_and(p1, _MASK32, out=c1)
+        np.bitwise_and(p0, _MASK32, out=c3)
+        k0 = (k0 + _PHILOX_W[0]) & 0xFFFFFFFF
+        k1 = (k1 + _PHILOX_W[1]) & 0xFFFFFFFF
+    return c0, c1, c2, c3
+
+
+def _random_words(index: np.ndarray, n_blocks: int, stream: int, key) -> np.ndarray:
+    """(len(index), 4 * n_blocks) слов Philox со счётчиком (index, блок, поток)."""
+    index = np.asarray(index, dtype=np.uint64)
+    blocks = np.arange(n_blocks, dtype=np.uint64)[None, :]
+    words = np.empty((len(index), n_blocks, 4), dtype=np.uint32)
+    # Кусками по _PHILOX_CHUNK: промежуточные массивы раундов остаются в кэше процессора
+    for start in range(0, len(index), _PHILOX_CHUNK):
+        part = index[start:start + _PHILOX_CHUNK, None]
+        lanes = philox4x32(part & _MASK32, part >> np.uint64(32), blocks, np.uint64(stream), key)
+        for j, lane in enumerate(lanes):
+            words[start:start + _PHILOX_CHUNK, :, j] = lane
+    return words.reshape(len(index), 4 * n_blocks)
+
+
+def _below(words: np.ndarray, bound) -> np.ndarray:
+    """32-битные слова -> целые 0..bound-1 (умножение со сдвигом, без деления)."""
+    return ((words.astype(np.uint64) * np.asarray(bound, dtype=np.uint64)) >> np.uint64(32)).astype(np.int64)
+
+
+def _digits(words: np.ndarray) -> np.ndarray:
+    """(n, m) слов -> (n, m * _DIGITS_PER_WORD) десятичных цифр: первые цифры дроби слово / 2^32."""
+    fraction = words.astype(np.uint64)
+    digits = np.empty(words.shape + (_DIGITS_PER_WORD,), dtype=np.uint8)
+    for k in range(_DIGITS_PER_WORD):
+        fraction *= np.uint64(10)
+        digits[..., k] = fraction >> np.uint64(32)
+        fraction &= _MASK32
+    return digits.reshape(len(words), -1)
+
+
+class CounterClients(Sequence):
+    """База из n_b2b + n_b2c клиентов, каждый из которых вычисляется по позиции.
+
+    Элементы — dict с теми же 12 ключами, что у generate_shared_clients.
+    Клиенты с номером < n_b2b — B2B (CLT-номер = id_offset + номер + 1),
+    позиция в базе — перестановка номеров, ключевая по seed.
+    """
+
+    def __init__(self, n_b2c=700, n_b2b=300, seed=42, id_offset=0, valid_inn=False):
+        self.n_b2c = n_b2c
+        self.n_b2b = n_b2b
+        self.seed = seed
+        self.id_offset = id_offset
+        self.valid_inn = valid_inn
+        self._pools = load_name_pools(seed)
+        # Ключи Philox для полей и для перестановки
+        state = np.random.SeedSequence(seed).generate_state(4)
+        self._field_key = (int(state[0]), int(state[1]))
+        self._permutation_key = (int(state[2]), int(state[3]))
+        n = max(len(self), 2)
+        self._half_bits = (int(n - 1).bit_length() + 1) // 2
+
+    def __len__(self):
+        return self.n_b2b + self.n_b2c
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step == 1:
+                return list(self.clients_in_range(start, max(start, stop)))
+            return [self.client_at(j) for j in range(start, stop, step)]
+        return self.client_at(i)
+
+    def __iter__(self):
+        for start in range(0, len(self), _ITER_CHUNK):
+            yield from self.clients_in_range(start, min(start + _ITER_CHUNK, len(self)))
+
+    def client_at(self, i: int) -> dict:
+        """Клиент на позиции i базы — O(1)."""
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('client index out of range')
+        return self.clients_in_range(i, i + 1)[0]
+
+    def clients_in_range(self, start: int, stop: int) -> VectorizedClients:
+        """Клиенты на позициях start..stop-1 — O(stop - start), ленивая последовательность dict."""
+        if not 0 <= start <= stop <= len(self):
+            raise IndexError(f'диапазон {start}..{stop} вне базы из {len(self)} клиентов')
+        return VectorizedClients(self._arrays(self.client_numbers(np.arange(start, stop))), self._pools)
+
+    def client_numbers(self, positions: np.ndarray) -> np.ndarray:
+        """Позиции в базе -> номера клиентов 0..n-1 (ключевая перестановка)."""
+        result = np.asarray(positions, dtype=np.uint64).copy()
+        pending = np.arange(len(result))
+        # Cycle-walking: сеть Фейстеля переставляет 2^(2*half_bits) >= n значений,
+        # вышедшие за n прогоняются ещё раз, пока не попадут в [0, n)
+        while len(pending):
+            result[pending] = self._feistel(result[pending])
+            pending = pending[result[pending] >= len(self)]
+        return result.astype(np.int64)
+
+    def _feistel(self, x: np.ndarray) -> np.ndarray:
+        bits = np.uint64(self._half_bits)
+        mask = np.uint64((1 << self._half_bits) - 1)
+        left, right = x >> bits, x & mask
+        for r in range(_FEISTEL_ROUNDS):
+            f = philox4x32(right, r, 0, _STREAM_PERMUTATION, self._permutation_key)[0] & mask
+            left, right = right, left ^ f
+        return (left << bits) | right
+
+    def _words(self, numbers: np.ndarray) -> np.ndarray:
+        """(len(numbers), _WORDS) случайных uint32-слов клиентов."""
+        return _random_words(numbers, _BLOCKS, _STREAM_FIELDS, self._field_key)[:, :_WORDS]
+
+    def _gendered(self, kind: str, words: np.ndarray, male: np.ndarray) -> np.ndarray:
+        n_male = self._pools.n_male[kind]
+        n_female = len(getattr(self._pools, kind)) - n_male
+        return np.where(male, _below(words, n_male), n_male + _below(words, n_female)).astype(np.int32)
+
+    def _arrays(self, numbers: np.ndarray) -> dict:
+        """Колонки VectorizedClients для клиентов с номерами numbers."""
+        n = len(numbers)
+        w = self._words(numbers)
+        field = lambda name: w[:, _FIELD[name]]
+        is_b2b = numbers < self.n_b2b
+
+        region_idx = _below(field('region'), len(REGIONS)).astype(np.uint8)
+        tariff_idx = np.where(is_b2b, _below(field('tariff'), len(TARIFFS_B2B)),
+                              len(TARIFFS_B2B) + _below(field('tariff'), len(TARIFFS_B2C))).astype(np.uint8)
+        manager_idx = np.where(is_b2b, _below(field('manager'), len(MANAGERS)), -1).astype(np.int8)
+
+        male = field('male') < np.uint32(1 << 31)
+        last_idx, first_idx, middle_idx = (self._gendered(kind, field(kind), male) for kind in ('last', 'first', 'middle'))
+        ip_last_idx, ip_first_idx, ip_middle_idx = (
+            self._gendered(kind, field(f'ip_{kind}'), True) for kind in ('last', 'first', 'middle'))
+        domain_idx = np.where(is_b2b, _below(field('domain'), len(B2B_DOMAINS)),
+                              _below(field('domain'), len(EMAIL_DOMAINS_B2C))).astype(np.uint8)
+
+        # ИНН: 10 цифр у B2B, 12 у B2C, первая цифра 1-9
+        inn_digits = _digits(w[:, len(_FIELDS):len(_FIELDS) + _INN_WORDS])
+        inn_digits[:, 0] = 1 + _below(field('inn_first'), 9)
+        inn = np.empty(n, dtype='S12')
+        inn[is_b2b] = inns_from_digits(inn_digits[is_b2b, :10].copy(), self.valid_inn)
+        inn[~is_b2b] = inns_from_digits(inn_digits[~is_b2b], self.valid_inn)
+
+        phone = format_phones(_below(field('phone_code'), len(PHONE_CODES)), 100 + _below(field('phone_n1'), 900),
+                              10 + _below(field('phone_n2'), 90), 10 + _below(field('phone_n3'), 90))
+
+        contract_date = np.empty(n, dtype='datetime64[D]')
+        for segment, date_range in ((is_b2b, B2B_CONTRACT_RANGE), (~is_b2b, B2C_CONTRACT_RANGE)):
+            start, end = date_range
+            days = _below(field('contract_date')[segment], (end - start).days + 1)
+            contract_date[segment] = np.datetime64(start.isoformat(), 'D') + days
+
+        # Счета: до 5 по 7 случайных цифр после кода региона клиента
+        n_accounts = np.where(is_b2b, 1 + _below(field('n_accounts'), 5), 1)
+        account_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(n_accounts, out=account_offsets[1:])
+        owner = np.repeat(np.arange(n), n_accounts)
+        slot = np.arange(len(owner)) - account_offsets[:-1][owner]
+        account_words = w[:, len(_FIELDS) + _INN_WORDS:].reshape(n, 5, 2)[owner, slot]
+        region_codes = np.array([[int(d) for d in REGIONS[r]] for r in REGION_NAMES], dtype=np.uint8)
+        accounts = digits_to_bytes(np.concatenate([region_codes[region_idx[owner]], _digits(account_words)[:, :7]], axis=1))
+
+        return {
+            'client_num': self.id_offset + numbers.astype(np.int64) + 1,
+            'is_b2b': is_b2b,
+            'region_idx': region_idx,
+            'tariff_idx': tariff_idx,
+            'manager_idx': manager_idx,
+            'last_idx': last_idx,
+            'first_idx': first_idx,
+            'middle_idx': middle_idx,
+            'form_idx': _below(field('form'), len(B2B_COMPANY_FORMS)).astype(np.uint8),
+            'company_idx': _below(field('company'), len(self._pools.company)).astype(np.int32),
+            'ip_last_idx': ip_last_idx,
+            'ip_first_idx': ip_first_idx,
+            'ip_middle_idx': ip_middle_idx,
+            'domain_idx': domain_idx,
+            'email_suffix': (1 + _below(field('email_suffix'), 999)).astype(np.int16),
+            'inn': inn,
+            'phone': phone,
+            'contract_date': contract_date,
+            'account_offsets': account_offsets,
+            'accounts': accounts,
+        }
+
+
+def generate_counter_clients(n_b2c=700, n_b2b=300, seed=42, id_offset=0, valid_inn=False) -> CounterClients:
+    return CounterClients(n_b2c=n_b2c, n_b2b=n_b2b, seed=seed, id_offset=id_offset, valid_inn=valid_inn)
+
+
+def _bench(n: int, seed: int):
+    clients = CounterClients(n_b2c=n - n * 3 // 10, n_b2b=n * 3 // 10, seed=seed)
+    started = time.perf_counter()
+    block = clients.clients_in_range(0, n)
+    elapsed = time.perf_counter() - started
+
+    probes = np.random.default_rng(seed).integers(0, n, size=1000)
+    started = time.perf_counter()
+    single = [clients.client_at(int(i)) for i in probes]
+    at_s = (time.perf_counter() - started) / len(probes)
+    assert all(block[int(i)] == client for i, client in zip(probes, single))
+    assert len(set(block._a['client_num'].tolist())) == n
+
+    print(f'=== Counter-based база: {n:,} клиентов ===')
+    print(f'clients_in_range(0, {n:,}): {elapsed:.2f} с ({n / elapsed:,.0f} клиентов/с)')
+    print(f'client_at(i): {at_s * 1e6:,.0f} мкс на клиента, совпадает с диапазоном')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Counter-based генерация клиентов по номеру')
+    parser.add_argument('--n-b2c', type=int, default=700)
+    parser.add_argument('--n-b2b', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--at', type=int, default=None, help='показать клиента на позиции')
+    parser.add_argument('--bench', type=int, default=None, help='замер на базе из N клиентов')
+    args = parser.parse_args()
+
+    if args.bench:
+        _bench(args.bench, args.seed)
+    else:
+        base = CounterClients(n_b2c=args.n_b2c, n_b2b=args.n_b2b, seed=args.seed)
+        position = 0 if args.at is None else args.at
+        for key, value in base.client_at(position).items():
+            print(f'{key}: {value}')
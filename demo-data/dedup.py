@@ -0,0 +1,444 @@
+"""
+Поиск дублей внутри одной выгрузки: дубли CRM и мульти-ЛК портала.
+
+Дубль генераторов — копия записи с другим client_id/логином, к которой
+могли добавиться свои аномалии (устаревший email, пустые счета, телефон
+в другом формате). Сравнение всех пар — O(n²), поэтому запись сводится к
+множеству токенов — нормализованные телефон, ИНН, email и лицевые счета,
+по 64-битному хэшу, — а пары-кандидаты набираются двумя способами:
+  1. sorted neighborhood: записи сортируются по телефону, ИНН и email
+     (числом или префиксом, так что близкие значения оказываются рядом),
+     сравниваются соседи в окне window;
+  2. MinHash/LSH: по каждой полосе из rows_per_band minhash-значений
+     строится ключ, записи с равным ключом — кандидаты (внутри группы тоже
+     окном, большие группы не дают квадрата пар).
+Кандидаты оцениваются точным коэффициентом Жаккара по множествам токенов,
+пары не ниже min_jaccard объединяются в кластеры (связные компоненты).
+Всё считается массивами NumPy, число пар — O(n · window · проходы).
+
+Запуск:
+    python dedup.py                    # кластеры и точность/полнота на демо-выгрузках
+    python dedup.py --bench 10000000   # синтетическая CRM на 10M строк
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from normalizers import normalize_inn_column, normalize_phone_column
+
+# Окно sorted neighborhood: запись сравнивается с window - 1 следующими
+WINDOW = 3
+# MinHash/LSH: полосы по ROWS_PER_BAND значений; порог срабатывания ≈ (1/BANDS)^(1/ROWS_PER_BAND)
+BANDS = 6
+ROWS_PER_BAND = 2
+# Порог Жаккара по множествам токенов: две общие из четырёх у B2C-записи уже не дубль
+MIN_JACCARD = 0.5
+# Пары оцениваются кусками, чтобы матрица сравнений токенов не разрасталась
+PAIR_CHUNK = 1_000_000
+
+# Ключи хэширования по видам токенов: одинаковая строка в разных полях — разные токены
+_HASH_KEYS = {
+    'phone': 'dedup:phone.....',
+    'inn': 'dedup:inn.......',
+    'email': 'dedup:email.....',
+    'account': 'dedup:account...',
+}
+# Символов email в ключе сортировки: по 12 бит на символ (кириллица в устаревших email)
+_EMAIL_PREFIX = 5
+
+
+def _hash_tokens(values: np.ndarray, kind: str) -> np.ndarray:
+    """Хэши непустых строк; 0 зарезервирован под «нет токена»."""
+    hashes = pd.util.hash_array(values.astype(object), hash_key=_HASH_KEYS[kind])
+    hashes[hashes == 0] = 1
+    return hashes
+
+
+def _numeric_key(values: pd.Series) -> np.ndarray:
+    """Нормализованные цифры -> int64 для сортировки (-1 — нет значения)."""
+    key = np.full(len(values), -1, dtype=np.int64)
+    present = values.notna().to_numpy()
+    if present.any():
+        key[present] = values[present].to_numpy(dtype=str).astype(np.int64)
+    return key
+
+
+def _prefix_key(values: np.ndarray) -> np.ndarray:
+    """Первые _EMAIL_PREFIX символов строк -> uint64, с сохранением порядка."""
+    codes = values.astype(f'U{_EMAIL_PREFIX}')
+    codes = codes.view(np.uint32).reshape(len(values), _EMAIL_PREFIX).astype(np.uint64)
+    key = np.zeros(len(values), dtype=np.uint64)
+    for i in range(_EMAIL_PREFIX):
+        key = (key << np.uint64(12)) | np.minimum(codes[:, i], 0xFFF)
+    return key
+
+
+def _emails(values: pd.Series) -> pd.Series:
+    return values.where(values.notna() & (values.astype(object) != ''), None).str.strip().str.lower()
+
+
+def tokenize(df: pd.DataFrame) -> dict:
+    """Токены и ключи сортировки записей выгрузки.
+
+    Берутся колонки, которые есть в df: phone, inn, email, account_numbers
+    (CRM, через ';'), account_number (ЛК) и user_login (ЛК: email или цифры
+    телефона — становится токеном email или телефона). Возвращает dict:
+    tokens — (n, k) uint64, токены строки по возрастанию, хвост добит нулями;
+    phone_key / inn_key (int64, -1 — нет), email_key / email_hash (uint64, 0 — нет).
+    """
+    n = len(df)
+    columns = []  # (номер строки, хэш токена)
+    keys = {
+        'phone_key': np.full(n, -1, dtype=np.int64),
+        'inn_key': np.full(n, -1, dtype=np.int64),
+        'email_key': np.zeros(n, dtype=np.uint64),
+        'email_hash': np.zeros(n, dtype=np.uint64),
+    }
+
+    def add(values: pd.Series, kind: str, rows=None):
+        rows = np.arange(n) if rows is None else rows
+        present = values.notna().to_numpy()
+        if present.any():
+            columns.append((rows[present], _hash_tokens(values.to_numpy(dtype=object)[present], kind)))
+
+    if 'phone' in df:
+        phones = normalize_phone_column(df['phone'])
+        keys['phone_key'] = _numeric_key(phones)
+        add(phones, 'phone')
+    if 'inn' in df:
+        inns = normalize_inn_column(df['inn'])
+        keys['inn_key'] = _numeric_key(inns)
+        add(inns, 'inn')
+    if 'email' in df:
+        emails = _emails(df['email'])
+        present = emails.notna().to_numpy()
+        values = emails.to_numpy(dtype=object)[present]
+        if len(values):
+            keys['email_key'][present] = _prefix_key(values)
+            keys['email_hash'][present] = _hash_tokens(values, 'email')
+        add(emails, 'email')
+    if 'user_login' in df:
+        logins = df['user_login'].astype(object).where(df['user_login'].notna(), None)
+        is_email = logins.str.contains('@', regex=False).fillna(False).to_numpy(dtype=bool)
+        add(_emails(logins[is_email]), 'email', np.flatnonzero(is_email))
+        add(normalize_phone_column(logins[~is_email]), 'phone', np.flatnonzero(~is_email))
+    for column, sep in (('account_numbers', ';'), ('account_number', None)):
+        if column not in df:
+            continue
+        values = df[column].astype(object).where(df[column].notna(), None)
+        if sep is not None:
+            values = values.str.split(sep).explode()
+        values = values.str.strip()
+        values = values.where(values != '', None)
+        rows = np.arange(n) if sep is None else df.index.get_indexer(values.index)
+        add(values, 'account', rows)
+
+    if columns:
+        rows = np.concatenate([r for r, _ in columns])
+        hashes = np.concatenate([h for _, h in columns])
+    else:
+        rows, hashes = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint64)
+    order = np.lexsort((hashes, rows))
+    rows, hashes = rows[order], hashes[order]
+    # Повтор токена в строке (логин = email) считается один раз
+    keep = np.ones(len(rows), dtype=bool)
+    keep[1:] = (rows[1:] != rows[:-1]) | (hashes[1:] != hashes[:-1])
+    rows, hashes = rows[keep], hashes[keep]
+    count = np.bincount(rows, minlength=n)
+    tokens = np.zeros((n, int(count.max(initial=0))), dtype=np.uint64)
+    tokens[rows, np.arange(len(rows)) - (np.cumsum(count) - count)[rows]] = hashes
+    return {'tokens': tokens, **keys}
+
+
+def concat_features(parts: list) -> dict:
+    """Склейка tokenize() по кускам выгрузки; матрицы токенов добиваются нулями."""
+    width = max(p['tokens'].shape[1] for p in parts)
+    tokens = np.zeros((sum(len(p['tokens']) for p in parts), width), dtype=np.uint64)
+    start = 0
+    for p in parts:
+        tokens[start:start + len(p['tokens']), :p['tokens'].shape[1]] = p['tokens']
+        start += len(p['tokens'])
+    result = {'tokens': tokens}
+    for name in ('phone_key', 'inn_key', 'email_key', 'email_hash'):
+        result[name] = np.concatenate([p[name] for p in parts])
+    return result
+
+
+def _window_pairs(keys: tuple, present: np.ndarray, window: int, equal_only: bool):
+    """Пары соседей в окне после сортировки строк по keys (последний ключ — главный)."""
+    rows = np.flatnonzero(present)
+    order = rows[np.lexsort(tuple(k[rows] for k in keys))]
+    main = keys[-1][order]
+    us, vs = [], []
+    for d in range(1, window):
+        u, v = order[:-d], order[d:]
+        if equal_only:
+            same = main[:-d] == main[d:]
+            u, v = u[same], v[same]
+        us.append(u)
+        vs.append(v)
+    return np.concatenate(us), np.concatenate(vs)
+
+
+def _minhash(tokens: np.ndarray, a: np.uint64, c: np.uint64) -> np.ndarray:
+    """Минимум хэша a·t + c (старшие 32 бита) по токенам строки."""
+    values = (tokens * a + c) >> np.uint64(32)
+    values[tokens == 0] = np.uint64(0xFFFFFFFF)
+    return values.min(axis=1)
+
+
+def lsh_band_keys(tokens: np.ndarray, bands=BANDS, rows_per_band=ROWS_PER_BAND, seed=0):
+    """Ключи полос MinHash/LSH по одной на проход — вся сигнатура в памяти не держится."""
+    rng = np.random.default_rng(seed)
+    params = rng.integers(0, 2 ** 63, size=(bands, rows_per_band, 2), dtype=np.uint64)
+    params[:, :, 0] |= np.uint64(1)
+    for band in range(bands):
+        key = np.zeros(len(tokens), dtype=np.uint64)
+        for start in range(0, len(tokens), PAIR_CHUNK):
+            part = tokens[start:start + PAIR_CHUNK]
+            for a, c in params[band]:
+                key[start:start + PAIR_CHUNK] = ((key[start:start + PAIR_CHUNK] << np.uint64(64 // rows_per_band))
+                                                 ^ _minhash(part, a, c))
+        yield key
+
+
+def jaccard(tokens: np.ndarray, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Точный коэффициент Жаккара множеств токенов пар строк (u, v)."""
+    result = np.zeros(len(u), dtype=np.float32)
+    for start in range(0, len(u), PAIR_CHUNK):
+        a = tokens[u[start:start + PAIR_CHUNK]]
+        b = tokens[v[start:start + PAIR_CHUNK]]
+        shared = ((a[:, :, None] == b[:, None, :]) & (a[:, :, None] != 0)).sum(axis=(1, 2))
+        union = (a != 0).sum(axis=1) + (b != 0).sum(axis=1) - shared
+        result[start:start + PAIR_CHUNK] = shared / np.maximum(union, 1)
+    return result
+
+
+def connected_components(n: int, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Метка кластера каждой строки — наименьший номер строки компоненты."""
+    labels = np.arange(n)
+    while True:
+        lu, lv = labels[u], labels[v]
+        differ = lu != lv
+        if not differ.any():
+            return labels
+        # Корень с большим номером подвешивается к меньшему, затем сжатие путей
+        low = np.minimum(lu[differ], lv[differ])
+        np.minimum.at(labels, lu[differ], low)
+        np.minimum.at(labels, lv[differ], low)
+        while True:
+            parent = labels[labels]
+            if np.array_equal(parent, labels):
+                break
+            labels = parent
+
+
+def find_duplicates(features: dict, window=WINDOW, bands=BANDS, rows_per_band=ROWS_PER_BAND,
+                    min_jaccard=MIN_JACCARD, seed=0) -> dict:
+    """Кластеры дублей по tokenize() / concat_features().
+
+    Возвращает dict: labels (метка кластера строки), pairs_u / pairs_v / score —
+    принятые пары, candidates — число оценённых пар по проходам, seconds —
+    время проходов.
+    """
+    tokens = features['tokens']
+    n = len(tokens)
+    has_tokens = (tokens != 0).any(axis=1)
+    passes = [
+        ('phone', lambda: _window_pairs((features['phone_key'],), features['phone_key'] >= 0, window, False)),
+        ('inn', lambda: _window_pairs((features['inn_key'],), features['inn_key'] >= 0, window, False)),
+        ('email', lambda: _window_pairs((features['email_hash'], features['email_key']),
+                                        features['email_key'] != 0, window, False)),
+    ]
+    for band, key in enumerate(lsh_band_keys(tokens, bands, rows_per_band, seed)):
+        passes.append((f'lsh{band}', lambda key=key: _window_pairs((key,), has_tokens, window, True)))
+
+    candidates, seconds = {}, {}
+    accepted_u, accepted_v = [], []
+    for name, make_pairs in passes:
+        started = time.perf_counter()
+        u, v = make_pairs()
+        score = jaccard(tokens, u, v)
+        keep = score >= min_jaccard
+        accepted_u.append(np.minimum(u[keep], v[keep]))
+        accepted_v.append(np.maximum(u[keep], v[keep]))
+        candidates[name] = len(u)
+        seconds[name] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    pairs = np.unique(np.concatenate(accepted_u).astype(np.int64) * n + np.concatenate(accepted_v))
+    u, v = pairs // n, pairs % n
+    labels = connected_components(n, u, v)
+    seconds['clusters'] = time.perf_counter() - started
+    return {
+        'labels': labels,
+        'pairs_u': u,
+        'pairs_v': v,
+        'score': jaccard(tokens, u, v),
+        'candidates': candidates,
+        'seconds': seconds,
+    }
+
+
+def _group_sizes(keys: np.ndarray) -> np.ndarray:
+    """Размер группы каждой строки по ключу."""
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    return counts[inverse]
+
+
+def _pair_count(sizes: np.ndarray) -> int:
+    """Число пар внутри групп по размеру группы каждой строки."""
+    return int(((sizes - 1) / 2).sum())
+
+
+def cluster_metrics(labels: np.ndarray, truth: np.ndarray) -> dict:
+    """Точность/полнота кластеров относительно известных дублей.
+
+    truth — номер сущности строки (-1 — заведомо уникальная, например prospect).
+    Попарные метрики считаются по парам внутри кластеров, кластерные — по
+    кластерам из двух и более строк, совпавшим с истинными в точности.
+    """
+    n = len(labels)
+    truth = np.where(truth >= 0, truth, -1 - np.arange(n))
+    pred_size = _group_sizes(labels)
+    true_size = _group_sizes(truth)
+    _, truth_codes = np.unique(truth, return_inverse=True)
+    joint_size = _group_sizes(labels.astype(np.int64) * n + truth_codes)
+
+    pred_pairs, true_pairs, hit_pairs = _pair_count(pred_size), _pair_count(true_size), _pair_count(joint_size)
+    is_label = labels == np.arange(n)  # одна строка на предсказанный кластер
+    pred_clusters = int((is_label & (pred_size > 1)).sum())
+    true_clusters = len(np.unique(truth[true_size > 1]))
+    exact = int((is_label & (pred_size > 1) & (joint_size == pred_size) & (true_size == pred_size)).sum())
+    return {
+        'rows': n,
+        'pred_clusters': pred_clusters,
+        'true_clusters': true_clusters,
+        'exact_clusters': exact,
+        'cluster_precision': exact / max(pred_clusters, 1),
+        'cluster_recall': exact / max(true_clusters, 1),
+        'pair_precision': hit_pairs / max(pred_pairs, 1),
+        'pair_recall': hit_pairs / max(true_pairs, 1),
+    }
+
+
+def _print_result(title: str, result: dict, m: dict):
+    n = m['rows']
+    total = sum(result['candidates'].values())
+    print(f'--- {title} ---')
+    print(f'Строк: {n:,}, пар-кандидатов: {total:,} ({total / max(n, 1):.2f} на строку, '
+          f'reduction ratio {1 - total / max(n * (n - 1) / 2, 1):.8f}), принято пар: {len(result["pairs_u"]):,}')
+    print('Проходы: ' + ', '.join(f'{name} {count:,} пар/{result["seconds"][name]:.1f} с'
+                                 for name, count in result['candidates'].items()))
+    print(f'Кластеры: найдено {m["pred_clusters"]:,}, истинных {m["true_clusters"]:,}, '
+          f'совпали в точности {m["exact_clusters"]:,}')
+    print(f'Кластеры — точность: {m["cluster_precision"]:.4f}, полнота: {m["cluster_recall"]:.4f}; '
+          f'пары — точность: {m["pair_precision"]:.4f}, полнота: {m["pair_recall"]:.4f}')
+
+
+def _evaluate_demo():
+    """Дубли в демо-выгрузках CRM и ЛК.
+
+    Истинная сущность строки — клиент общей базы по неизменяемым полям (ИНН
+    для CRM, лицевой счёт или email для ЛК): дубли генераторов — копии
+    записей клиента, prospects в базе не найдутся и считаются уникальными.
+    """
+    from shared_clients import get_or_create_clients
+
+    base = os.path.dirname(os.path.abspath(__file__))
+    clients = get_or_create_clients()
+    by_inn = {c['inn']: i for i, c in enumerate(clients)}
+    by_email = {c['email']: i for i, c in enumerate(clients)}
+    by_account = {acc: i for i, c in enumerate(clients) for acc in c['accounts']}
+
+    crm = pd.read_csv(os.path.join(base, 'crm_clients.csv'), sep=';', dtype=str, encoding='utf-8-sig')
+    crm = crm.astype(object).where(crm.notna(), None)
+    truth = np.array([by_inn.get(inn, -1) for inn in crm['inn']], dtype=np.int64)
+    result = find_duplicates(tokenize(crm))
+    _print_result('CRM: дубли клиентов', result, cluster_metrics(result['labels'], truth))
+
+    portal = pd.read_csv(os.path.join(base, 'portal_activity_q4_2025.csv'), sep=';', dtype=str, encoding='utf-8-sig')
+    portal = portal.astype(object).where(portal.notna(), None)
+    truth = np.array([
+        by_account.get(acc, by_email.get(email, -1))
+        for acc, email in zip(portal['account_number'], portal['email'])
+    ], dtype=np.int64)
+    result = find_duplicates(tokenize(portal))
+    _print_result('ЛК: мульти-ЛК', result, cluster_metrics(result['labels'], truth))
+
+
+def _bench_chunk(clients, start: int, rng: np.random.Generator, dup_rate: float, bench_anomalies: list):
+    """Кусок синтетической CRM: клиенты базы, копии dup_rate из них, аномалии поверх."""
+    from anomalies import apply_anomalies
+
+    rows = list(clients)
+    df = pd.DataFrame({
+        'client_id': [c['client_id'] for c in rows],
+        'inn': [c['inn'] for c in rows],
+        'phone': [c['phone'] for c in rows],
+        'email': [c['email'] for c in rows],
+        'account_numbers': [';'.join(c['accounts']) for c in rows],
+    }, dtype=object)
+    truth = start + np.arange(len(df))
+    dups = np.sort(rng.choice(len(df), size=int(len(df) * dup_rate), replace=False))
+    df = pd.concat([df, df.iloc[dups]], ignore_index=True)
+    truth = np.concatenate([truth, truth[dups]])
+    # Аномалии независимо у оригинала и копии — копия перестаёт быть точной
+    apply_anomalies(df, bench_anomalies, rng)
+    return df, truth
+
+
+def _bench(n: int, seed=42, dup_rate=0.02, chunk=250_000):
+    """Синтетическая CRM на n строк: counter-база, 2% копий, аномалии телефона, email и счетов."""
+    from anomalies import Anomaly, constant
+    from counter_clients import generate_counter_clients
+    from gen_billing import _phone_alt_format
+    from gen_crm import _stale_email
+
+    bench_anomalies = [
+        Anomaly('alt_phone_format', 'phone', _phone_alt_format, rate=0.3),
+        Anomaly('stale_email', 'email', _stale_email, rate=0.05),
+        Anomaly('empty_accounts', 'account_numbers', constant(''), rate=0.02),
+    ]
+    started = time.perf_counter()
+    n_clients = int(n / (1 + dup_rate))
+    base = generate_counter_clients(n_b2c=n_clients * 7 // 10, n_b2b=n_clients - n_clients * 7 // 10, seed=seed)
+    rng = np.random.default_rng(seed)
+    parts, truths = [], []
+    tokenize_s = 0.0
+    for start in range(0, n_clients, chunk):
+        df, truth = _bench_chunk(base.clients_in_range(start, min(start + chunk, n_clients)), start, rng,
+                                 dup_rate, bench_anomalies)
+        tokenize_started = time.perf_counter()
+        parts.append(tokenize(df))
+        tokenize_s += time.perf_counter() - tokenize_started
+        truths.append(truth)
+    features = concat_features(parts)
+    del parts
+    truth = np.concatenate(truths)
+    rows = len(truth)
+    prepare = time.perf_counter() - started
+    print(f'=== Поиск дублей, синтетическая CRM на {rows:,} строк ===')
+    print(f'Подготовка данных: {prepare - tokenize_s:.1f} с, токены: {tokenize_s:.1f} с '
+          f'({rows / tokenize_s:,.0f} строк/с), матрица токенов {features["tokens"].nbytes / 2 ** 20:,.0f} MB')
+
+    started = time.perf_counter()
+    result = find_duplicates(features, seed=seed)
+    elapsed = time.perf_counter() - started
+    print(f'Поиск: {elapsed:.1f} с ({rows / elapsed:,.0f} строк/с)')
+    _print_result(f'{dup_rate:.0%} копий с аномалиями', result, cluster_metrics(result['labels'], truth))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Поиск дублей CRM и мульти-ЛК')
+    parser.add_argument('--bench', type=int, default=None, help='число строк синтетической CRM')
+    args = parser.parse_args()
+
+    if args.bench:
+        _bench(args.bench)
+    else:
+        _evaluate_demo()
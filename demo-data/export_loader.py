@@ -0,0 +1,237 @@
+"""
+Загрузка демо-выгрузок по схеме (export_schema.py).
+
+Колонки сразу получают свои типы: ИНН и телефон — строки, тарифы и
+статусы — category, суммы и счётчики — числа, даты — datetime64[ms],
+списки ('ЛС-1;ЛС-2' в CRM, 'Интернет;VPN' в ЛК) — уже разбитые кортежи
+(пустое поле -> ()). Пустое поле остальных колонок — пропуск, а строки
+'NA', 'null' и т.п. остаются строками.
+
+Читает pyarrow.csv, если pyarrow установлен (многопоточный разбор, типы
+задаются до чтения), иначе pd.read_csv; результат у обоих одинаковый.
+
+    df = read_export('crm_clients.csv')
+    for chunk in iter_export('billing_q4_2025.csv', chunk_size=500_000,
+                             columns=['account_number', 'balance']):
+        ...
+
+Категории при чтении кусками считаются по каждому куску отдельно.
+Бенчмарк против простого pd.read_csv на файле из повторённых демо-строк:
+
+    python export_loader.py --bench 1000000
+"""
+
+import argparse
+import importlib.util
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from export_schema import ENCODING, LIST_SEP, SCHEMAS, SEP, column_types, schema_for_path
+
+CHUNK_SIZE = 200_000
+ENGINES = ('auto', 'pyarrow', 'pandas')
+# Байт на блок потокового чтения pyarrow
+_BLOCK_SIZE = 16 << 20
+_PANDAS_DTYPES = {'str': 'str', 'category': 'category', 'float': 'float64', 'int': 'int64', 'date': 'str', 'list': 'str'}
+
+
+def _engine(engine: str) -> str:
+    if engine not in ENGINES:
+        raise ValueError(f'Неизвестный движок {engine} (есть: {", ".join(ENGINES)})')
+    if engine == 'auto':
+        return 'pyarrow' if importlib.util.find_spec('pyarrow') is not None else 'pandas'
+    if engine == 'pyarrow' and importlib.util.find_spec('pyarrow') is None:
+        raise ValueError('Для engine=pyarrow нужен пакет pyarrow')
+    return engine
+
+
+def _split_lists(values: pd.Series) -> pd.Series:
+    """'a;b' -> ('a', 'b'), пропуск -> ().
+
+    Разбивается каждое различное значение один раз (наборы услуг сильно
+    повторяются); кортежи неизменяемы, поэтому общий объект у равных строк безопасен.
+    """
+    codes, uniques = pd.factorize(values)
+    split = np.empty(len(uniques) + 1, dtype=object)
+    split[:-1] = [tuple(v.split(LIST_SEP)) for v in uniques]
+    split[-1] = ()
+    return pd.Series(split[codes], index=values.index, dtype=object, name=values.name)
+
+
+def _finish(df: pd.DataFrame, types: dict) -> pd.DataFrame:
+    """Доводит типы после чтения любым движком: даты, списки, порядок категорий."""
+    # read_csv отдаёт usecols в порядке файла, pyarrow — в порядке запроса
+    if list(df.columns) != list(types):
+        df = df[list(types)]
+    for column, kind in types.items():
+        if kind == 'date':
+            if df[column].dtype != 'datetime64[ms]':
+                df[column] = pd.to_datetime(df[column], format='%Y-%m-%d').astype('datetime64[ms]')
+        elif kind == 'list':
+            df[column] = _split_lists(df[column])
+        elif kind == 'category':
+            # pyarrow кладёт категории в порядке появления, read_csv — по алфавиту
+            categories = df[column].cat.categories
+            if not categories.is_monotonic_increasing:
+                df[column] = df[column].cat.reorder_categories(categories.sort_values())
+    return df
+
+
+def _pandas_options(types: dict) -> dict:
+    return {
+        'sep': SEP,
+        'encoding': ENCODING,
+        'usecols': list(types),
+        'dtype': {column: _PANDAS_DTYPES[kind] for column, kind in types.items()},
+        'keep_default_na': False,
+        'na_values': [''],
+    }
+
+
+def _arrow_options(types: dict, block_size=None) -> dict:
+    import pyarrow as pa
+    from pyarrow import csv
+
+    arrow_types = {
+        'str': pa.string(), 'category': pa.dictionary(pa.int32(), pa.string()), 'float': pa.float64(),
+        'int': pa.int64(), 'date': pa.date32(), 'list': pa.string(),
+    }
+    read_options = csv.ReadOptions(block_size=block_size) if block_size else csv.ReadOptions()
+    return {
+        'read_options': read_options,
+        'parse_options': csv.ParseOptions(delimiter=SEP),
+        'convert_options': csv.ConvertOptions(
+            column_types={column: arrow_types[kind] for column, kind in types.items()},
+            include_columns=list(types),
+            null_values=[''],
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=True,
+        ),
+    }
+
+
+def _types(path: str, schema, columns) -> dict:
+    return column_types(schema or schema_for_path(path), columns)
+
+
+def read_export(path: str, schema=None, columns=None, engine='auto') -> pd.DataFrame:
+    """Выгрузка целиком с типами по схеме.
+
+    schema — 'billing' | 'crm' | 'portal' (по умолчанию по имени файла),
+    columns — только эти колонки, engine — 'auto' | 'pyarrow' | 'pandas'.
+    """
+    types = _types(path, schema, columns)
+    if _engine(engine) == 'pyarrow':
+        from pyarrow import csv
+
+        df = csv.read_csv(path, **_arrow_options(types)).to_pandas(date_as_object=False)
+    else:
+        df = pd.read_csv(path, **_pandas_options(types))
+    return _finish(df, types)
+
+
+def iter_export(path: str, schema=None, columns=None, chunk_size=CHUNK_SIZE, engine='auto'):
+    """Выгрузка кусками по chunk_size строк (последний — короче) с типами по схеме."""
+    types = _types(path, schema, columns)
+    if _engine(engine) == 'pandas':
+        for chunk in pd.read_csv(path, chunksize=chunk_size, **_pandas_options(types)):
+            yield _finish(chunk, types)
+        return
+
+    import pyarrow as pa
+    from pyarrow import csv
+
+    # Блоки pyarrow меряются байтами — строки перекладываются в куски по chunk_size
+    pending, pending_rows = [], 0
+    with csv.open_csv(path, **_arrow_options(types, _BLOCK_SIZE)) as reader:
+        for batch in reader:
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            while pending_rows >= chunk_size:
+                table = pa.Table.from_batches(pending)
+                yield _finish(table.slice(0, chunk_size).to_pandas(date_as_object=False), types)
+                rest = table.slice(chunk_size)
+                pending, pending_rows = rest.to_batches(), rest.num_rows
+    if pending_rows:
+        yield _finish(pa.Table.from_batches(pending).to_pandas(date_as_object=False), types)
+
+
+def _repeat_csv(source: str, n_rows: int, path: str):
+    """CSV из строк source, повторённых до n_rows строк (заголовок один раз)."""
+    with open(source, encoding=ENCODING) as f:
+        header = f.readline()
+        lines = [line for line in f if line.strip()]
+    with open(path, 'w', encoding=ENCODING, newline='') as f:
+        f.write(header)
+        for start in range(0, n_rows, len(lines)):
+            f.writelines(lines[:min(len(lines), n_rows - start)])
+
+
+def _timed(load) -> tuple:
+    started = time.perf_counter()
+    df = load()
+    return time.perf_counter() - started, df
+
+
+def _bench(n_rows: int, data_dir: str) -> list:
+    """Время загрузки каждой выгрузки, размноженной до n_rows строк: read_csv без схемы против read_export.
+
+    В размноженном файле различных списков мало, так что их разбиение здесь
+    почти бесплатно; у настоящей CRM на миллион клиентов оно заметно дороже.
+    """
+    results = []
+    with tempfile.TemporaryDirectory(prefix='export-loader-') as tmp_dir:
+        for name, schema in SCHEMAS.items():
+            path = os.path.join(tmp_dir, schema['file'])
+            _repeat_csv(os.path.join(data_dir, schema['file']), n_rows, path)
+            plain_seconds, plain = _timed(lambda: pd.read_csv(path, sep=SEP, encoding=ENCODING))
+            str_seconds, _ = _timed(lambda: pd.read_csv(path, sep=SEP, encoding=ENCODING, dtype=str))
+            result = {
+                'export': name,
+                'rows': n_rows,
+                'mb': round(os.path.getsize(path) / 2 ** 20, 1),
+                'read_csv': round(plain_seconds, 3),
+                'read_csv_str': round(str_seconds, 3),
+                'read_csv_memory_mb': round(plain.memory_usage(deep=True).sum() / 2 ** 20, 1),
+            }
+            del plain
+            for engine in ('pandas', 'pyarrow') if importlib.util.find_spec('pyarrow') else ('pandas',):
+                seconds, df = _timed(lambda: read_export(path, name, engine=engine))
+                result[f'schema_{engine}'] = round(seconds, 3)
+                result[f'schema_{engine}_memory_mb'] = round(df.memory_usage(deep=True).sum() / 2 ** 20, 1)
+            results.append(result)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Загрузка демо-выгрузок по схеме')
+    parser.add_argument('paths', nargs='*', help='CSV выгрузок (схема — по имени файла)')
+    parser.add_argument('--schema', choices=sorted(SCHEMAS), help='схема (по умолчанию — по имени файла)')
+    parser.add_argument('--engine', choices=ENGINES, default='auto')
+    parser.add_argument('--bench', type=int, default=0, help='замер загрузки на N строк каждой выгрузки')
+    parser.add_argument('--data-dir', default=os.path.dirname(os.path.abspath(__file__)),
+                        help='откуда брать строки для --bench')
+    args = parser.parse_args()
+
+    if args.bench:
+        for r in _bench(args.bench, args.data_dir):
+            print(f'=== {r["export"]}: {r["rows"]:,} строк, {r["mb"]} МБ ===')
+            print(f'  pd.read_csv (угадывание типов): {r["read_csv"]:.2f} с, {r["read_csv_memory_mb"]} МБ в памяти')
+            print(f'  pd.read_csv (dtype=str):        {r["read_csv_str"]:.2f} с')
+            for engine in ('pandas', 'pyarrow'):
+                if f'schema_{engine}' in r:
+                    print(f'  read_export ({engine}):{" " * (11 - len(engine))}{r[f"schema_{engine}"]:.2f} с, '
+                          f'{r[f"schema_{engine}_memory_mb"]} МБ в памяти')
+    else:
+        for path in args.paths:
+            started = time.perf_counter()
+            try:
+                df = read_export(path, args.schema, engine=args.engine)
+            except ValueError as e:
+                parser.error(str(e))
+            print(f'=== {os.path.basename(path)}: {len(df):,} строк за {time.perf_counter() - started:.2f} с ===')
+            print(df.dtypes.to_string())
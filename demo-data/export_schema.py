@@ -0,0 +1,105 @@
+"""
+Схема трёх демо-выгрузок: формат файла и тип каждой колонки.
+
+Все выгрузки пишутся одинаково — разделитель ';', кодировка utf-8-sig
+(BOM в начале), пустое поле — пропуск. Типы колонок:
+
+    str       — строка как есть: ИНН и телефон числами не читаются,
+                ведущие нули и «+7(...)» — сами данные (inn_trimmed
+                срезает нули, alt_phone_format меняет запись);
+    category  — немного различных значений (тариф, статус, регион);
+    float     — суммы биллинга;
+    int       — счётчики ЛК;
+    date      — ISO-дата 'YYYY-MM-DD';
+    list      — несколько значений через ';' внутри ';'-файла (поле
+                в кавычках): счета клиента в CRM, услуги в ЛК.
+
+Генераторы берут отсюда порядок колонок, загрузчик (export_loader.py) —
+типы, так что форматы не приходится угадывать в каждом потребителе.
+"""
+
+import os
+
+SEP = ';'
+ENCODING = 'utf-8-sig'
+LIST_SEP = ';'
+TYPES = ('str', 'category', 'float', 'int', 'date', 'list')
+
+# Выгрузка -> имя файла и колонки в порядке записи с их типами
+SCHEMAS = {
+    'billing': {
+        'file': 'billing_q4_2025.csv',
+        'columns': {
+            'account_number': 'str',
+            'period': 'category',
+            'tariff': 'category',
+            'charged_amount': 'float',
+            'paid_amount': 'float',
+            'balance': 'float',
+            'last_payment_date': 'date',
+            'inn': 'str',
+            'phone': 'str',
+            'status': 'category',
+        },
+    },
+    'crm': {
+        'file': 'crm_clients.csv',
+        'columns': {
+            'client_id': 'str',
+            'segment': 'category',
+            'company_name': 'str',
+            'contact_name': 'str',
+            'inn': 'str',
+            'phone': 'str',
+            'email': 'str',
+            'region': 'category',
+            'manager': 'category',
+            'contract_date': 'date',
+            'account_numbers': 'list',
+            'status': 'category',
+            'last_activity_date': 'date',
+        },
+    },
+    'portal': {
+        'file': 'portal_activity_q4_2025.csv',
+        'columns': {
+            'user_login': 'str',
+            'portal_type': 'category',
+            'account_number': 'str',
+            'display_name': 'str',
+            'email': 'str',
+            'phone': 'str',
+            'last_login_date': 'date',
+            'logins_count_q4': 'int',
+            'tickets_count_q4': 'int',
+            'payments_online_q4': 'int',
+            'services_active': 'list',
+            'registered_date': 'date',
+        },
+    },
+}
+
+
+def column_names(name: str) -> list:
+    """Колонки выгрузки name в порядке записи."""
+    return list(SCHEMAS[name]['columns'])
+
+
+def column_types(name: str, columns=None) -> dict:
+    """{колонка: тип} выгрузки name; columns — подмножество (неизвестная колонка -> KeyError)."""
+    types = SCHEMAS[name]['columns']
+    if columns is None:
+        return dict(types)
+    unknown = [c for c in columns if c not in types]
+    if unknown:
+        raise KeyError(f'В выгрузке {name} нет колонок: {", ".join(unknown)}')
+    return {c: types[c] for c in columns}
+
+
+def schema_for_path(path: str) -> str:
+    """Имя выгрузки по имени файла (billing_q4_2025.csv, .csv.gz и т.п.) или ValueError."""
+    base = os.path.basename(path)
+    for name, schema in SCHEMAS.items():
+        if base.startswith(os.path.splitext(schema['file'])[0]):
+            return name
+    raise ValueError(f'Не удалось определить выгрузку по имени {base}: укажите схему явно')
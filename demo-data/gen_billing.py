@@ -3,14 +3,26 @@
 Создаёт billing_q4_2025.csv с ~5000-5500 записями.
 """
 
+import argparse
+import json
 import os
 import random
-from datetime import date, timedelta
 
+import anomalies
+import numpy as np
 import pandas as pd
+from anomalies import Anomaly, apply_anomalies, count_stats, lstrip, set_null
+from billing_ledger import month_periods, simulate_ledger
+from client_table import AccountRows
+from export_schema import column_names
+from identities import random_account_number
+from manifest import Manifest, manifest_path
+from output_formats import COMPRESSED_FORMATS, parse_formats, print_outputs, write_formats
+from profiling import NULL_PROFILER, PhaseProfiler, print_profile
 from shared_clients import get_or_create_clients
 
 random.seed(42)
+anomalies.seed(42)
 
 TARIFF_PRICES = {
     'Домашний-100': (550, 750),
@@ -27,17 +39,38 @@ TARIFF_PRICES = {
 
 PERIODS = ['2025-10', '2025-11', '2025-12']
 
+STATUSES = ['active', 'suspended', 'closed']
+
+# Формат чекпоинта состояния счетов для extend_billing
+CHECKPOINT_VERSION = 1
+
+# Диапазон начисления для тарифа не из TARIFF_PRICES
+DEFAULT_PRICE_RANGE = (500, 1000)
+# Счетов на блок леджера: массивы (период, счёт) и строки считаются по блоку за раз
+_LEDGER_BLOCK = 10_000
+
+# Порядок колонок — из общей схемы выгрузок (export_schema.py)
+BILLING_COLUMNS = column_names('billing')
 
-def _phone_alt_format(phone: str) -> str:
-    """Переформатирует телефон в другой формат для аномалий."""
-    digits = ''.join(c for c in phone if c.isdigit())  # 7903XXXXXXX
-    fmt = random.choice(['8format', 'no_parens', 'spaces'])
-    if fmt == '8format':
-        return '8' + digits[1:]  # 8903XXXXXXX
-    elif fmt == 'no_parens':
-        return digits[:4] + digits[4:7] + '-' + digits[7:9] + '-' + digits[9:]
-    else:
-        return f'+7 {digits[1:4]} {digits[4:7]} {digits[7:9]} {digits[9:]}'
+
+def _phone_alt_format(values, rows, rng):
+    """Переформатирует телефоны в другой формат для аномалий."""
+    digits = values.str.replace(r'\D', '', regex=True)  # 7903XXXXXXX
+    fmt = rng.integers(0, 3, size=len(values))
+    eight = '8' + digits.str[1:]  # 8903XXXXXXX
+    no_parens = digits.str[:4] + digits.str[4:7] + '-' + digits.str[7:9] + '-' + digits.str[9:]
+    spaces = '+7 ' + digits.str[1:4] + ' ' + digits.str[4:7] + ' ' + digits.str[7:9] + ' ' + digits.str[9:]
+    return eight.where(fmt == 0, no_parens.where(fmt == 1, spaces))
+
+
+# Аномалии телефона и ИНН — на уровне счёта, одинаковы во всех периодах
+BILLING_ANOMALIES = [
+    Anomaly('null_phone', 'phone', set_null(), count=25),
+    Anomaly('alt_phone_format', 'phone', _phone_alt_format, rate=0.3, skip=['null_phone']),
+    Anomaly('null_inn', 'inn', set_null(), count=13),
+    Anomaly('inn_trimmed', 'inn', lstrip('0'), count=6, skip=['null_inn'],
+            where=lambda df: df['inn'].str.startswith(('0', '1', '2')).fillna(False)),
+]
 
 
 def _generate_orphan_accounts(n=25) -> list:
@@ -45,7 +78,7 @@ def _generate_orphan_accounts(n=25) -> list:
     orphans = []
     for _ in range(n):
         region_code = random.choice(['77', '78', '54', '66', '16', '52', '61'])
-        acc = f'ЛС-{region_code}' + ''.join([str(random.randint(0, 9)) for _ in range(7)])
+        acc = random_account_number(random, region_code)
         tariff = random.choice(list(TARIFF_PRICES.keys()))
         orphans.append({
             'account_number': acc,
@@ -57,11 +90,9 @@ def _generate_orphan_accounts(n=25) -> list:
     return orphans
 
 
-def generate_billing():
-    clients = get_or_create_clients()
-
-    rows = []
-    stats = {
+def _new_stats() -> dict:
+    """Счётчики аномалий выгрузки."""
+    return {
         'orphans': 0,
         'duplicates': 0,
         'negative_charges': 0,
@@ -72,181 +103,475 @@ def generate_billing():
         'debtors': 0,
     }
 
-    # Собрать все лицевые счета
-    account_records = []
-    for client in clients:
-        for acc in client['accounts']:
-            account_records.append({
-                'account_number': acc,
-                'tariff': client['tariff'],
-                'inn': client['inn'],
-                'phone': client['phone'],
-                'segment': client['segment'],
-            })
 
+def _price_ranges(account_records) -> np.ndarray:
+    """Диапазон начисления тарифа каждого счёта, массив (счетов, 2)."""
+    if isinstance(account_records, AccountRows):
+        # Тариф — код категории клиента-владельца; код -1 (нет тарифа) попадает на последний, запасной диапазон
+        table = account_records.table
+        ranges = [TARIFF_PRICES.get(t, DEFAULT_PRICE_RANGE) for t in table.categories['tariff']]
+        ranges = np.array(ranges + [DEFAULT_PRICE_RANGE], dtype=np.float64)
+        return ranges[table.codes['tariff'][table.account_owner]]
+    ranges = [TARIFF_PRICES.get(r['tariff'], DEFAULT_PRICE_RANGE) for r in account_records]
+    return np.array(ranges, dtype=np.float64).reshape(-1, 2)
+
+
+def _opening_payments(n: int, first_period: str, seed: int) -> np.ndarray:
+    """Дата последнего платежа до первого периода: у половины счетов — за 1-270 дней
+    до его начала, у остальных платежей не было (NaT)."""
+    rng = np.random.default_rng(seed)
+    opening = np.datetime64(f'{first_period}-01') - rng.integers(1, 271, size=n).astype('timedelta64[D]')
+    opening[rng.random(n) < 0.5] = np.datetime64('NaT')
+    return opening
+
+
+def _ledger_block_seed(ledger_seed: int, block: int) -> int:
+    """Seed леджера блока счетов: блок 0 — сам ledger_seed, остальные выводятся из (ledger_seed, блок)."""
+    if block == 0:
+        return ledger_seed
+    return int(np.random.SeedSequence([ledger_seed, block]).generate_state(1)[0])
+
+
+def _date_strings(dates: np.ndarray) -> np.ndarray:
+    """datetime64[D] -> object-массив 'YYYY-MM-DD', NaT -> None."""
+    strings = np.datetime_as_string(dates).astype(object)
+    strings[np.isnat(dates)] = None
+    return strings
+
+
+def _chunked(rows, chunk_size: int):
+    """Режет поток строк на списки не длиннее chunk_size."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _write_csv_stream(rows, output_path: str, chunk_size: int, profiler=NULL_PROFILER) -> int:
+    """Пишет строки в CSV чанками; BOM и заголовок пишутся один раз.
+
+    В памяти одновременно живёт не больше chunk_size строк.
+    Возвращает число записанных строк.
+    """
+    n_rows = 0
+    with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+        for chunk in _chunked(rows, chunk_size):
+            with profiler.phase('dataframe') as phase:
+                df = pd.DataFrame(chunk, columns=BILLING_COLUMNS)
+                phase.rows += len(chunk)
+            with profiler.phase('to_csv') as phase:
+                df.to_csv(f, sep=';', index=False, header=n_rows == 0)
+                phase.rows += len(chunk)
+            n_rows += len(chunk)
+        if n_rows == 0:
+            pd.DataFrame(columns=BILLING_COLUMNS).to_csv(f, sep=';', index=False)
+    return n_rows
+
+
+def _billing_rows(account_records, stats: dict, profiler=NULL_PROFILER, state=None, manifest=None,
+                  periods=PERIODS):
+    """Строки биллинга по одной, в порядке записи в CSV. Заполняет stats.
+
+    Начисления, оплаты, сальдо и даты платежей счетов за periods считаются
+    массивами (simulate_ledger) блоками по _LEDGER_BLOCK счетов с seed из
+    random, так что память не растёт с числом счетов, а шарды sharding.py
+    получают независимые леджеры.
+    Фазы (аномалии, платежи, сторно, сироты, корректировки)
+    размечены для profiler; по умолчанию замеры выключены.
+    state — список, куда складывается состояние каждого счёта на конец
+    последнего периода (для чекпоинта, см. extend_billing).
+    manifest — Manifest, куда пишутся номера строк и счета аномалий.
+    """
     total_accounts = len(account_records)
-
-    # Определить аномалии заранее
-    phone_alt_indices = set(random.sample(range(total_accounts), int(total_accounts * 0.3)))
-    null_phone_indices = set(random.sample(range(total_accounts), min(25, total_accounts)))
-    null_inn_indices = set(random.sample(range(total_accounts), min(13, total_accounts)))
-    inn_trim_candidates = [i for i, r in enumerate(account_records) if r['inn'] and r['inn'].startswith(('0', '1', '2'))]
-    inn_trim_indices = set(random.sample(inn_trim_candidates, min(6, len(inn_trim_candidates)))) if inn_trim_candidates else set()
+    n_periods = len(periods)
+    if manifest is None:
+        manifest = Manifest()
+    # Счёт idx занимает строки idx * n_periods ... + n_periods - 1, дальше — сторно, сироты, корректировки
+    row = total_accounts * n_periods
+
+    # Аномалии телефона и ИНН — по колонкам счетов целиком (см. BILLING_ANOMALIES)
+    with profiler.phase('anomalies') as phase:
+        accounts = pd.DataFrame({
+            'inn': [r['inn'] for r in account_records],
+            'phone': [r['phone'] for r in account_records],
+        }, dtype=object)
+        original_inns = accounts['inn'].to_numpy(copy=True)
+        account_manifest = apply_anomalies(accounts, BILLING_ANOMALIES, anomalies.rng())
+        # У сгенерированных ИНН ведущих нулей нет — в манифест идут только действительно обрезанные
+        trimmed = account_manifest['inn_trimmed']
+        account_manifest['inn_trimmed'] = trimmed[accounts['inn'].to_numpy()[trimmed] != original_inns[trimmed]]
+        stats.update(count_stats(account_manifest))
+        for name, positions in account_manifest.items():
+            manifest.add(name, (positions[:, None] * n_periods + np.arange(n_periods)).ravel(),
+                         account_number=[account_records[i]['account_number'] for i in positions.tolist()])
+        inns = accounts['inn'].tolist()
+        phones = accounts['phone'].tolist()
+        phase.rows += total_accounts
 
     # Статус аккаунтов
-    statuses = []
-    for _ in range(total_accounts):
-        r = random.random()
-        if r < 0.90:
-            statuses.append('active')
-        elif r < 0.97:
-            statuses.append('suspended')
-        else:
-            statuses.append('closed')
-
-    # Счета для дублей по периоду
-    dup_account_indices = random.sample(range(total_accounts), min(8, total_accounts))
-
-    # Генерация записей
-    for idx, rec in enumerate(account_records):
-        acc = rec['account_number']
-        tariff = rec['tariff']
-        inn = rec['inn']
-        phone = rec['phone']
-        status = statuses[idx]
-
-        # Аномалии телефона
-        if idx in null_phone_indices:
-            phone = None
-            stats['null_phone'] += 1
-        elif idx in phone_alt_indices:
-            phone = _phone_alt_format(phone)
-            stats['alt_phone_format'] += 1
-
-        # Аномалии ИНН
-        if idx in null_inn_indices:
-            inn = None
-            stats['null_inn'] += 1
-        elif idx in inn_trim_indices:
-            inn = inn.lstrip('0') if inn else inn
-            stats['inn_trimmed'] += 1
-
-        price_range = TARIFF_PRICES.get(tariff, (500, 1000))
-        balance = 0.0
-
-        for period in PERIODS:
-            charged = round(random.uniform(*price_range), 2)
-
-            # 5% — переплата, 15% — недоплата/ноль, 80% — полная
-            pay_roll = random.random()
-            if pay_roll < 0.05:
-                paid = round(charged * random.uniform(1.01, 1.5), 2)
-            elif pay_roll < 0.20:
-                paid = round(charged * random.uniform(0.0, 0.6), 2) if random.random() > 0.3 else 0.0
+    with profiler.phase('statuses'):
+        statuses = []
+        for _ in range(total_accounts):
+            r = random.random()
+            if r < 0.90:
+                statuses.append('active')
+            elif r < 0.97:
+                statuses.append('suspended')
             else:
-                paid = charged
+                statuses.append('closed')
 
-            balance = round(balance + paid - charged, 2)
-
-            # Дата платежа
-            if paid > 0:
-                month_num = int(period.split('-')[1])
-                pay_day = random.randint(1, 28)
-                last_payment_date = date(2025, month_num, pay_day).isoformat()
-            else:
-                if random.random() < 0.5:
-                    last_payment_date = None
-                else:
-                    old_date = date(2025, random.randint(1, 9), random.randint(1, 28))
-                    last_payment_date = old_date.isoformat()
-
-            rows.append({
-                'account_number': acc,
-                'period': period,
-                'tariff': tariff,
-                'charged_amount': charged,
-                'paid_amount': paid,
-                'balance': balance,
-                'last_payment_date': last_payment_date,
-                'inn': inn,
-                'phone': phone,
-                'status': status,
-            })
-
-        if balance < 0:
-            stats['debtors'] += 1
+    # Счета для дублей по периоду
+    with profiler.phase('anomaly_sample'):
+        dup_account_indices = random.sample(range(total_accounts), min(8, total_accounts))
+
+    # Генерация записей: 5% — переплата, 15% — недоплата/ноль, 80% — полная оплата (см. billing_ledger.py)
+    with profiler.phase('payments') as phase:
+        ledger_seed = random.getrandbits(32)
+        price_ranges = _price_ranges(account_records)
+        # Счета в леджере независимы: он считается блоками, так что массивы (период, счёт) не растут
+        # с числом счетов; блок 0 — прямо с ledger_seed, остальные — с seed, выведенным из него
+        for start in range(0, total_accounts, _LEDGER_BLOCK):
+            stop = min(start + _LEDGER_BLOCK, total_accounts)
+            block_seed = _ledger_block_seed(ledger_seed, start // _LEDGER_BLOCK)
+            ledger = simulate_ledger(price_ranges[start:stop], periods, block_seed,
+                                     last_payment=_opening_payments(stop - start, periods[0], block_seed))
+            charged, paid, balance = (ledger[name].T.tolist() for name in ('charged', 'paid', 'balance'))
+            last_payment = _date_strings(ledger['last_payment']).T.tolist()
+            for k, idx in enumerate(range(start, stop)):
+                rec = account_records[idx]
+                acc = rec['account_number']
+                tariff = rec['tariff']
+                inn = inns[idx]
+                phone = phones[idx]
+                status = statuses[idx]
+                for j, period in enumerate(periods):
+                    yield {
+                        'account_number': acc,
+                        'period': period,
+                        'tariff': tariff,
+                        'charged_amount': charged[k][j],
+                        'paid_amount': paid[k][j],
+                        'balance': balance[k][j],
+                        'last_payment_date': last_payment[k][j],
+                        'inn': inn,
+                        'phone': phone,
+                        'status': status,
+                    }
+                phase.rows += n_periods
+                if state is not None:
+                    state.append((acc, tariff, inn, phone, status, balance[k][-1], last_payment[k][-1]))
+
+            # Долг виден в строке последнего периода счёта
+            debtors = start + np.flatnonzero(ledger['balance'][-1] < 0)
+            stats['debtors'] += len(debtors)
+            manifest.add('debtors', (debtors + 1) * n_periods - 1,
+                         account_number=[account_records[i]['account_number'] for i in debtors.tolist()])
 
     # Дубли по периоду
-    for dup_idx in dup_account_indices:
-        rec = account_records[dup_idx]
-        period = random.choice(PERIODS)
-        price_range = TARIFF_PRICES.get(rec['tariff'], (500, 1000))
-
-        # Сторно + повторное начисление
-        charged_storno = -round(random.uniform(*price_range), 2)
-        rows.append({
-            'account_number': rec['account_number'],
-            'period': period,
-            'tariff': rec['tariff'],
-            'charged_amount': charged_storno,
-            'paid_amount': 0.0,
-            'balance': charged_storno,
-            'last_payment_date': None,
-            'inn': rec['inn'],
-            'phone': rec['phone'],
-            'status': 'active',
-        })
-        stats['duplicates'] += 1
-        stats['negative_charges'] += 1
+    with profiler.phase('storno') as phase:
+        for dup_idx in dup_account_indices:
+            rec = account_records[dup_idx]
+            period = random.choice(periods)
+            price_range = TARIFF_PRICES.get(rec['tariff'], DEFAULT_PRICE_RANGE)
+
+            # Сторно + повторное начисление
+            charged_storno = -round(random.uniform(*price_range), 2)
+            yield {
+                'account_number': rec['account_number'],
+                'period': period,
+                'tariff': rec['tariff'],
+                'charged_amount': charged_storno,
+                'paid_amount': 0.0,
+                'balance': charged_storno,
+                'last_payment_date': None,
+                'inn': rec['inn'],
+                'phone': rec['phone'],
+                'status': 'active',
+            }
+            phase.rows += 1
+            stats['duplicates'] += 1
+            stats['negative_charges'] += 1
+            manifest.add('duplicates', [row], account_number=[rec['account_number']])
+            manifest.add('negative_charges', [row], account_number=[rec['account_number']])
+            row += 1
 
     # Счета-сироты
-    orphans = _generate_orphan_accounts(25)
-    stats['orphans'] = len(orphans)
-    for orph in orphans:
-        for period in PERIODS:
-            price_range = TARIFF_PRICES.get(orph['tariff'], (500, 1000))
-            charged = round(random.uniform(*price_range), 2)
-            rows.append({
-                'account_number': orph['account_number'],
+    with profiler.phase('orphans') as phase:
+        orphans = _generate_orphan_accounts(25)
+        stats['orphans'] = len(orphans)
+        for orph in orphans:
+            # Сирота не платит: долг копится от периода к периоду
+            balance = 0.0
+            for period in periods:
+                price_range = TARIFF_PRICES.get(orph['tariff'], DEFAULT_PRICE_RANGE)
+                charged = round(random.uniform(*price_range), 2)
+                balance = round(balance - charged, 2)
+                yield {
+                    'account_number': orph['account_number'],
+                    'period': period,
+                    'tariff': orph['tariff'],
+                    'charged_amount': charged,
+                    'paid_amount': 0.0,
+                    'balance': balance,
+                    'last_payment_date': None,
+                    'inn': orph['inn'],
+                    'phone': orph['phone'],
+                    'status': orph['status'],
+                }
+            phase.rows += n_periods
+            manifest.add('orphans', range(row, row + n_periods), account_number=[orph['account_number']])
+            row += n_periods
+
+    # Дополнительные отрицательные начисления (корректировки)
+    with profiler.phase('adjustments') as phase:
+        for _ in range(4):
+            rec = random.choice(account_records)
+            period = random.choice(periods)
+            yield {
+                'account_number': rec['account_number'],
                 'period': period,
-                'tariff': orph['tariff'],
-                'charged_amount': charged,
+                'tariff': rec['tariff'],
+                'charged_amount': -round(random.uniform(100, 2000), 2),
                 'paid_amount': 0.0,
-                'balance': -charged,
+                'balance': 0.0,
                 'last_payment_date': None,
-                'inn': orph['inn'],
-                'phone': orph['phone'],
-                'status': orph['status'],
-            })
+                'inn': rec['inn'],
+                'phone': rec['phone'],
+                'status': 'active',
+            }
+            phase.rows += 1
+            stats['negative_charges'] += 1
+            manifest.add('negative_charges', [row], account_number=[rec['account_number']])
+            row += 1
+
+
+def _checkpoint_path(output_path: str) -> str:
+    return os.path.splitext(output_path)[0] + '.checkpoint.npz'
+
+
+def _next_period(period: str) -> str:
+    year, month = int(period[:4]), int(period[5:7])
+    return f'{year + month // 12}-{month % 12 + 1:02d}'
+
+
+def _write_checkpoint(path: str, state: list, period: str, billing_path: str):
+    """Состояние счетов на конец period — колонками в .npz.
+
+    Строки (счёт, ИНН, телефон) — UTF-8 байты, тариф и статус — int8-коды,
+    дата последнего платежа — datetime64 (NaT, если платежей не было).
+    Размер файла биллинга сохраняется, чтобы заметить правку файла в обход чекпоинта.
+    """
+    tariffs = list(TARIFF_PRICES)
+    accounts, tariff, inn, phone, status, balance, last_payment = zip(*state) if state else ([],) * 7
+    tmp_path = path + '.tmp.npz'
+    np.savez(
+        tmp_path,
+        version=np.int64(CHECKPOINT_VERSION),
+        period=np.array(period),
+        billing_bytes=np.int64(os.path.getsize(billing_path)),
+        account=np.array([a.encode() for a in accounts], dtype='S'),
+        tariff=np.array([tariffs.index(t) for t in tariff], dtype=np.int8),
+        inn=np.array([(v or '').encode() for v in inn], dtype='S'),
+        phone=np.array([(v or '').encode() for v in phone], dtype='S'),
+        status=np.array([STATUSES.index(v) for v in status], dtype=np.int8),
+        balance=np.array(balance, dtype=np.float64),
+        last_payment=np.array([v or 'NaT' for v in last_payment], dtype='datetime64[D]'),
+    )
+    os.replace(tmp_path, path)
+
+
+def _load_checkpoint(path: str) -> dict:
+    with np.load(path, allow_pickle=False) as data:
+        checkpoint = {name: data[name] for name in data.files}
+    if int(checkpoint['version']) != CHECKPOINT_VERSION:
+        raise ValueError(f'Неподдерживаемая версия чекпоинта: {int(checkpoint["version"])}')
+    return checkpoint
+
+
+def _decode(values: np.ndarray) -> np.ndarray:
+    """UTF-8 байты -> object-массив строк, пустые -> None."""
+    # Одна декодировка на всю колонку вместо np.char.decode по элементам
+    decoded = np.array(b'\n'.join(values.tolist()).decode().split('\n'), dtype=object)[:len(values)]
+    decoded[values == b''] = None
+    return decoded
+
+
+def _period_frame(columns: dict, ledger: dict, j: int) -> pd.DataFrame:
+    """Строки периода ledger['periods'][j] для всех счетов чекпоинта.
+
+    columns — раскодированные колонки счетов (номер, тариф, ИНН, телефон, статус),
+    ledger — результат simulate_ledger по счетам чекпоинта.
+    """
+    last_payment_str = _date_strings(ledger['last_payment'][j])
+    return pd.DataFrame({
+        'account_number': columns['account_number'],
+        'period': ledger['periods'][j],
+        'tariff': columns['tariff'],
+        'charged_amount': ledger['charged'][j],
+        'paid_amount': ledger['paid'][j],
+        'balance': ledger['balance'][j],
+        'last_payment_date': last_payment_str,
+        'inn': columns['inn'],
+        'phone': columns['phone'],
+        'status': columns['status'],
+    }, columns=BILLING_COLUMNS)
+
+
+def _extend_manifest(path: str, accounts: np.ndarray, balance: np.ndarray, n_periods=1):
+    """Аномалии телефона и ИНН переходят в новые периоды вместе со счётом:
+    строки каждого периода (по строке на счёт чекпоинта) добавляются к тем же аномалиям.
+    debtors пересобираются заново — по balance (сальдо счетов на конец
+    последнего дописанного периода) в строках этого периода.
+    """
+    if not os.path.exists(path):
+        return
+    manifest = Manifest.load(path)
+    accounts = _decode(accounts).astype(str)
+    offsets = manifest.n_rows + np.arange(n_periods, dtype=np.int64)[:, None] * len(accounts)
+    for anomaly in BILLING_ANOMALIES:
+        hit = np.flatnonzero(np.isin(accounts, manifest.keys(anomaly.name, 'account_number')))
+        manifest.add(anomaly.name, (offsets + hit).ravel())
+    debtors = np.flatnonzero(balance < 0)
+    manifest.discard('debtors')
+    manifest.add('debtors', offsets[-1, 0] + debtors, account_number=accounts[debtors])
+    manifest.n_rows += n_periods * len(accounts)
+    manifest.save(path)
+
+
+def extend_billing(period=None, output_path=None, checkpoint_path=None, seed=42, n_periods=1) -> dict:
+    """Дописывает в файл биллинга n_periods следующих периодов по чекпоинту.
+
+    Работа O(счетов × периодов): квартал заново не генерируется и не
+    переписывается — новые строки дописываются в конец файла период за
+    периодом, а чекпоинт обновляется на конец последнего. Начисления и
+    сальдо всех периодов считаются сразу массивами (billing_ledger.py);
+    результат тот же, что у n_periods запусков по одному периоду. Чекпоинт
+    создаёт generate_billing(checkpoint=True). Счета-сироты, сторно и
+    корректировки — аномалии исходного квартала и в новые периоды не
+    продлеваются; аномалии телефона и ИНН в манифесте (если он есть)
+    дополняются строками новых периодов, а debtors указывают на должников
+    в строках последнего из них.
+    """
+    if output_path is None:
+        output_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'billing_q4_2025.csv')
+    if checkpoint_path is None:
+        checkpoint_path = _checkpoint_path(output_path)
+    checkpoint = _load_checkpoint(checkpoint_path)
+    last_period = str(checkpoint['period'])
+    expected = _next_period(last_period)
+    if period is None:
+        period = expected
+    if period != expected:
+        raise ValueError(f'Чекпоинт на конец {last_period}: следующим может быть только {expected}, не {period}')
+    if os.path.getsize(output_path) != int(checkpoint['billing_bytes']):
+        raise ValueError(f'{output_path} изменён после чекпоинта {checkpoint_path}')
+    if n_periods < 1:
+        raise ValueError(f'n_periods должен быть положительным, а не {n_periods}')
+
+    price_ranges = np.array(list(TARIFF_PRICES.values()), dtype=np.float64)[checkpoint['tariff']]
+    ledger = simulate_ledger(price_ranges, month_periods(period, n_periods), seed,
+                             checkpoint['balance'], checkpoint['last_payment'])
+    columns = {
+        'account_number': _decode(checkpoint['account']),
+        'tariff': np.array(list(TARIFF_PRICES), dtype=object)[checkpoint['tariff']],
+        'inn': _decode(checkpoint['inn']),
+        'phone': _decode(checkpoint['phone']),
+        'status': np.array(STATUSES, dtype=object)[checkpoint['status']],
+    }
+    for j in range(n_periods):
+        _period_frame(columns, ledger, j).to_csv(output_path, sep=';', index=False, header=False, mode='a',
+                                                 encoding='utf-8')
+    balance = ledger['balance'][-1]
+    _extend_manifest(manifest_path(output_path), checkpoint['account'], balance, n_periods)
+
+    checkpoint['balance'] = balance
+    checkpoint['last_payment'] = ledger['last_payment'][-1]
+    checkpoint['period'] = np.array(ledger['periods'][-1])
+    checkpoint['billing_bytes'] = np.int64(os.path.getsize(output_path))
+    tmp_path = checkpoint_path + '.tmp.npz'
+    np.savez(tmp_path, **checkpoint)
+    os.replace(tmp_path, checkpoint_path)
+
+    return {
+        'period': ledger['periods'][-1],
+        'periods': ledger['periods'],
+        'rows': n_periods * len(balance),
+        'debtors': int((balance < 0).sum()),
+    }
 
-    # Дополнительные отрицательные начисления (корректировки)
-    for _ in range(4):
-        rec = random.choice(account_records)
-        period = random.choice(PERIODS)
-        rows.append({
-            'account_number': rec['account_number'],
-            'period': period,
-            'tariff': rec['tariff'],
-            'charged_amount': -round(random.uniform(100, 2000), 2),
-            'paid_amount': 0.0,
-            'balance': 0.0,
-            'last_payment_date': None,
-            'inn': rec['inn'],
-            'phone': rec['phone'],
-            'status': 'active',
-        })
-        stats['negative_charges'] += 1
 
-    df = pd.DataFrame(rows)
-    output_dir = os.path.dirname(os.path.abspath(__file__))
-    output_path = os.path.join(output_dir, 'billing_q4_2025.csv')
-    df.to_csv(output_path, sep=';', index=False, encoding='utf-8-sig')
+def generate_billing(stream=False, chunk_size=100_000, clients=None, output_path=None,
+                     profile=False, trace_memory=False, checkpoint=False, formats=(), n_periods=len(PERIODS)):
+    """Генерирует billing_q4_2025.csv.
+
+    n_periods — сколько месяцев подряд от PERIODS[0] генерировать (по умолчанию квартал).
+
+    stream=True — строки не копятся списком, а пишутся в CSV чанками
+    по chunk_size, так что пик памяти на строки ограничен размером чанка.
+    Содержимое файла в обоих режимах одинаковое.
+    clients и output_path по умолчанию — общая база из кэша и billing_q4_2025.csv
+    рядом со скриптом. Возвращает stats.
+    profile=True — замеры по фазам (см. profiling.py) пишутся вместе со stats
+    в <output>.profile.json; trace_memory добавляет байты по tracemalloc.
+    checkpoint=True — состояние счетов на конец квартала сохраняется
+    в <output>.checkpoint.npz для extend_billing.
+    Номера строк и счета аномалий пишутся в <output>.manifest.npz (см. manifest.py).
+    formats — дополнительные форматы рядом с CSV (см. output_formats.py);
+    parquet/feather нужен DataFrame целиком, поэтому со stream=True недоступны.
+    """
+    formats = parse_formats(formats)
+    if n_periods < 1:
+        raise ValueError(f'n_periods должен быть положительным, а не {n_periods}')
+    periods = month_periods(PERIODS[0], n_periods)
+    if stream and set(formats) - set(COMPRESSED_FORMATS):
+        raise ValueError('parquet/feather не пишутся в режиме stream')
+    profiler = PhaseProfiler(trace_memory=trace_memory) if profile else NULL_PROFILER
+    if clients is None:
+        with profiler.phase('load_clients'):
+            clients = get_or_create_clients()
+
+    stats = _new_stats()
+
+    # Лицевые счета — представление над ClientTable, без копии полей клиента
+    account_records = clients.account_rows()
+    total_accounts = len(account_records)
+
+    if output_path is None:
+        output_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'billing_q4_2025.csv')
+    state = [] if checkpoint else None
+    manifest = Manifest()
+    rows = _billing_rows(account_records, stats, profiler, state, manifest, periods)
+    df = None
+    if stream:
+        n_rows = _write_csv_stream(rows, output_path, chunk_size, profiler)
+    else:
+        rows = list(rows)
+        with profiler.phase('dataframe') as phase:
+            df = pd.DataFrame(rows, columns=BILLING_COLUMNS)
+            phase.rows += len(df)
+        with profiler.phase('to_csv') as phase:
+            df.to_csv(output_path, sep=';', index=False, encoding='utf-8-sig')
+            phase.rows += len(df)
+        n_rows = len(df)
+
+    with profiler.phase('formats'):
+        extra_paths = write_formats(output_path, formats, df)
+
+    if checkpoint:
+        _write_checkpoint(_checkpoint_path(output_path), state, periods[-1], output_path)
+    manifest.n_rows = n_rows
+    manifest.save(manifest_path(output_path))
 
     file_size = os.path.getsize(output_path) / (1024 * 1024)
 
     print('=== Генерация биллинга Q4 2025 ===')
     print(f'Всего лицевых счетов: {total_accounts}')
-    print(f'Записей (счёт x месяц): {len(rows)}')
+    print(f'Периоды: {periods[0]} — {periods[-1]}')
+    print(f'Записей (счёт x месяц): {n_rows}')
     print(f'Счета-сироты: {stats["orphans"]}')
     print(f'Дубли по периоду: {stats["duplicates"]}')
     print(f'Отрицательные начисления: {stats["negative_charges"]}')
@@ -256,7 +581,60 @@ def generate_billing():
     print(f'Формат телефона отличается: {stats["alt_phone_format"]}')
     print(f'Должники (balance < 0): {stats["debtors"]}')
     print(f'Файл: {output_path} ({file_size:.1f} MB)')
+    print(f'Манифест аномалий: {manifest_path(output_path)}')
+    print_outputs(extra_paths)
+
+    if profile:
+        report = profiler.report()
+        profile_path = os.path.splitext(output_path)[0] + '.profile.json'
+        with open(profile_path, 'w', encoding='utf-8') as f:
+            json.dump({'generator': 'billing', 'rows': n_rows, 'stats': stats, 'profile': report},
+                      f, ensure_ascii=False, indent=2)
+        print_profile(report)
+        print(f'Профиль: {profile_path}')
+    return stats
 
 
 if __name__ == '__main__':
-    generate_billing()
+    parser = argparse.ArgumentParser(description='Генерация биллинга Q4 2025')
+    parser.add_argument('--stream', action='store_true', help='писать CSV чанками')
+    parser.add_argument('--profile', action='store_true', help='замеры по фазам в billing_q4_2025.profile.json')
+    parser.add_argument('--trace-memory', action='store_true', help='добавить в профиль байты по tracemalloc')
+    parser.add_argument('--checkpoint', action='store_true', help='сохранить состояние счетов для --extend')
+    parser.add_argument('--extend', nargs='?', const='next', default=None, metavar='YYYY-MM',
+                        help='дописать следующий период по чекпоинту вместо генерации квартала')
+    parser.add_argument('--periods', type=int, default=None,
+                        help=f'сколько периодов сгенерировать (по умолчанию {len(PERIODS)}) или дописать с --extend (1)')
+    parser.add_argument('--formats', default='', help='доп. форматы через запятую: csv.gz,csv.br,parquet,feather')
+    args = parser.parse_args()
+    try:
+        formats = parse_formats(args.formats)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.stream and set(formats) - set(COMPRESSED_FORMATS):
+        parser.error('parquet/feather пишутся только без --stream')
+    if args.periods is not None and args.periods < 1:
+        parser.error('--periods должен быть положительным')
+
+    if args.extend:
+        # Дописывается только CSV (и его чекпоинт): остальные режимы к --extend не относятся,
+        # а файлы доп. форматов после дописывания устарели бы
+        ignored = [flag for flag, value in (('--stream', args.stream), ('--profile', args.profile),
+                                            ('--trace-memory', args.trace_memory),
+                                            ('--checkpoint', args.checkpoint), ('--formats', formats)) if value]
+        if ignored:
+            parser.error(f'--extend несовместим с {", ".join(ignored)}')
+        n_periods = args.periods or 1
+        try:
+            result = extend_billing(period=None if args.extend == 'next' else args.extend, n_periods=n_periods)
+        except (FileNotFoundError, ValueError) as e:
+            parser.error(str(e))
+        if n_periods > 1:
+            print(f'=== Биллинг: дописаны периоды {result["periods"][0]} — {result["period"]} ===')
+        else:
+            print(f'=== Биллинг: дописан период {result["period"]} ===')
+        print(f'Записей: {result["rows"]}')
+        print(f'Должники (balance < 0): {result["debtors"]}')
+    else:
+        generate_billing(stream=args.stream, profile=args.profile, trace_memory=args.trace_memory,
+                         checkpoint=args.checkpoint, formats=formats, n_periods=args.periods or len(PERIODS))
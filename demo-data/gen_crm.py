@@ -3,68 +3,98 @@
 Создаёт crm_clients.csv с ~920-950 записями.
 """
 
+import argparse
 import os
 import random
 from datetime import date, timedelta
 
+import anomalies
+import name_pools
+import numpy as np
 import pandas as pd
-from faker import Faker
+from anomalies import Anomaly, apply_anomalies, constant, count_stats, swap
+from export_schema import column_names
+from identities import format_phone, random_digit_string
+from manifest import Manifest, manifest_path
+from output_formats import parse_formats, print_outputs, write_formats
 from shared_clients import get_or_create_clients
 
 random.seed(42)
-Faker.seed(42)
-fake = Faker('ru_RU')
+name_pools.seed(42)
+anomalies.seed(42)
 
 B2B_COMPANY_FORMS = ['ООО', 'ЗАО', 'АО', 'ПАО', 'ИП']
 EMAIL_DOMAINS_B2C = ['mail.ru', 'yandex.ru', 'gmail.com', 'inbox.ru', 'bk.ru', 'rambler.ru']
 
+# Порядок колонок — из общей схемы выгрузок (export_schema.py)
+CRM_COLUMNS = column_names('crm')
+
+# Строк-дублей и prospects на выгрузку (в sharding.py — на шард)
+DUPLICATES = 18
+PROSPECTS = 35
+
+
+def _alt_company_name(values, rows, rng):
+    """Названия компаний в другом формате: без кавычек или «Ромашка, ООО»."""
+    no_quotes = values.str.replace(r'["«»]', '', regex=True)
+    # "ООО \"Ромашка\"" -> "Ромашка, ООО"; без известной формы название не меняется
+    parts = values.str.extract(f'^({"|".join(B2B_COMPANY_FORMS)})(.*)$')
+    reordered = (parts[1].str.strip(' "«»') + ', ' + parts[0]).fillna(values)
+    return no_quotes.where(rng.integers(0, 2, size=len(values)) == 0, reordered)
+
+
+def _alt_contact_name(values, rows, rng):
+    """ФИО в другом порядке или сокращённое; не из трёх слов — без изменений."""
+    parts = values.str.split()
+    last, first, middle = parts.str[0], parts.str[1], parts.str[2]
+    first_last = first + ' ' + middle + ' ' + last
+    initials = last + ' ' + first.str[0] + '.' + middle.str[0] + '.'
+    alt = first_last.where(rng.integers(0, 2, size=len(values)) == 0, initials)
+    return alt.where(parts.str.len() >= 3, values)
+
+
+def _stale_email(values, rows, rng):
+    """Старый личный email: фамилия из словаря, как её вбили кириллицей."""
+    last_names = name_pools.load_name_pools().last_names(rng, len(values))
+    suffix = rng.integers(1, 1000, size=len(values))
+    domains = np.asarray(EMAIL_DOMAINS_B2C, dtype=object)[rng.integers(0, len(EMAIL_DOMAINS_B2C), size=len(values))]
+    return [f'{last.lower()}{n}@{d}' for last, n, d in zip(last_names, suffix.tolist(), domains)]
+
+
+CRM_ANOMALIES = [
+    Anomaly('alt_company', 'company_name', _alt_company_name, rate=0.25,
+            where=lambda df: (df['segment'] == 'B2B') & df['company_name'].notna()),
+    Anomaly('alt_name', 'contact_name', _alt_contact_name, rate=0.12),
+    Anomaly('stale_email', 'email', _stale_email, count=50),
+    Anomaly('empty_accounts', 'account_numbers', constant(''), count=20),
+    Anomaly('wrong_segment', 'segment', swap('B2B', 'B2C'), count=10),
+]
+
+
+def _generate_prospects(id_base: int, n=PROSPECTS) -> list:
+    """Генерирует prospect-клиентов (нет в биллинге) с номерами CLT- после id_base."""
+    pools, rng = name_pools.load_name_pools(), name_pools.rng()
+    last_names, first_names, middle_names = pools.fio(rng, n)
+    company_words = pools.company_words(rng, n)
+    managers = pools.short_names(rng, n)
 
-def _alt_company_name(name: str) -> str:
-    """Возвращает название компании в другом формате."""
-    fmt = random.choice(['no_quotes', 'reversed'])
-    if fmt == 'no_quotes':
-        return name.replace('"', '').replace('«', '').replace('»', '')
-    else:
-        # "ООО \"Ромашка\"" -> "Ромашка, ООО"
-        for form in B2B_COMPANY_FORMS:
-            if name.startswith(form):
-                clean = name.replace(form, '').strip().strip(' "«»')
-                return f'{clean}, {form}'
-        return name
-
-
-def _alt_contact_name(name: str) -> str:
-    """ФИО в другом порядке или сокращённое."""
-    parts = name.split()
-    if len(parts) < 3:
-        return name
-    fmt = random.choice(['first_last', 'initials'])
-    if fmt == 'first_last':
-        return f'{parts[1]} {parts[2]} {parts[0]}'
-    else:
-        return f'{parts[0]} {parts[1][0]}.{parts[2][0]}.'
-
-
-def _generate_prospects(n=35) -> list:
-    """Генерирует prospect-клиентов (нет в биллинге)."""
     prospects = []
     for i in range(n):
         segment = random.choice(['B2B', 'B2C'])
         region = random.choice(['Москва', 'Санкт-Петербург', 'Новосибирск', 'Екатеринбург', 'Казань'])
-        last_name = fake.last_name()
-        first_name = fake.first_name()
-        middle_name = fake.middle_name()
+        last_name = last_names[i]
 
         prospects.append({
-            'client_id': f'CLT-{9000 + i:06d}',
+            'client_id': f'CLT-{id_base + i + 1:06d}',
             'segment': segment,
-            'company_name': f'ООО "{fake.company().split(",")[0].split(" ")[-1]}"' if segment == 'B2B' else None,
-            'contact_name': f'{last_name} {first_name} {middle_name}',
-            'inn': ''.join([str(random.randint(0, 9)) for _ in range(10 if segment == 'B2B' else 12)]),
-            'phone': f'+7({random.randint(900,999)}){random.randint(100,999)}-{random.randint(10,99)}-{random.randint(10,99)}',
+            'company_name': f'ООО "{company_words[i]}"' if segment == 'B2B' else None,
+            'contact_name': f'{last_name} {first_names[i]} {middle_names[i]}',
+            'inn': random_digit_string(random, 10 if segment == 'B2B' else 12),
+            'phone': format_phone(random.randint(900, 999), random.randint(100, 999), random.randint(10, 99),
+                                  random.randint(10, 99)),
             'email': f'{last_name.lower()}{random.randint(1,999)}@{random.choice(EMAIL_DOMAINS_B2C)}',
             'region': region,
-            'manager': fake.last_name() + ' ' + fake.first_name()[0] + '.' + fake.middle_name()[0] + '.' if segment == 'B2B' else None,
+            'manager': managers[i] if segment == 'B2B' else None,
             'contract_date': None,
             'account_numbers': '',
             'status': 'prospect',
@@ -73,11 +103,9 @@ def _generate_prospects(n=35) -> list:
     return prospects
 
 
-def generate_crm():
-    clients = get_or_create_clients()
-
-    rows = []
-    stats = {
+def _new_stats() -> dict:
+    """Счётчики аномалий выгрузки."""
+    return {
         'total_from_shared': 0,
         'excluded_b2c': 0,
         'alt_company': 0,
@@ -89,6 +117,20 @@ def generate_crm():
         'prospects': 0,
     }
 
+
+def _crm_rows(clients, stats: dict, manifest=None, id_base=None) -> list:
+    """Строки CRM-выгрузки по базе клиентов (уже перемешанные). Заполняет stats
+    и manifest (номера строк итогового порядка и client_id аномалий).
+
+    Дубли и prospects получают номера CLT- подряд после id_base (по умолчанию —
+    после старшего номера клиентов), чтобы не пересекаться с настоящими
+    клиентами; шардам sharding.py передаёт свой непересекающийся блок номеров.
+    """
+    if manifest is None:
+        manifest = Manifest()
+    if id_base is None:
+        id_base = max((int(c['client_id'][4:]) for c in clients), default=0)
+    rows = []
     b2b_clients = [c for c in clients if c['segment'] == 'B2B']
     b2c_clients = [c for c in clients if c['segment'] == 'B2C']
 
@@ -96,6 +138,10 @@ def generate_crm():
     excluded_count = int(len(b2c_clients) * 0.10)
     excluded_indices = set(random.sample(range(len(b2c_clients)), excluded_count))
     stats['excluded_b2c'] = excluded_count
+    # Строк у них нет — только ключи, по которым их находят в биллинге и ЛК
+    excluded = [b2c_clients[i] for i in sorted(excluded_indices)]
+    manifest.add('excluded_b2c', client_id=[c['client_id'] for c in excluded], inn=[c['inn'] for c in excluded],
+                 account_number=[acc for c in excluded for acc in c['accounts']])
 
     included_clients = list(b2b_clients)
     for i, c in enumerate(b2c_clients):
@@ -104,54 +150,7 @@ def generate_crm():
 
     stats['total_from_shared'] = len(included_clients)
 
-    # Определить аномалии
-    alt_company_indices = set(random.sample(
-        [i for i, c in enumerate(included_clients) if c['segment'] == 'B2B'],
-        min(int(len(b2b_clients) * 0.25), len(b2b_clients))
-    ))
-    alt_name_indices = set(random.sample(range(len(included_clients)), int(len(included_clients) * 0.12)))
-    stale_email_indices = set(random.sample(range(len(included_clients)), 50))
-    empty_acc_indices = set(random.sample(range(len(included_clients)), 20))
-    wrong_segment_indices = set(random.sample(range(len(included_clients)), 10))
-
-    # Дубли
-    dup_indices = random.sample(range(len(included_clients)), 18)
-
-    for idx, client in enumerate(included_clients):
-        company_name = client['company_name']
-        contact_name = client['contact_name']
-        inn = client['inn']
-        phone = client['phone']
-        email = client['email']
-        segment = client['segment']
-        accounts = ';'.join(client['accounts'])
-
-        # Аномалия: название компании в другом формате
-        if idx in alt_company_indices and company_name:
-            company_name = _alt_company_name(company_name)
-            stats['alt_company'] += 1
-
-        # Аномалия: ФИО в другом порядке
-        if idx in alt_name_indices:
-            contact_name = _alt_contact_name(contact_name)
-            stats['alt_name'] += 1
-
-        # Аномалия: устаревший email
-        if idx in stale_email_indices:
-            domain = random.choice(EMAIL_DOMAINS_B2C)
-            email = f'{fake.last_name().lower()}{random.randint(1, 999)}@{domain}'
-            stats['stale_email'] += 1
-
-        # Аномалия: пустые лицевые счета
-        if idx in empty_acc_indices:
-            accounts = ''
-            stats['empty_accounts'] += 1
-
-        # Аномалия: неправильный сегмент
-        if idx in wrong_segment_indices:
-            segment = 'B2C' if segment == 'B2B' else 'B2B'
-            stats['wrong_segment'] += 1
-
+    for client in included_clients:
         # Статус
         status = 'active'
         last_activity = date(2025, random.randint(10, 12), random.randint(1, 28))
@@ -161,40 +160,70 @@ def generate_crm():
 
         rows.append({
             'client_id': client['client_id'],
-            'segment': segment,
-            'company_name': company_name,
-            'contact_name': contact_name,
-            'inn': inn,
-            'phone': phone,
-            'email': email,
+            'segment': client['segment'],
+            'company_name': client['company_name'],
+            'contact_name': client['contact_name'],
+            'inn': client['inn'],
+            'phone': client['phone'],
+            'email': client['email'],
             'region': client['region'],
             'manager': client['manager'],
             'contract_date': client['contract_date'],
-            'account_numbers': accounts,
+            'account_numbers': ';'.join(client['accounts']),
             'status': status,
             'last_activity_date': last_activity.isoformat(),
         })
 
+    # Аномалии — по колонкам целиком (см. CRM_ANOMALIES)
+    df = pd.DataFrame(rows, columns=CRM_COLUMNS, dtype=object)
+    row_manifest = apply_anomalies(df, CRM_ANOMALIES, anomalies.rng())
+    stats.update(count_stats(row_manifest))
+    for name, positions in row_manifest.items():
+        manifest.add(name, positions, client_id=df['client_id'].to_numpy()[positions])
+    rows = df.to_dict('records')
+
     # Дубли
-    for dup_idx in dup_indices:
+    dup_indices = random.sample(range(len(included_clients)), min(DUPLICATES, len(included_clients)))
+    for k, dup_idx in enumerate(dup_indices):
         original = rows[dup_idx].copy()
-        original['client_id'] = f'CLT-{8000 + dup_idx:06d}'
+        original['client_id'] = f'CLT-{id_base + k + 1:06d}'
         original['status'] = 'churned'
         original['last_activity_date'] = date(2024, random.randint(1, 12), random.randint(1, 28)).isoformat()
+        manifest.add('duplicates', [len(rows)], client_id=[original['client_id']],
+                     original_client_id=[rows[dup_idx]['client_id']])
         rows.append(original)
         stats['duplicates'] += 1
 
     # Prospects
-    prospects = _generate_prospects(35)
+    prospects = _generate_prospects(id_base + len(dup_indices))
     stats['prospects'] = len(prospects)
+    manifest.add('prospects', range(len(rows), len(rows) + len(prospects)),
+                 client_id=[p['client_id'] for p in prospects], inn=[p['inn'] for p in prospects])
     rows.extend(prospects)
 
-    random.shuffle(rows)
+    # Перемешиваются номера строк (тот же вызов random.shuffle), чтобы знать, куда попала каждая
+    order = list(range(len(rows)))
+    random.shuffle(order)
+    manifest.remap(np.argsort(order))
+    manifest.n_rows = len(rows)
+    return [rows[i] for i in order]
+
+
+def generate_crm(clients=None, output_path=None, formats=()):
+    formats = parse_formats(formats)
+    if clients is None:
+        clients = get_or_create_clients()
+
+    stats = _new_stats()
+    manifest = Manifest()
+    rows = _crm_rows(clients, stats, manifest)
 
-    df = pd.DataFrame(rows)
-    output_dir = os.path.dirname(os.path.abspath(__file__))
-    output_path = os.path.join(output_dir, 'crm_clients.csv')
+    df = pd.DataFrame(rows, columns=CRM_COLUMNS)
+    if output_path is None:
+        output_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crm_clients.csv')
     df.to_csv(output_path, sep=';', index=False, encoding='utf-8-sig')
+    extra_paths = write_formats(output_path, formats, df)
+    manifest.save(manifest_path(output_path))
 
     file_size = os.path.getsize(output_path) / (1024 * 1024)
 
@@ -210,7 +239,17 @@ def generate_crm():
     print(f'Пустые лицевые счета: {stats["empty_accounts"]}')
     print(f'Итого записей: {len(rows)}')
     print(f'Файл: {output_path} ({file_size:.2f} MB)')
+    print(f'Манифест аномалий: {manifest_path(output_path)}')
+    print_outputs(extra_paths)
+    return stats
 
 
 if __name__ == '__main__':
-    generate_crm()
+    parser = argparse.ArgumentParser(description='Генерация выгрузки CRM')
+    parser.add_argument('--formats', default='', help='доп. форматы через запятую: csv.gz,csv.br,parquet,feather')
+    args = parser.parse_args()
+    try:
+        formats = parse_formats(args.formats)
+    except ValueError as e:
+        parser.error(str(e))
+    generate_crm(formats=formats)
@@ -3,27 +3,71 @@
 Создаёт portal_activity_q4_2025.csv с ~900-1000 записями.
 """
 
+import argparse
 import os
 import random
 from datetime import date, timedelta
 
+import anomalies
+import numpy as np
 import pandas as pd
-from faker import Faker
+from anomalies import Anomaly, apply_anomalies, choice, constant, count_stats, set_null
+from export_schema import column_names
+from manifest import Manifest, manifest_path
+from output_formats import parse_formats, print_outputs, write_formats
 from shared_clients import get_or_create_clients
 
 random.seed(42)
-Faker.seed(42)
-fake = Faker('ru_RU')
+anomalies.seed(42)
 
 SERVICES = ['Интернет', 'ТВ', 'Телефония', 'Облако', 'VPN', 'Антивирус']
 GARBAGE_NAMES = ['test', 'qwerty', '123', 'Я', 'asdf', 'ааа', 'user', 'тест', '111', 'йцукен', 'Клиент', 'Имя', '---', '...']
 
+# Порядок колонок — из общей схемы выгрузок (export_schema.py)
+PORTAL_COLUMNS = column_names('portal')
 
-def generate_portal():
-    clients = get_or_create_clients()
 
-    rows = []
-    stats = {
+def _phone_login(values, rows, rng):
+    """Логин — цифры телефона вместо email."""
+    return rows['phone'].str.replace(r'\D', '', regex=True)
+
+
+def _dead_account(values, rows, rng):
+    """Заходил только первые полгода после регистрации, в Q4 — ничего.
+
+    Мёртвыми становятся только аккаунты, зарегистрированные до DEAD_BEFORE;
+    остальные выбранные строки остаются как были (и в манифест не попадают).
+    """
+    registered = pd.to_datetime(rows['registered_date'])
+    last_login = registered + pd.to_timedelta(rng.integers(0, 181, size=len(rows)), unit='D')
+    last_login = last_login.where(last_login <= '2025-12-28', pd.Timestamp('2025-06-15'))
+    dead = pd.DataFrame({
+        'last_login_date': last_login.dt.strftime('%Y-%m-%d'),
+        'logins_count_q4': 0,
+        'tickets_count_q4': 0,
+        'payments_online_q4': 0,
+    }, index=rows.index, dtype=object)
+    recent = (rows['registered_date'] >= DEAD_BEFORE).to_numpy()
+    dead.loc[recent] = values.loc[recent]
+    return dead
+
+
+# Мёртвые аккаунты — среди 35 случайных строк те, что зарегистрированы до 2023 года
+DEAD_BEFORE = '2023-01-01'
+
+PORTAL_ANOMALIES = [
+    Anomaly('login_not_email', 'user_login', _phone_login, rate=0.10),
+    Anomaly('no_account', 'account_number', set_null(), count=18),
+    Anomaly('garbage_name', 'display_name', choice(GARBAGE_NAMES), count=13),
+    Anomaly('wrong_portal', 'portal_type', constant('b2b'), count=6, where=lambda df: df['segment'] == 'B2C'),
+    Anomaly('dead_accounts', ['last_login_date', 'logins_count_q4', 'tickets_count_q4', 'payments_online_q4'],
+            _dead_account, count=35),
+]
+
+
+def _new_stats() -> dict:
+    """Счётчики аномалий выгрузки."""
+    return {
         'total_registered': 0,
         'b2b_registered': 0,
         'b2c_registered': 0,
@@ -36,6 +80,14 @@ def generate_portal():
         'active_no_pay': 0,
     }
 
+
+def _portal_rows(clients, stats: dict, manifest=None) -> list:
+    """Строки активности ЛК по базе клиентов (уже перемешанные). Заполняет stats
+    и manifest (номера строк итогового порядка и лицевые счета аномалий).
+    """
+    if manifest is None:
+        manifest = Manifest()
+    rows = []
     b2b_clients = [c for c in clients if c['segment'] == 'B2B']
     b2c_clients = [c for c in clients if c['segment'] == 'B2C']
 
@@ -46,54 +98,17 @@ def generate_portal():
     stats['b2b_registered'] = len(registered_b2b)
     stats['b2c_registered'] = len(registered_b2c)
 
-    # Индексы для аномалий
     all_registered = registered_b2b + registered_b2c
     stats['total_registered'] = len(all_registered)
+    # Незарегистрированные клиенты строк не дают — их счета есть только в биллинге
+    registered_ids = {c['client_id'] for c in all_registered}
+    not_registered = [c for c in clients if c['client_id'] not in registered_ids]
+    manifest.add('not_registered', client_id=[c['client_id'] for c in not_registered],
+                 account_number=[acc for c in not_registered for acc in c['accounts']])
 
-    login_not_email_indices = set(random.sample(range(len(all_registered)), int(len(all_registered) * 0.10)))
-    no_account_indices = set(random.sample(range(len(all_registered)), min(18, len(all_registered))))
-    garbage_name_indices = set(random.sample(range(len(all_registered)), min(13, len(all_registered))))
-    wrong_portal_indices = set(random.sample(
-        [i for i, c in enumerate(all_registered) if c['segment'] == 'B2C'],
-        min(6, len(registered_b2c))
-    ))
-    dead_account_indices = set(random.sample(range(len(all_registered)), min(35, len(all_registered))))
-
-    # Клиенты для мульти-ЛК
-    multi_lk_indices = random.sample(range(len(all_registered)), min(12, len(all_registered)))
-
-    for idx, client in enumerate(all_registered):
-        segment = client['segment']
-        email = client['email']
-        phone = client['phone']
+    for client in all_registered:
         accounts = client['accounts']
-
-        # Логин
-        if idx in login_not_email_indices:
-            digits = ''.join(c for c in phone if c.isdigit())
-            user_login = digits
-            stats['login_not_email'] += 1
-        else:
-            user_login = email
-
-        # Портал
-        portal_type = 'b2b' if segment == 'B2B' else 'b2c'
-        if idx in wrong_portal_indices:
-            portal_type = 'b2b'
-            stats['wrong_portal'] += 1
-
-        # Лицевой счёт
         account_number = random.choice(accounts) if accounts else None
-        if idx in no_account_indices:
-            account_number = None
-            stats['no_account'] += 1
-
-        # Отображаемое имя
-        if idx in garbage_name_indices:
-            display_name = random.choice(GARBAGE_NAMES)
-            stats['garbage_name'] += 1
-        else:
-            display_name = client['contact_name']
 
         # Дата регистрации
         reg_start = date(2020, 1, 1)
@@ -101,71 +116,81 @@ def generate_portal():
         registered_date = reg_start + timedelta(days=random.randint(0, (reg_end - reg_start).days))
 
         # Активность
-        is_dead = idx in dead_account_indices and registered_date < date(2023, 1, 1)
-        if is_dead:
-            stats['dead_accounts'] += 1
-            last_login_date = registered_date + timedelta(days=random.randint(0, 180))
-            if last_login_date > date(2025, 12, 28):
-                last_login_date = date(2025, 6, 15)
+        activity_roll = random.random()
+        if activity_roll < 0.60:
+            # Активный в Q4
+            last_login_date = date(2025, random.randint(10, 12), random.randint(1, 28))
+            logins_q4 = max(1, int(random.expovariate(0.1)))
+            if logins_q4 > 50:
+                logins_q4 = 50
+        elif activity_roll < 0.85:
+            # Логинился давно
+            last_login_date = date(2025, random.randint(4, 9), random.randint(1, 28))
             logins_q4 = 0
+        else:
+            # Ни разу за полгода
+            last_login_date = date(2024, random.randint(1, 12), random.randint(1, 28))
+            logins_q4 = 0
+
+        # Тикеты
+        ticket_roll = random.random()
+        if ticket_roll < 0.70:
             tickets_q4 = 0
-            payments_q4 = 0
+        elif ticket_roll < 0.90:
+            tickets_q4 = random.randint(1, 3)
+        else:
+            tickets_q4 = random.randint(4, 12)
+
+        # Оплаты
+        if logins_q4 > 0 and random.random() >= 0.15:
+            payments_q4 = random.randint(1, min(logins_q4, 6))
         else:
-            activity_roll = random.random()
-            if activity_roll < 0.60:
-                # Активный в Q4
-                last_login_date = date(2025, random.randint(10, 12), random.randint(1, 28))
-                logins_q4 = max(1, int(random.expovariate(0.1)))
-                if logins_q4 > 50:
-                    logins_q4 = 50
-            elif activity_roll < 0.85:
-                # Логинился давно
-                last_login_date = date(2025, random.randint(4, 9), random.randint(1, 28))
-                logins_q4 = 0
-            else:
-                # Ни разу за полгода
-                last_login_date = date(2024, random.randint(1, 12), random.randint(1, 28))
-                logins_q4 = 0
-
-            # Тикеты
-            ticket_roll = random.random()
-            if ticket_roll < 0.70:
-                tickets_q4 = 0
-            elif ticket_roll < 0.90:
-                tickets_q4 = random.randint(1, 3)
-            else:
-                tickets_q4 = random.randint(4, 12)
-
-            # Оплаты
-            if logins_q4 > 0:
-                if random.random() < 0.15:
-                    payments_q4 = 0
-                    if logins_q4 > 3 and tickets_q4 > 0:
-                        stats['active_no_pay'] += 1
-                else:
-                    payments_q4 = random.randint(1, min(logins_q4, 6))
-            else:
-                payments_q4 = 0
+            payments_q4 = 0
 
         # Услуги
         n_services = random.randint(1, 4)
         services = ';'.join(random.sample(SERVICES, n_services))
 
         rows.append({
-            'user_login': user_login,
-            'portal_type': portal_type,
+            'user_login': client['email'],
+            'portal_type': 'b2b' if client['segment'] == 'B2B' else 'b2c',
             'account_number': account_number,
-            'display_name': display_name,
-            'email': email,
-            'phone': phone,
+            'display_name': client['contact_name'],
+            'email': client['email'],
+            'phone': client['phone'],
             'last_login_date': last_login_date.isoformat(),
             'logins_count_q4': logins_q4,
             'tickets_count_q4': tickets_q4,
             'payments_online_q4': payments_q4,
             'services_active': services,
             'registered_date': registered_date.isoformat(),
+            'segment': client['segment'],
         })
 
+    # Аномалии — по колонкам целиком (см. PORTAL_ANOMALIES)
+    df = pd.DataFrame(rows, dtype=object)
+    # У ЛК один счёт клиента, остальные его счета в выгрузку не попадают
+    chosen = set(df['account_number'].dropna())
+    manifest.add('other_accounts', account_number=[acc for c in all_registered for acc in c['accounts']
+                                                   if acc not in chosen])
+    # Счета — до аномалий: no_account стирает их из строки, но не из биллинга
+    accounts = df['account_number'].to_numpy()
+    row_manifest = apply_anomalies(df, PORTAL_ANOMALIES, anomalies.rng())
+    dead = row_manifest['dead_accounts']
+    row_manifest['dead_accounts'] = dead[df['registered_date'].to_numpy()[dead] < DEAD_BEFORE]
+    stats.update(count_stats(row_manifest))
+    for name, positions in row_manifest.items():
+        manifest.add(name, positions, account_number=accounts[positions])
+    logins, tickets, payments = (df[c].to_numpy(dtype=int) for c in ('logins_count_q4', 'tickets_count_q4',
+                                                                     'payments_online_q4'))
+    active_no_pay = np.flatnonzero((logins > 3) & (tickets > 0) & (payments == 0))
+    stats['active_no_pay'] = len(active_no_pay)
+    manifest.add('active_no_pay', active_no_pay, account_number=accounts[active_no_pay])
+    rows = df[PORTAL_COLUMNS].to_dict('records')
+
+    # Клиенты для мульти-ЛК
+    multi_lk_indices = random.sample(range(len(all_registered)), min(12, len(all_registered)))
+
     # Мульти-ЛК (дублирующие аккаунты)
     for dup_idx in multi_lk_indices:
         client = all_registered[dup_idx]
@@ -177,15 +202,38 @@ def generate_portal():
         original_row['registered_date'] = date(2025, random.randint(7, 12), random.randint(1, 28)).isoformat()
         original_row['logins_count_q4'] = random.randint(1, 5)
         original_row['last_login_date'] = date(2025, random.randint(10, 12), random.randint(1, 28)).isoformat()
+        manifest.add('multi_lk', [len(rows)], account_number=[accounts[dup_idx]])
         rows.append(original_row)
         stats['multi_lk'] += 1
 
-    random.shuffle(rows)
+    # Перемешиваются номера строк (тот же вызов random.shuffle), чтобы знать, куда попала каждая
+    order = list(range(len(rows)))
+    random.shuffle(order)
+    manifest.remap(np.argsort(order))
+    manifest.n_rows = len(rows)
+    return [rows[i] for i in order]
+
 
-    df = pd.DataFrame(rows)
-    output_dir = os.path.dirname(os.path.abspath(__file__))
-    output_path = os.path.join(output_dir, 'portal_activity_q4_2025.csv')
+def generate_portal(clients=None, output_path=None, formats=(), events=False):
+    """Генерирует portal_activity_q4_2025.csv. Возвращает stats.
+
+    events=True — рядом пишется сырой журнал входов, обращений и оплат,
+    из которого складываются счётчики выгрузки (см. portal_events.py).
+    """
+    formats = parse_formats(formats)
+    if clients is None:
+        clients = get_or_create_clients()
+
+    stats = _new_stats()
+    manifest = Manifest()
+    rows = _portal_rows(clients, stats, manifest)
+
+    df = pd.DataFrame(rows, columns=PORTAL_COLUMNS)
+    if output_path is None:
+        output_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'portal_activity_q4_2025.csv')
     df.to_csv(output_path, sep=';', index=False, encoding='utf-8-sig')
+    extra_paths = write_formats(output_path, formats, df)
+    manifest.save(manifest_path(output_path))
 
     file_size = os.path.getsize(output_path) / (1024 * 1024)
 
@@ -200,7 +248,24 @@ def generate_portal():
     print(f'Активные без оплат: {stats["active_no_pay"]}')
     print(f'Итого записей: {len(rows)}')
     print(f'Файл: {output_path} ({file_size:.2f} MB)')
+    print(f'Манифест аномалий: {manifest_path(output_path)}')
+    print_outputs(extra_paths)
+    if events:
+        from portal_events import write_events
+
+        result = write_events(output_path)
+        print(f'Журнал событий: {result["events"]} событий, {result["users"]} пользователей')
+        print_outputs([result['events_path'], result['users_path']])
+    return stats
 
 
 if __name__ == '__main__':
-    generate_portal()
+    parser = argparse.ArgumentParser(description='Генерация активности ЛК Q4 2025')
+    parser.add_argument('--formats', default='', help='доп. форматы через запятую: csv.gz,csv.br,parquet,feather')
+    parser.add_argument('--events', action='store_true', help='записать журнал событий ЛК (portal_events.py)')
+    args = parser.parse_args()
+    try:
+        formats = parse_formats(args.formats)
+    except ValueError as e:
+        parser.error(str(e))
+    generate_portal(formats=formats, events=args.events)
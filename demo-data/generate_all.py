@@ -0,0 +1,153 @@
+"""
+Полная перегенерация демо-данных одной командой.
+
+База клиентов готовится один раз (кэш, см. client_cache.py), затем биллинг,
+CRM и ЛК генерируются параллельно — каждый в своём процессе. Отдельный
+процесс нужен не только ради CPU: генераторы сеют random (и name_pools) при импорте
+и тянут из них значения, так что в общем процессе (или потоках) выгрузки
+перестали бы совпадать с запуском скриптов по одному. Воркеры открывают
+базу из memory-mapped кэша, это дешевле повторной генерации.
+
+Готовые CSV копируются в public/demo-data/, откуда их забирает фронтенд,
+вместе с заранее сжатыми .csv.gz/.csv.br, если они заказаны в --formats
+(parquet/feather остаются в demo-data/ для загрузки из Python). По
+опубликованным CSV тут же считаются итоги сверки (reconcile_summary.py).
+
+    python generate_all.py               # параллельно + копия в public/
+    python generate_all.py --serial      # по очереди, для сравнения времени
+    python generate_all.py --no-publish  # только demo-data/
+    python generate_all.py --formats csv.gz,parquet
+"""
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from output_formats import COMPRESSED_FORMATS, parse_formats, sibling_path
+from reconcile_summary import write_summaries
+from shared_clients import get_or_create_clients
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PUBLIC_DIR = os.path.join(os.path.dirname(BASE_DIR), 'public', 'demo-data')
+
+# Генератор -> (модуль, функция, имя выгрузки)
+GENERATORS = {
+    'billing': ('gen_billing', 'generate_billing', 'billing_q4_2025.csv'),
+    'crm': ('gen_crm', 'generate_crm', 'crm_clients.csv'),
+    'portal': ('gen_portal', 'generate_portal', 'portal_activity_q4_2025.csv'),
+}
+
+
+def _run_generator(name: str, output_dir: str, formats=()) -> dict:
+    """Один генератор в процессе-воркере; его вывод возвращается, а не печатается."""
+    import importlib
+
+    module_name, function_name, file_name = GENERATORS[name]
+    started = time.perf_counter()
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        generate = getattr(importlib.import_module(module_name), function_name)
+        # Кэш уже подготовлен родителем — здесь база только открывается
+        stats = generate(clients=get_or_create_clients(), output_path=os.path.join(output_dir, file_name),
+                         formats=formats)
+    return {
+        'generator': name,
+        'output_path': os.path.join(output_dir, file_name),
+        'wall_s': time.perf_counter() - started,
+        'stats': stats,
+        'log': log.getvalue(),
+    }
+
+
+def _publish(path: str, public_dir: str) -> str:
+    """Копия выгрузки в public_dir; файл подменяется целиком, без полузаписанного CSV."""
+    target = os.path.join(public_dir, os.path.basename(path))
+    tmp_path = target + '.tmp'
+    shutil.copyfile(path, tmp_path)
+    os.replace(tmp_path, target)
+    return target
+
+
+def generate_all(generators=tuple(GENERATORS), output_dir=BASE_DIR, public_dir=PUBLIC_DIR,
+                 serial=False, formats=()) -> dict:
+    """Генерирует выгрузки и копирует их в public_dir (None — не копировать)
+    вместе с итогами сверки по ним.
+
+    serial=True — генераторы по очереди, но так же в отдельных процессах:
+    выгрузки совпадают с параллельным режимом, отличается только время.
+    formats — дополнительные форматы выгрузок (см. output_formats.py).
+    Возвращает результаты по генераторам и общее время.
+    """
+    formats = parse_formats(formats)
+    started = time.perf_counter()
+    get_or_create_clients()
+    clients_s = time.perf_counter() - started
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    if serial:
+        for name in generators:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                results.append(pool.submit(_run_generator, name, output_dir, formats).result())
+    else:
+        with ProcessPoolExecutor(max_workers=len(generators), mp_context=context) as pool:
+            futures = [pool.submit(_run_generator, name, output_dir, formats) for name in generators]
+            results = [future.result() for future in futures]
+
+    published = []
+    summaries = []
+    if public_dir is not None:
+        os.makedirs(public_dir, exist_ok=True)
+        served = [f for f in formats if f in COMPRESSED_FORMATS]
+        for r in results:
+            paths = [r['output_path']] + [sibling_path(r['output_path'], f) for f in served]
+            published.extend(_publish(path, public_dir) for path in paths)
+        summaries = write_summaries(data_dir=public_dir)
+
+    return {
+        'clients_s': clients_s,
+        'results': results,
+        'published': published,
+        'summaries': [s['name'] for s in summaries],
+        'total_s': time.perf_counter() - started,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Перегенерация всех демо-выгрузок')
+    parser.add_argument('--generators', default=','.join(GENERATORS), help='генераторы через запятую')
+    parser.add_argument('--serial', action='store_true', help='запускать генераторы по очереди')
+    parser.add_argument('--formats', default='', help='доп. форматы через запятую: csv.gz,csv.br,parquet,feather')
+    parser.add_argument('--no-publish', action='store_true', help='не копировать выгрузки в public/demo-data/')
+    args = parser.parse_args()
+
+    generators = args.generators.split(',')
+    unknown = set(generators) - set(GENERATORS)
+    if unknown:
+        parser.error(f'неизвестные генераторы: {", ".join(sorted(unknown))}')
+
+    try:
+        formats = parse_formats(args.formats)
+    except ValueError as e:
+        parser.error(str(e))
+
+    report = generate_all(generators, public_dir=None if args.no_publish else PUBLIC_DIR, serial=args.serial,
+                          formats=formats)
+    for r in report['results']:
+        print(r['log'], end='')
+    print('=== Перегенерация демо-данных ===')
+    print(f'База клиентов: {report["clients_s"]:.2f} с')
+    for r in report['results']:
+        print(f'{r["generator"]}: {r["wall_s"]:.2f} с')
+    serial_s = sum(r['wall_s'] for r in report['results'])
+    mode = 'по очереди' if args.serial else 'параллельно'
+    if report['summaries']:
+        print(f'Итоги сверки: {", ".join(report["summaries"])}')
+    print(f'Итого ({mode}): {report["total_s"]:.2f} с, сумма генераторов {serial_s:.2f} с')
+    for path in report['published']:
+        print(f'Скопировано: {os.path.relpath(path, os.path.dirname(BASE_DIR))}')
@@ -0,0 +1,262 @@
+"""
+Реквизиты клиентов: ИНН, телефон, лицевой счёт, email.
+
+Один модуль на все генераторы — форматы живут только здесь.
+Два вида функций:
+  * batched — N реквизитов за вызов из numpy.random.Generator: цифры
+    тянутся матрицей (N, k) и переводятся в строки без цикла по записям;
+    на них построены движок engine='vectorized' и бенчмарк;
+  * построчные random_* — из random.Random-подобного источника (модуль
+    random тоже подходит). Ими пользуется исходный движок engine='python'
+    и аномалии gen_billing / gen_crm: порядок вызовов ГСЧ у них прежний,
+    поэтому демо-выгрузки не меняются.
+
+ИНН по желанию делается с верными контрольными цифрами (valid=True):
+случайными остаются первые 9 (юрлицо) или 10 (физлицо) цифр, контрольные
+считаются по весам ФНС.
+
+Транслитерация — одна таблица для str.translate вместо сборки строки
+посимвольно.
+
+Бенчмарк: python identities.py --bench 1000000
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+PHONE_CODES = ['903', '905', '906', '909', '910', '915', '916', '917', '925', '926', '950', '951', '960', '961', '980', '981']
+
+_TRANSLIT = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+})
+
+# Веса контрольных цифр ИНН: 10 знаков — одна, 12 знаков — две
+_INN10_WEIGHTS = [2, 4, 10, 3, 5, 9, 4, 6, 8]
+_INN12_WEIGHTS = ([7, 2, 4, 10, 3, 5, 9, 4, 6, 8], [3, 7, 2, 4, 10, 3, 5, 9, 4, 6, 8])
+
+
+def transliterate(text: str) -> str:
+    """Кириллица -> латиница в нижнем регистре: 'Щукин' -> 'shchukin'."""
+    return text.lower().translate(_TRANSLIT)
+
+
+def transliterate_many(values) -> list:
+    """transliterate для списка; повторяющиеся строки (фамилии из словаря) считаются один раз."""
+    cache = {}
+    out = []
+    for value in values:
+        result = cache.get(value)
+        if result is None:
+            result = cache[value] = value.lower().translate(_TRANSLIT)
+        out.append(result)
+    return out
+
+
+# --- Контрольные цифры ИНН ---
+
+def _check_digit(digits, weights) -> int:
+    return sum(d * w for d, w in zip(digits, weights)) % 11 % 10
+
+
+def inn_check_digits(digits: list) -> list:
+    """Цифры ИНН (10 или 12) с пересчитанными контрольными."""
+    digits = list(digits)
+    if len(digits) == 10:
+        digits[9] = _check_digit(digits, _INN10_WEIGHTS)
+    elif len(digits) == 12:
+        digits[10] = _check_digit(digits, _INN12_WEIGHTS[0])
+        digits[11] = _check_digit(digits, _INN12_WEIGHTS[1])
+    else:
+        raise ValueError(f'ИНН из {len(digits)} цифр')
+    return digits
+
+
+def is_valid_inn(inn) -> bool:
+    """Верны ли контрольные цифры ИНН из 10 или 12 цифр."""
+    if not isinstance(inn, str) or len(inn) not in (10, 12) or not inn.isdigit():
+        return False
+    digits = [int(c) for c in inn]
+    return inn_check_digits(digits) == digits
+
+
+def _with_check_digits(digits: np.ndarray) -> np.ndarray:
+    """(n, 10|12) матрица цифр -> та же с контрольными цифрами (на месте)."""
+    if digits.shape[1] == 10:
+        digits[:, 9] = digits[:, :9].astype(np.int64) @ _INN10_WEIGHTS % 11 % 10
+    else:
+        digits[:, 10] = digits[:, :10].astype(np.int64) @ _INN12_WEIGHTS[0] % 11 % 10
+        digits[:, 11] = digits[:, :11].astype(np.int64) @ _INN12_WEIGHTS[1] % 11 % 10
+    return digits
+
+
+# --- Batched: numpy.random.Generator, N реквизитов за вызов ---
+
+def digits_to_bytes(digits: np.ndarray) -> np.ndarray:
+    """(n, k) массив цифр 0..9 -> массив ASCII-строк dtype S{k}."""
+    width = digits.shape[1]
+    buf = np.ascontiguousarray(digits.astype(np.uint8) + ord('0'))
+    return buf.view(f'S{width}').ravel()
+
+
+def random_digits(rng: np.random.Generator, n: int, width: int, first_nonzero=False) -> np.ndarray:
+    digits = rng.integers(0, 10, size=(n, width), dtype=np.uint8)
+    if first_nonzero:
+        digits[:, 0] = rng.integers(1, 10, size=n, dtype=np.uint8)
+    return digits
+
+
+def _number_digits(values: np.ndarray, width: int) -> np.ndarray:
+    """Целые -> (n, width) массив десятичных цифр с ведущими нулями."""
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    return (values.astype(np.int64)[:, None] // powers) % 10
+
+
+def inns_from_digits(digits: np.ndarray, valid=False) -> np.ndarray:
+    """(n, 10|12) матрица цифр -> ИНН как S{длина}; valid — пересчитать контрольные цифры."""
+    if valid:
+        _with_check_digits(digits)
+    return digits_to_bytes(digits)
+
+
+def random_inns(rng: np.random.Generator, n: int, length: int, valid=False) -> np.ndarray:
+    """n ИНН длины 10 (юрлица) или 12 (физлица) как S{length}, первая цифра 1-9."""
+    return inns_from_digits(random_digits(rng, n, length, first_nonzero=True), valid)
+
+
+def format_phones(code_idx: np.ndarray, n1: np.ndarray, n2: np.ndarray, n3: np.ndarray) -> np.ndarray:
+    """Телефоны '+7(903)123-45-67' как S16: индекс кода в PHONE_CODES и три группы цифр."""
+    codes = np.array([[int(d) for d in c] for c in PHONE_CODES], dtype=np.int64)
+    n = len(code_idx)
+    buf = np.empty((n, 16), dtype=np.uint8)
+    buf[:, :3] = np.frombuffer(b'+7(', dtype=np.uint8)
+    buf[:, 3:6] = codes[code_idx] + ord('0')
+    buf[:, 6] = ord(')')
+    buf[:, 7:10] = _number_digits(n1, 3) + ord('0')
+    buf[:, 10] = ord('-')
+    buf[:, 11:13] = _number_digits(n2, 2) + ord('0')
+    buf[:, 13] = ord('-')
+    buf[:, 14:16] = _number_digits(n3, 2) + ord('0')
+    return buf.view('S16').ravel()
+
+
+def random_phones(rng: np.random.Generator, n: int) -> np.ndarray:
+    """Телефоны '+7(903)123-45-67' как S16."""
+    code_idx = rng.integers(0, len(PHONE_CODES), size=n)
+    n1 = rng.integers(100, 1000, size=n)
+    n2 = rng.integers(10, 100, size=n)
+    n3 = rng.integers(10, 100, size=n)
+    return format_phones(code_idx, n1, n2, n3)
+
+
+def random_account_digits(rng: np.random.Generator, region_codes: np.ndarray) -> np.ndarray:
+    """Номера счетов без префикса 'ЛС-' как S9: код региона (n, 2 цифры) + 7 случайных."""
+    return digits_to_bytes(np.concatenate([region_codes, random_digits(rng, len(region_codes), 7)], axis=1))
+
+
+def account_numbers(digits: np.ndarray) -> list:
+    """S9 из random_account_digits -> ['ЛС-771234567', ...]."""
+    return ['ЛС-' + acc for acc in digits.astype('U9').tolist()]
+
+
+def b2c_emails(rng: np.random.Generator, last_names, domains: list) -> list:
+    """'ivanov123@mail.ru' на каждую фамилию: суффикс 1-999, домен из domains."""
+    suffix = rng.integers(1, 1000, size=len(last_names)).tolist()
+    domain = np.asarray(domains, dtype=object)[rng.integers(0, len(domains), size=len(last_names))].tolist()
+    return [f'{t}{s}@{d}' for t, s, d in zip(transliterate_many(last_names), suffix, domain)]
+
+
+def b2b_emails(rng: np.random.Generator, last_names, company_slugs, domains: list) -> list:
+    """'ivanov@romashka.tech': фамилия, slug компании, зона из domains."""
+    domain = np.asarray(domains, dtype=object)[rng.integers(0, len(domains), size=len(last_names))].tolist()
+    return [f'{t}@{c}.{d}' for t, c, d in zip(transliterate_many(last_names), company_slugs, domain)]
+
+
+# --- Построчные: random.Random-подобный источник, порядок вызовов как в исходном движке ---
+
+def random_digit_string(rand, length: int, first_nonzero=False) -> str:
+    first = str(rand.randint(1, 9)) if first_nonzero else str(rand.randint(0, 9))
+    return first + ''.join([str(rand.randint(0, 9)) for _ in range(length - 1)])
+
+
+def random_inn(rand, is_b2b: bool, valid=False) -> str:
+    inn = random_digit_string(rand, 10 if is_b2b else 12, first_nonzero=True)
+    if valid:
+        inn = ''.join(map(str, inn_check_digits([int(c) for c in inn])))
+    return inn
+
+
+def format_phone(code, n1: int, n2: int, n3: int) -> str:
+    return f'+7({code}){n1}-{n2}-{n3}'
+
+
+def random_phone(rand) -> str:
+    code = rand.choice(PHONE_CODES)
+    return format_phone(code, rand.randint(100, 999), rand.randint(10, 99), rand.randint(10, 99))
+
+
+def random_account_number(rand, region_code: str) -> str:
+    return f'ЛС-{region_code}{random_digit_string(rand, 7)}'
+
+
+def random_b2c_email(rand, last_name: str, domains: list) -> str:
+    domain = rand.choice(domains)
+    return f'{transliterate(last_name)}{rand.randint(1, 999)}@{domain}'
+
+
+def random_b2b_email(rand, last_name: str, company_slug: str, domains: list) -> str:
+    return f'{transliterate(last_name)}@{company_slug}.{rand.choice(domains)}'
+
+
+def _bench(n: int, valid: bool):
+    from name_pools import load_name_pools
+    from shared_clients import B2B_DOMAINS, EMAIL_DOMAINS_B2C, REGIONS
+
+    rng = np.random.default_rng(42)
+    last_names = load_name_pools().last_names(rng, n)
+    region_codes = np.array([[int(d) for d in code] for code in REGIONS.values()], dtype=np.uint8)
+    half = n // 2
+
+    started = time.perf_counter()
+    inns = np.concatenate([random_inns(rng, half, 10, valid), random_inns(rng, n - half, 12, valid).astype('S12')])
+    phones = random_phones(rng, n)
+    accounts = account_numbers(random_account_digits(rng, region_codes[rng.integers(0, len(region_codes), size=n)]))
+    emails = b2c_emails(rng, last_names[:half], EMAIL_DOMAINS_B2C) + \
+        b2b_emails(rng, last_names[half:], ['romashka'] * (n - half), B2B_DOMAINS)
+    batched = time.perf_counter() - started
+
+    sample = min(n, 100_000)
+    rand = random.Random(42)
+    region_list = list(REGIONS.values())
+    started = time.perf_counter()
+    for i in range(sample):
+        random_inn(rand, i < sample // 2, valid)
+        random_phone(rand)
+        random_account_number(rand, rand.choice(region_list))
+        if i < sample // 2:
+            random_b2c_email(rand, last_names[i], EMAIL_DOMAINS_B2C)
+        else:
+            random_b2b_email(rand, last_names[i], 'romashka', B2B_DOMAINS)
+    scalar = time.perf_counter() - started
+
+    checked = inns[:min(n, 10_000)].astype('U12').tolist()
+    valid_share = sum(is_valid_inn(inn) for inn in checked) / max(len(checked), 1)
+    assert len(phones) == len(accounts) == len(emails) == n
+    print(f'=== Реквизиты: {n:,} записей (ИНН, телефон, счёт, email) ===')
+    print(f'batched: {batched:.2f} с, {batched / n * 1e9:,.0f} нс на запись')
+    print(f'построчно ({sample:,}): {scalar:.2f} с, {scalar / sample * 1e9:,.0f} нс на запись')
+    print(f'ИНН с верными контрольными цифрами: {valid_share:.1%}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Бенчмарк генерации реквизитов')
+    parser.add_argument('--bench', type=int, default=1_000_000, help='число записей')
+    parser.add_argument('--valid-inn', action='store_true', help='ИНН с верными контрольными цифрами')
+    args = parser.parse_args()
+    _bench(args.bench, args.valid_inn)
@@ -0,0 +1,148 @@
+"""
+Манифест аномалий выгрузки — истинная разметка для оценки сверки.
+
+Генераторы считали аномалии только счётчиками stats. Теперь рядом с CSV
+пишется <выгрузка>.manifest.npz: по каждой аномалии — битовая карта
+затронутых строк (номер строки данных, 0-based, как в reconcile.py) и
+ключи этих строк (account_number, client_id, ...). Аномалии, которых в
+файле нет строками (клиенты, не попавшие в CRM; счета без ЛК), хранятся
+только ключами — по ним разметка переносится на строки другого файла.
+
+Карты лежат упакованными битами (np.packbits) в сжатом npz: у редких
+аномалий это десятки байт на миллион строк, а пересечение и объединение
+карт — побитовые операции над массивами uint8 (см. reconcile_score.py).
+
+    manifest = Manifest()
+    manifest.add('null_phone', rows, account_number=accounts)
+    manifest.remap(positions)      # строки перемешаны после разметки
+    manifest.n_rows = len(rows)
+    manifest.save(manifest_path(output_path))
+"""
+
+import os
+
+import numpy as np
+
+MANIFEST_VERSION = 1
+
+# Единичных битов в байте — для подсчёта строк в упакованной карте
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+
+def manifest_path(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + '.manifest.npz'
+
+
+def to_bitmap(rows, n_rows: int) -> np.ndarray:
+    """Номера строк -> упакованная битовая карта на n_rows строк."""
+    mask = np.zeros(n_rows, dtype=bool)
+    mask[np.asarray(rows, dtype=np.int64)] = True
+    return np.packbits(mask)
+
+
+def from_bitmap(bits: np.ndarray, n_rows: int) -> np.ndarray:
+    """Упакованная карта -> отсортированные номера строк."""
+    return np.flatnonzero(np.unpackbits(bits, count=n_rows))
+
+
+def bitmap_count(bits: np.ndarray) -> int:
+    return int(_POPCOUNT[bits].sum())
+
+
+def _key_array(values) -> np.ndarray:
+    values = [v for v in values if v is not None and v == v]
+    return np.array(values, dtype=str) if values else np.zeros(0, dtype='U1')
+
+
+class Manifest:
+    """Строки и ключи по аномалиям одной выгрузки; n_rows — строк в файле."""
+
+    def __init__(self, n_rows=0):
+        self.n_rows = n_rows
+        self._rows = {}
+        self._keys = {}
+
+    def add(self, name: str, rows=None, **keys):
+        """Добавляет строки аномалии name и/или её ключи по колонкам (None пропускаются)."""
+        parts = self._rows.setdefault(name, [])
+        if rows is not None:
+            parts.append(np.asarray(rows, dtype=np.int64))
+        columns = self._keys.setdefault(name, {})
+        for column, values in keys.items():
+            columns.setdefault(column, []).append(_key_array(values))
+
+    def discard(self, name: str):
+        """Убирает строки и ключи аномалии name (если она есть)."""
+        self._rows.pop(name, None)
+        self._keys.pop(name, None)
+
+    @property
+    def names(self) -> list:
+        return list(self._rows)
+
+    def rows(self, name: str) -> np.ndarray:
+        parts = self._rows.get(name, [])
+        return np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+
+    def keys(self, name: str, column: str) -> np.ndarray:
+        parts = self._keys.get(name, {}).get(column, [])
+        return np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype='U1')
+
+    def key_columns(self, name: str) -> list:
+        return list(self._keys.get(name, {}))
+
+    def bitmap(self, name: str) -> np.ndarray:
+        return to_bitmap(self.rows(name), self.n_rows)
+
+    def counts(self) -> dict:
+        """{аномалия: число строк}; для аномалий только с ключами — число ключей первой колонки."""
+        counts = {}
+        for name in self._rows:
+            rows = self.rows(name)
+            columns = self.key_columns(name)
+            counts[name] = len(rows) if len(rows) or not columns else len(self.keys(name, columns[0]))
+        return counts
+
+    def remap(self, positions: np.ndarray):
+        """Строки переставлены: бывшая строка i теперь на позиции positions[i]."""
+        positions = np.asarray(positions, dtype=np.int64)
+        for name, parts in self._rows.items():
+            self._rows[name] = [positions[rows] for rows in parts]
+
+    def extend(self, other: 'Manifest', row_offset: int):
+        """Дописывает манифест следующего куска файла (шарда), строки которого начинаются с row_offset."""
+        for name in other._rows:
+            self.add(name, other.rows(name) + row_offset)
+            for column in other.key_columns(name):
+                self._keys[name].setdefault(column, []).append(other.keys(name, column))
+        self.n_rows = max(self.n_rows, row_offset + other.n_rows)
+
+    def save(self, path: str):
+        arrays = {
+            'version': np.int64(MANIFEST_VERSION),
+            'n_rows': np.int64(self.n_rows),
+            'names': np.array(self.names, dtype=str),
+        }
+        for name in self._rows:
+            arrays[f'bits/{name}'] = self.bitmap(name)
+            for column in self.key_columns(name):
+                arrays[f'keys/{name}/{column}'] = self.keys(name, column)
+        # Через временный файл: полузаписанный манифест не подменит прежний
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'Manifest':
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['version']) != MANIFEST_VERSION:
+                raise ValueError(f'Неподдерживаемая версия манифеста: {int(data["version"])}')
+            manifest = cls(int(data['n_rows']))
+            for name in data['names'].tolist():
+                manifest._rows[name] = [from_bitmap(data[f'bits/{name}'], manifest.n_rows)]
+                manifest._keys[name] = {}
+            for entry in data.files:
+                if entry.startswith('keys/'):
+                    _, name, column = entry.split('/', 2)
+                    manifest._keys[name][column] = [data[entry]]
+        return manifest
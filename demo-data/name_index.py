@@ -0,0 +1,409 @@
+"""
+Индекс нечёткого сопоставления клиентов по ФИО и названию компании.
+Точный ключ не ловит аномалии генераторов: CRM переставляет или сокращает ФИО
+("Имя Отчество Фамилия", "Фамилия И.О."), снимает кавычки и переносит форму
+в конец ("Ромашка, ООО"), а ЛК подменяет имя мусором. Попарное нечёткое
+сравнение — O(n·m), поэтому кандидаты набираются в два этапа:
+  1. ключи блокировки: фамилия + инициалы (в обеих раскладках порядка ФИО)
+     и транслитерированная основа названия компании (transliterate);
+  2. для записей, не разрешённых ключами, — инвертированный индекс
+     3-грамм по ФИО с отсортированными словами (перестановки не мешают).
+Блоки ключей крупнее max_block и самые частые n-граммы (стоп-ключи) в индекс
+не идут, поэтому число пар-кандидатов растёт почти линейно. Пары оцениваются
+по совпадению слов ФИО, инициалов и основы компании; при равной лучшей оценке
+у нескольких записей совпадение считается неоднозначным и не выдаётся.
+
+Запуск:
+    python name_index.py                  # точность/полнота на демо-выгрузках
+    python name_index.py --bench 1000000  # 1M x 1M, пропускная способность
+"""
+
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from identities import transliterate
+from shared_clients import B2B_COMPANY_FORMS, get_or_create_clients
+
+_PUNCT = re.compile('["«»\'.,]')
+_NON_ALNUM = re.compile(r'[^0-9a-z]')
+_FORMS = {form.lower() for form in B2B_COMPANY_FORMS}
+
+# Блок ключа крупнее — стоп-ключ (частая фамилия с инициалами, популярное слово в названии)
+MAX_BLOCK = 128
+# 3-грамма, встречающаяся у большего числа записей, в индекс не попадает ("вич", "овн")
+MAX_POSTING = 2000
+# Порог оценки пары по ключам: фамилия целиком + оба инициала
+MIN_SCORE = 4
+# Порог коэффициента Дайса по 3-граммам для второго этапа
+MIN_DICE = 0.75
+
+# Раскладки порядка слов запроса относительно "Фамилия Имя Отчество"
+_ORDERS = ((0, 1, 2), (2, 0, 1))
+
+
+def _name_tokens(name) -> list:
+    if not isinstance(name, str) or not name:
+        return []
+    return _PUNCT.sub(' ', name.lower().replace('ё', 'е')).split()
+
+
+def _company_stem(name) -> str:
+    """Основа названия без формы и кавычек, латиницей: 'ООО "Ромашка"' -> 'romashka'."""
+    words = [w for w in _name_tokens(name) if w not in _FORMS]
+    return _NON_ALNUM.sub('', transliterate(''.join(words)))
+
+
+def _person_keys(tokens: list) -> list:
+    """Ключи блокировки по ФИО: фамилия + инициалы в обеих раскладках порядка."""
+    if len(tokens) < 3:
+        return []
+    keys = []
+    for s, f, m in _ORDERS:
+        if len(tokens[s]) > 1:
+            keys.append(f'p|{tokens[s]}|{tokens[f][0]}{tokens[m][0]}')
+    return keys
+
+
+def _features(contact_names, company_names=None) -> dict:
+    """Ключи блокировки и признаки для оценки пар по каждой записи."""
+    n = len(contact_names)
+    if company_names is None:
+        company_names = [None] * n
+    key_hashes, key_rows = [], []
+    tok_hash, tok_init, tok_short = [], [], []
+    stem_hash, canon = [], []
+    stems = {}  # названия компаний сильно повторяются — основа считается один раз
+
+    for i, (contact, company) in enumerate(zip(contact_names, company_names)):
+        tokens = _name_tokens(contact)
+        for key in _person_keys(tokens):
+            key_hashes.append(hash(key))
+            key_rows.append(i)
+        words = (tokens + ['', '', ''])[:3]
+        tok_hash.extend(hash(w) if w else 0 for w in words)
+        tok_init.extend(ord(w[0]) if w else 0 for w in words)
+        tok_short.extend(len(w) == 1 for w in words)
+
+        stem = ''
+        if isinstance(company, str):
+            stem = stems.get(company)
+            if stem is None:
+                stem = stems[company] = _company_stem(company)
+        if stem:
+            stem_hash.append(hash(stem))
+            key_hashes.append(hash(f'c|{stem}'))
+            key_rows.append(i)
+        else:
+            stem_hash.append(0)
+        canon.append(' '.join(sorted(tokens)) if tokens else stem)
+
+    return {
+        'n': n,
+        'key_hashes': np.array(key_hashes, dtype=np.int64),
+        'key_rows': np.array(key_rows, dtype=np.int64),
+        'tok_hash': np.array(tok_hash, dtype=np.int64).reshape(n, 3),
+        'tok_init': np.array(tok_init, dtype=np.uint32).reshape(n, 3),
+        'tok_short': np.array(tok_short, dtype=bool).reshape(n, 3),
+        'stem_hash': np.array(stem_hash, dtype=np.int64),
+        'canon': np.array(canon, dtype=object),
+    }
+
+
+def _unique_counts(values: np.ndarray):
+    """np.unique(return_counts=True) через сортировку — заметно быстрее на десятках миллионов."""
+    values = np.sort(values)
+    first = np.ones(len(values), dtype=bool)
+    first[1:] = values[1:] != values[:-1]
+    starts = np.flatnonzero(first)
+    return values[starts], np.diff(np.append(starts, len(values)))
+
+
+def _expand(left: np.ndarray, size: np.ndarray, rows: np.ndarray):
+    """(индекс запроса, позиция в отсортированном индексе) для всех элементов диапазонов."""
+    total = int(size.sum())
+    q = np.repeat(rows, size)
+    pos = np.repeat(left - (np.cumsum(size) - size), size) + np.arange(total)
+    return q, pos
+
+
+def _trigrams(canon: np.ndarray):
+    """Уникальные 3-граммы строк: (номер строки, код 3-граммы), по возрастанию строк.
+
+    Строки склеиваются в один буфер кодов символов с границами по строкам, так что
+    память — по суммарной длине, а не (строк × самая длинная строка).
+    """
+    strings = canon.tolist()
+    lengths = np.fromiter((len(s) for s in strings), dtype=np.int64, count=len(strings))
+    size = np.maximum(lengths - 2, 0)
+    if size.sum() == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint64)
+    codes = np.frombuffer(''.join(strings).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    starts = np.cumsum(lengths) - lengths
+    rows, pos = _expand(starts, size, np.arange(len(strings), dtype=np.int64))
+    grams = (codes[pos] << 42) | (codes[pos + 1] << 21) | codes[pos + 2]
+    # Сортировка по (строка, 3-грамма): повторы внутри строки встают рядом
+    order = np.lexsort((grams, rows))
+    rows, grams = rows[order], grams[order]
+    keep = np.ones(len(rows), dtype=bool)
+    keep[1:] = (rows[1:] != rows[:-1]) | (grams[1:] != grams[:-1])
+    return rows[keep], grams[keep]
+
+
+def _best_per_query(q: np.ndarray, r: np.ndarray, score: np.ndarray, n: int):
+    """Лучшая пара на запрос: (ref, score, ambiguous); ref = -1, если пар нет."""
+    ref = np.full(n, -1, dtype=np.int64)
+    best = np.zeros(n, dtype=score.dtype)
+    ambiguous = np.zeros(n, dtype=bool)
+    if len(q) == 0:
+        return ref, best, ambiguous
+    order = np.lexsort((-score, q))
+    q, r, score = q[order], r[order], score[order]
+    first = np.ones(len(q), dtype=bool)
+    first[1:] = q[1:] != q[:-1]
+    ref[q[first]] = r[first]
+    best[q[first]] = score[first]
+    # Ещё одна пара группы с лучшей оценкой — ничья
+    tie = ~first & (score == best[q])
+    ambiguous[q[tie]] = True
+    return ref, best, ambiguous
+
+
+class NameIndex:
+    """Индекс справочника записей (ФИО + название компании) для нечёткого поиска."""
+
+    def __init__(self, contact_names, company_names=None, max_block=MAX_BLOCK, max_posting=MAX_POSTING):
+        self.max_block = max_block
+        self.max_posting = max_posting
+        self.ref = _features(contact_names, company_names)
+        order = np.argsort(self.ref['key_hashes'], kind='stable')
+        self._keys = self.ref['key_hashes'][order]
+        self._key_rows = self.ref['key_rows'][order]
+        self._grams = None
+
+    def __len__(self):
+        return self.ref['n']
+
+    def _gram_index(self):
+        """Инвертированный индекс 3-грамм строится лениво — нужен только второму этапу."""
+        if self._grams is None:
+            rows, grams = _trigrams(self.ref['canon'])
+            order = np.argsort(grams, kind='stable')
+            rows, grams = rows[order], grams[order]
+            _, count = _unique_counts(grams)
+            stop = np.repeat(count > self.max_posting, count)
+            gram_count = np.bincount(rows[~stop], minlength=len(self))
+            self._grams = (grams, rows, gram_count)
+        return self._grams
+
+    def key_candidates(self, query: dict):
+        """Пары (запрос, запись справочника) с общим ключом блокировки."""
+        keys, rows = query['key_hashes'], query['key_rows']
+        left = np.searchsorted(self._keys, keys, 'left')
+        size = np.searchsorted(self._keys, keys, 'right') - left
+        keep = (size > 0) & (size <= self.max_block)
+        q, pos = _expand(left[keep], size[keep], rows[keep])
+        pairs, _ = _unique_counts(q * len(self) + self._key_rows[pos])
+        return pairs // len(self), pairs % len(self)
+
+    def gram_candidates(self, canon: np.ndarray, rows: np.ndarray):
+        """Пары (запрос, запись) по общим 3-граммам и их коэффициент Дайса."""
+        ref_grams, ref_rows, ref_count = self._gram_index()
+        q_local, grams = _trigrams(canon[rows])
+        left = np.searchsorted(ref_grams, grams, 'left')
+        size = np.searchsorted(ref_grams, grams, 'right') - left
+        usable = size <= self.max_posting
+        q_count = np.bincount(q_local[usable], minlength=len(rows))
+        keep = usable & (size > 0)
+        q, pos = _expand(left[keep], size[keep], q_local[keep])
+        pairs, shared = _unique_counts(q * len(self) + ref_rows[pos])
+        q, r = pairs // len(self), pairs % len(self)
+        dice = 2 * shared / np.maximum(q_count[q] + ref_count[r], 1)
+        return rows[q], r, dice
+
+    def score_pairs(self, query: dict, q: np.ndarray, r: np.ndarray) -> np.ndarray:
+        """Оценка пар: слово ФИО целиком — 2, совпавший инициал — 1, основа компании — 2."""
+        ref = self.ref
+        best = np.zeros(len(q), dtype=np.int64)
+        for order in _ORDERS:
+            score = np.zeros(len(q), dtype=np.int64)
+            for p, qp in enumerate(order):
+                q_short, r_short = query['tok_short'][q, qp], ref['tok_short'][r, p]
+                full = (query['tok_hash'][q, qp] == ref['tok_hash'][r, p]) & ~q_short & ~r_short
+                initial = (query['tok_init'][q, qp] == ref['tok_init'][r, p]) & (q_short | r_short)
+                score += 2 * full + (initial & (query['tok_init'][q, qp] != 0))
+            best = np.maximum(best, score)
+        stem = query['stem_hash'][q]
+        return best + 2 * ((stem != 0) & (stem == ref['stem_hash'][r]))
+
+    def match(self, contact_names, company_names=None, min_score=MIN_SCORE, min_dice=MIN_DICE) -> dict:
+        """Лучшая запись справочника для каждого запроса.
+
+        Возвращает dict массивов: ref (индекс записи или -1), score, via
+        (1 — ключи, 2 — 3-граммы, 0 — нет совпадения), ambiguous,
+        а также все пары-кандидаты pairs_q / pairs_r.
+        """
+        query = _features(contact_names, company_names)
+        n = query['n']
+        q, r = self.key_candidates(query)
+        score = self.score_pairs(query, q, r)
+        ref, best, ambiguous = _best_per_query(q, r, score, n)
+        accepted = (ref >= 0) & (best >= min_score) & ~ambiguous
+        via = np.where(accepted, 1, 0).astype(np.int8)
+
+        # Второй этап — 3-граммы для записей, которые ключи не разрешили
+        rest = np.flatnonzero(~accepted & ~ambiguous)
+        gq, gr, dice = self.gram_candidates(query['canon'], rest)
+        g_ref, g_best, g_ambiguous = _best_per_query(gq, gr, dice, n)
+        g_accepted = (g_ref >= 0) & (g_best >= min_dice) & ~g_ambiguous
+        via[g_accepted] = 2
+        ambiguous |= g_ambiguous & (g_best >= min_dice)
+
+        result_ref = np.where(accepted, ref, np.where(g_accepted, g_ref, -1))
+        result_score = np.where(accepted, best, np.where(g_accepted, g_best, 0))
+        return {
+            'ref': result_ref,
+            'score': result_score,
+            'via': via,
+            'ambiguous': ambiguous & (via == 0),
+            'pairs_q': np.concatenate([q, gq]),
+            'pairs_r': np.concatenate([r, gr]),
+        }
+
+
+def _metrics(result: dict, truth: np.ndarray, n_ref: int, anomaly: np.ndarray) -> dict:
+    """Полнота кандидатов, точность/полнота лучшего совпадения (всего и по аномалиям)."""
+    has_truth = truth >= 0
+    found = np.zeros(len(truth), dtype=bool)
+    hit = result['pairs_r'] == truth[result['pairs_q']]
+    found[result['pairs_q'][hit]] = True
+    predicted = result['ref'] >= 0
+    correct = predicted & (result['ref'] == truth)
+    anomaly = anomaly & has_truth
+    return {
+        'rows': len(truth),
+        'pairs': len(result['pairs_q']),
+        'reduction_ratio': 1 - len(result['pairs_q']) / max(len(truth) * n_ref, 1),
+        'pair_completeness': found[has_truth].mean() if has_truth.any() else 0.0,
+        'precision': correct.sum() / max(predicted.sum(), 1),
+        'recall': correct[has_truth].mean() if has_truth.any() else 0.0,
+        'anomaly_rows': int(anomaly.sum()),
+        'anomaly_recall': correct[anomaly].mean() if anomaly.any() else 0.0,
+        'ambiguous': int(result['ambiguous'].sum()),
+    }
+
+
+def _print_metrics(title: str, m: dict, exact_recall: float):
+    print(f'--- {title} ---')
+    print(f'Запросов: {m["rows"]:,}, пар-кандидатов: {m["pairs"]:,} '
+          f'({m["pairs"] / max(m["rows"], 1):.2f} на запрос, reduction ratio {m["reduction_ratio"]:.6f})')
+    print(f'Полнота кандидатов (истинная пара среди кандидатов): {m["pair_completeness"]:.4f}')
+    print(f'Точность: {m["precision"]:.4f}, полнота: {m["recall"]:.4f}, неоднозначных: {m["ambiguous"]:,}')
+    print(f'Строки с аномалией имени: {m["anomaly_rows"]:,}, полнота по ним: {m["anomaly_recall"]:.4f} '
+          f'(точный ключ: {exact_recall:.4f})')
+
+
+def _exact_recall(ref_names: list, query_names: list, truth: np.ndarray, anomaly: np.ndarray) -> float:
+    """Полнота сопоставления по точному совпадению ФИО — для сравнения."""
+    lookup = {}
+    for i, name in enumerate(ref_names):
+        lookup.setdefault(name, i)
+    pred = np.array([lookup.get(name, -1) for name in query_names], dtype=np.int64)
+    mask = anomaly & (truth >= 0)
+    return float((pred[mask] == truth[mask]).mean()) if mask.any() else 0.0
+
+
+def _evaluate_demo():
+    """Сопоставление CRM и ЛК с общей базой клиентов по именам.
+
+    Истинная пара берётся по неизменяемым полям (ИНН для CRM, лицевой счёт
+    или email для ЛК), аномалия — имя в выгрузке отличается от имени в базе.
+    """
+    base = os.path.dirname(os.path.abspath(__file__))
+    clients = get_or_create_clients()
+    ref_contacts = [c['contact_name'] for c in clients]
+    ref_companies = [c['company_name'] for c in clients]
+    index = NameIndex(ref_contacts, ref_companies)
+
+    by_inn = {c['inn']: i for i, c in enumerate(clients)}
+    by_email = {c['email']: i for i, c in enumerate(clients)}
+    by_account = {acc: i for i, c in enumerate(clients) for acc in c['accounts']}
+
+    crm = pd.read_csv(os.path.join(base, 'crm_clients.csv'), sep=';', dtype=str, encoding='utf-8-sig')
+    crm = crm.astype(object).where(crm.notna(), None)
+    truth = np.array([by_inn.get(inn, -1) for inn in crm['inn']], dtype=np.int64)
+    anomaly = np.array([
+        t >= 0 and (contact != ref_contacts[t] or company != ref_companies[t])
+        for t, contact, company in zip(truth, crm['contact_name'], crm['company_name'])
+    ])
+    result = index.match(list(crm['contact_name']), list(crm['company_name']))
+    _print_metrics('CRM -> база клиентов', _metrics(result, truth, len(index), anomaly),
+                   _exact_recall(ref_contacts, list(crm['contact_name']), truth, anomaly))
+
+    portal = pd.read_csv(os.path.join(base, 'portal_activity_q4_2025.csv'), sep=';', dtype=str, encoding='utf-8-sig')
+    portal = portal.astype(object).where(portal.notna(), None)
+    truth = np.array([
+        by_account.get(acc, by_email.get(email, -1))
+        for acc, email in zip(portal['account_number'], portal['email'])
+    ], dtype=np.int64)
+    anomaly = np.array([t >= 0 and name != ref_contacts[t] for t, name in zip(truth, portal['display_name'])])
+    result = index.match(list(portal['display_name']))
+    _print_metrics('ЛК -> база клиентов', _metrics(result, truth, len(index), anomaly),
+                   _exact_recall(ref_contacts, list(portal['display_name']), truth, anomaly))
+
+
+def _bench(n: int, seed=42):
+    """n x n: справочник из векторизованной базы, запросы — её копия с аномалиями CRM."""
+    from anomalies import apply_anomalies
+    from gen_crm import CRM_ANOMALIES
+    from vectorized_clients import generate_vectorized_clients
+
+    started = time.perf_counter()
+    clients = generate_vectorized_clients(n_b2c=n * 7 // 10, n_b2b=n - n * 7 // 10, seed=seed)
+    reference = pd.DataFrame({
+        'segment': [c['segment'] for c in clients],
+        'contact_name': [c['contact_name'] for c in clients],
+        'company_name': [c['company_name'] for c in clients],
+    }, dtype=object)
+    ref_contacts = reference['contact_name'].tolist()
+    ref_companies = reference['company_name'].tolist()
+
+    # Аномалии ФИО и названий — те же объявления, что в gen_crm (12% ФИО, 25% B2B-названий)
+    rng = np.random.default_rng(seed)
+    queries = reference.copy()
+    apply_anomalies(queries, [a for a in CRM_ANOMALIES if a.name in ('alt_company', 'alt_name')], rng)
+    order = rng.permutation(n)
+    queries = queries.iloc[order]
+    query_contacts = queries['contact_name'].tolist()
+    query_companies = queries['company_name'].tolist()
+    anomaly = np.array([q != ref_contacts[i] or c != ref_companies[i]
+                        for q, c, i in zip(query_contacts, query_companies, order.tolist())])
+    truth = order.astype(np.int64)
+    print(f'=== Сопоставление по именам, {n:,} x {n:,} ===')
+    print(f'Подготовка данных: {time.perf_counter() - started:.1f} с')
+
+    started = time.perf_counter()
+    index = NameIndex(ref_contacts, ref_companies)
+    build = time.perf_counter() - started
+    started = time.perf_counter()
+    result = index.match(query_contacts, query_companies)
+    matching = time.perf_counter() - started
+    print(f'Индекс: {build:.1f} с ({n / build:,.0f} записей/с), '
+          f'сопоставление: {matching:.1f} с ({n / matching:,.0f} запросов/с)')
+    _print_metrics('Копия базы с аномалиями CRM', _metrics(result, truth, n, anomaly),
+                   _exact_recall(ref_contacts, query_contacts, truth, anomaly))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Нечёткое сопоставление по ФИО и названию компании')
+    parser.add_argument('--bench', type=int, default=None, help='размер справочника и числа запросов')
+    args = parser.parse_args()
+
+    if args.bench:
+        _bench(args.bench)
+    else:
+        _evaluate_demo()
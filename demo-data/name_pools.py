@@ -0,0 +1,132 @@
+"""
+Словари ФИО и слов для названий компаний (ru_RU) в виде массивов.
+
+Генераторы раньше звали fake.last_name() / first_name() / middle_name() /
+company() на каждую запись, и накладные расходы Faker на вызов съедали
+заметную часть генерации. Здесь словари материализуются один раз на seed
+и кэшируются на диске (client_cache/name_pools-*.npz), а имена тянутся
+целочисленными индексами numpy.random.Generator сразу массивом.
+
+ФИО согласованы по полу: фамилия, имя и отчество берутся из мужских или
+женских словарей одной и той же записи. Мужской и женский словари лежат
+одним массивом (сначала мужские), так что индекс сам определяет пол.
+
+Для генераторов с «глобальным» засевом (как random.seed / Faker.seed при
+импорте) есть общий генератор: seed(n) и rng().
+"""
+
+import os
+from importlib.metadata import version
+
+import numpy as np
+
+POOL_FORMAT_VERSION = 1
+# Слова для названий компаний извлекаются из fake.company(), как раньше
+# делал построчный движок, но один раз на seed, а не на каждого клиента
+COMPANY_POOL_SIZE = 4096
+
+_KINDS = ['last', 'first', 'middle']
+_pools = {}
+_rng = np.random.default_rng(42)
+
+
+def seed(value: int):
+    """Пересевает общий генератор имён (аналог Faker.seed)."""
+    global _rng
+    _rng = np.random.default_rng(value)
+
+
+def rng() -> np.random.Generator:
+    return _rng
+
+
+class NamePools:
+    """Словари имён и слов компаний; выборки — индексами, сразу на n записей."""
+
+    def __init__(self, arrays: dict):
+        self.last = arrays['last']
+        self.first = arrays['first']
+        self.middle = arrays['middle']
+        self.company = arrays['company']
+        # Число мужских вариантов в начале каждого словаря ФИО
+        self.n_male = {kind: int(n) for kind, n in zip(_KINDS, arrays['n_male'])}
+
+    def _gendered(self, kind: str, rng: np.random.Generator, male: np.ndarray) -> np.ndarray:
+        n_male = self.n_male[kind]
+        n_female = len(getattr(self, kind)) - n_male
+        return np.where(male, rng.integers(0, n_male, size=len(male)),
+                        n_male + rng.integers(0, n_female, size=len(male)))
+
+    def fio_indices(self, rng: np.random.Generator, n: int, male=None) -> tuple:
+        """Индексы (фамилия, имя, отчество) в self.last/first/middle.
+
+        male — None (пол случайный, 50/50), bool для всех записей или массив.
+        """
+        if male is None:
+            male = rng.random(n) < 0.5
+        male = np.broadcast_to(np.asarray(male, dtype=bool), (n,))
+        return tuple(self._gendered(kind, rng, male) for kind in _KINDS)
+
+    def fio(self, rng: np.random.Generator, n: int, male=None) -> tuple:
+        """(фамилии, имена, отчества) — три списка по n строк, согласованных по полу."""
+        last, first, middle = self.fio_indices(rng, n, male)
+        return self.last[last].tolist(), self.first[first].tolist(), self.middle[middle].tolist()
+
+    def full_names(self, rng: np.random.Generator, n: int, male=None) -> list:
+        """'Фамилия Имя Отчество' x n."""
+        return [f'{l} {f} {m}' for l, f, m in zip(*self.fio(rng, n, male))]
+
+    def short_names(self, rng: np.random.Generator, n: int, male=None) -> list:
+        """'Фамилия И.О.' x n."""
+        return [f'{l} {f[0]}.{m[0]}.' for l, f, m in zip(*self.fio(rng, n, male))]
+
+    def last_names(self, rng: np.random.Generator, n: int) -> list:
+        return self.last[rng.integers(0, len(self.last), size=n)].tolist()
+
+    def company_words(self, rng: np.random.Generator, n: int) -> list:
+        return self.company[rng.integers(0, len(self.company), size=n)].tolist()
+
+
+def _build_arrays(pool_seed: int) -> dict:
+    from faker import Faker
+    from faker.providers.person.ru_RU import Provider as PersonProvider
+
+    fake = Faker('ru_RU')
+    fake.seed_instance(pool_seed)
+    arrays = {
+        kind: np.array(list(getattr(PersonProvider, f'{kind}_names_male'))
+                       + list(getattr(PersonProvider, f'{kind}_names_female')))
+        for kind in _KINDS
+    }
+    arrays['n_male'] = np.array([len(getattr(PersonProvider, f'{kind}_names_male')) for kind in _KINDS])
+    arrays['company'] = np.array([fake.company().split(',')[0].split(' ')[-1] for _ in range(COMPANY_POOL_SIZE)])
+    return arrays
+
+
+def pools_path(cache_dir: str, pool_seed: int) -> str:
+    # Версия Faker в имени: словари берутся из его провайдеров
+    return os.path.join(cache_dir, 'client_cache',
+                        f'name_pools-v{POOL_FORMAT_VERSION}-faker{version("faker")}-seed{pool_seed}.npz')
+
+
+def load_name_pools(pool_seed=42, cache_dir=None) -> NamePools:
+    """Словари для pool_seed: из памяти процесса, с диска или собранные заново."""
+    if cache_dir is None:
+        cache_dir = os.path.dirname(os.path.abspath(__file__))
+    path = pools_path(cache_dir, pool_seed)
+    pools = _pools.get(path)
+    if pools is not None:
+        return pools
+
+    if os.path.exists(path):
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+    else:
+        arrays = _build_arrays(pool_seed)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Пишется под временным именем: параллельные генераторы не прочтут половину файла
+        tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+    pools = _pools[path] = NamePools(arrays)
+    return pools
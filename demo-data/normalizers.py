@@ -0,0 +1,327 @@
+"""
+Нормализаторы ключей для сверки — Python-порт src/utils/normalizers.js.
+Поведение совпадает с JS-версией один в один, включая крайние случаи
+(пустые значения -> None, паддинг ИНН нулями до 10/12 знаков).
+
+Скалярные normalize_* — для отдельных значений; *_column — для целых колонок:
+кусками через pyarrow.compute (строки в Arrow, regex — RE2), без pyarrow —
+скалярной функцией по значениям. Пробелы в \\s и trim() JS — свой набор
+символов, не совпадающий ни с \\s в re, ни с RE2, поэтому класс задан явно.
+
+Совпадение с src/utils/normalizers.js проверяется через node на демо-данных
+и крайних случаях: python normalizers.py --check-js
+
+Бенчмарк: python normalizers.py --bench 10000000
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import re
+import shutil
+import subprocess
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# \s и trim() в JS: пробельные символы Unicode и переводы строк
+_JS_SPACES = '\t\n\v\f\r \u00a0\u1680' + ''.join(map(chr, range(0x2000, 0x200b))) + '\u2028\u2029\u202f\u205f\u3000\ufeff'
+_FORMS = 'ооо|оао|зао|пао|ип|ао'
+_QUOTE_CHARS = '"«»\''
+
+_NON_DIGITS = re.compile(r'[^0-9]')
+_QUOTES = re.compile(f'[{_QUOTE_CHARS}]')
+# ',\s*' -> ' ' и затем '\s+' -> ' ' в JS — то же, что одна замена серий запятых и пробелов
+_SEPARATORS = re.compile(f'[,{_JS_SPACES}]+')
+_TRAILING_FORM = re.compile(f'^(.+?)[{_JS_SPACES}]+({_FORMS})[{_JS_SPACES}]*$')
+_HAS_TRAILING_FORM = re.compile(f'.[{_JS_SPACES}]+({_FORMS})[{_JS_SPACES}]*$')
+
+
+def normalize_phone(phone):
+    """Нормализация телефона -> 79XXXXXXXXX (только цифры)."""
+    if not phone:
+        return None
+    digits = _NON_DIGITS.sub('', str(phone))
+    if len(digits) == 11 and digits[0] == '8':
+        return '7' + digits[1:]
+    if len(digits) == 11 and digits[0] == '7':
+        return digits
+    if len(digits) == 10:
+        return '7' + digits
+    return digits or None
+
+
+def normalize_inn(inn):
+    """Нормализация ИНН -> строка фиксированной длины (10 или 12)."""
+    if not inn:
+        return None
+    cleaned = _NON_DIGITS.sub('', str(inn))
+    if not cleaned:
+        return None
+    if len(cleaned) <= 10:
+        return cleaned.rjust(10, '0')
+    return cleaned.rjust(12, '0')
+
+
+def normalize_company_name(name):
+    """Нормализация названия компании -> lowercase без кавычек и лишних пробелов."""
+    if not name:
+        return None
+    n = _SEPARATORS.sub(' ', _QUOTES.sub('', name.lower())).strip(_JS_SPACES)
+    # "ромашка ооо" -> "ооо ромашка"
+    return _TRAILING_FORM.sub(r'\2 \1', n)
+
+
+# Колонки обрабатываются кусками, чтобы промежуточные массивы Arrow не разрастались
+COLUMN_CHUNK = 1_000_000
+
+
+def _as_series(values) -> pd.Series:
+    return values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+
+
+def _map_scalar(values, fn) -> pd.Series:
+    """Колонка без pyarrow: скалярная функция по каждому значению."""
+    series = _as_series(values)
+    out = [fn(v) if isinstance(v, str) else (fn(str(v)) if pd.notna(v) else None) for v in series.tolist()]
+    return pd.Series(out, index=series.index, dtype=object)
+
+
+def _map_arrow(values, fn) -> pd.Series:
+    """Применяет fn (pyarrow-массив строк -> массив строк) к кускам колонки по COLUMN_CHUNK.
+
+    Пропуски и '' на входе -> None на выходе, как у скалярных normalize_*.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    series = _as_series(values)
+    raw = series.to_numpy(dtype=object)
+    parts = []
+    for start in range(0, len(raw), COLUMN_CHUNK):
+        chunk = raw[start:start + COLUMN_CHUNK]
+        try:
+            arr = pa.array(chunk, type=pa.string(), from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Не строки (числа и т.п.) — через str(), как String() в JS
+            arr = pa.array([None if pd.isna(v) else str(v) for v in chunk], type=pa.string())
+        empty = pc.fill_null(pc.equal(arr, ''), True)
+        parts.append(pc.if_else(empty, pa.scalar(None, pa.string()), fn(arr)).to_numpy(zero_copy_only=False))
+    out = parts[0] if len(parts) == 1 else np.concatenate(parts) if parts else np.empty(0, dtype=object)
+    return pd.Series(out, index=series.index, dtype=object)
+
+
+def _map_column(values, fn, scalar) -> pd.Series:
+    if importlib.util.find_spec('pyarrow') is None:
+        return _map_scalar(values, scalar)
+    return _map_arrow(values, fn)
+
+
+def _patch(arr, mask, fn):
+    """fn только для строк под mask, остальные — как есть: дорогие ядра не трогают чистые строки."""
+    import pyarrow.compute as pc
+
+    mask = pc.fill_null(mask, False)
+    if not pc.any(mask).as_py():
+        return arr
+    return pc.replace_with_mask(arr, mask, fn(pc.filter(arr, mask)))
+
+
+def _strip_non_digits(arr):
+    import pyarrow.compute as pc
+
+    # Обычные разделители телефона — литеральными заменами: regex RE2 по такой строке вдвое медленнее
+    for sep in '+() -':
+        arr = pc.replace_substring(arr, sep, '')
+    return _patch(arr, pc.invert(pc.ascii_is_decimal(arr)), lambda a: pc.replace_substring_regex(a, '[^0-9]', ''))
+
+
+def _digits(arr):
+    """Цифры строк; строка без цифр -> null. Чистые строки из одних цифр не трогаются."""
+    import pyarrow.compute as pc
+
+    digits = _patch(arr, pc.invert(pc.ascii_is_decimal(arr)), _strip_non_digits)
+    return pc.if_else(pc.equal(pc.utf8_length(digits), 0), None, digits)
+
+
+def _phone_arrow(arr):
+    import pyarrow.compute as pc
+
+    digits = _digits(arr)
+    length = pc.utf8_length(digits)
+    eight = pc.and_(pc.equal(length, 11), pc.starts_with(digits, '8'))
+    prefixed = pc.binary_join_element_wise('7', pc.if_else(eight, pc.utf8_slice_codeunits(digits, 1), digits), '')
+    return pc.if_else(pc.or_(eight, pc.equal(length, 10)), prefixed, digits)
+
+
+def _inn_arrow(arr):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    def pad(a):
+        return pc.if_else(pc.less_equal(pc.utf8_length(a), 10), pc.utf8_lpad(a, 10, '0'), pc.utf8_lpad(a, 12, '0'))
+
+    digits = _digits(arr)
+    return _patch(digits, pc.invert(pc.is_in(pc.utf8_length(digits), pa.array([10, 12], pa.int32()))), pad)
+
+
+def _company_name_arrow(arr):
+    import pyarrow.compute as pc
+
+    n = pc.utf8_lower(arr)
+    # Кавычки — литеральными заменами: это вдвое быстрее класса символов в RE2
+    for quote in _QUOTE_CHARS:
+        n = pc.replace_substring(n, quote, '')
+    n = pc.utf8_trim(pc.replace_substring_regex(n, _SEPARATORS.pattern, ' '), _JS_SPACES)
+    # Перестановка формы — только у строк, которые ей заканчиваются: regex с группами дорогой
+    n = _patch(n, pc.match_substring_regex(n, _HAS_TRAILING_FORM.pattern),
+               lambda a: pc.replace_substring_regex(a, _TRAILING_FORM.pattern, r'\2 \1'))
+    # У İ и Σ строчная форма зависит от контекста (İ -> i + точка, Σ -> ς в конце слова),
+    # utf8_lower этого не делает — такие строки считаются скалярно
+    special = pc.fill_null(pc.match_substring_regex(arr, '[İΣ]'), False)
+    if pc.any(special).as_py():
+        fixed = [normalize_company_name(v) for v in pc.filter(arr, special).to_pylist()]
+        n = pc.replace_with_mask(n, special, fixed)
+    return n
+
+
+def normalize_phone_column(values) -> pd.Series:
+    """normalize_phone для целой колонки (Series / массив / список)."""
+    return _map_column(values, _phone_arrow, normalize_phone)
+
+
+def normalize_inn_column(values) -> pd.Series:
+    """normalize_inn для целой колонки (Series / массив / список)."""
+    return _map_column(values, _inn_arrow, normalize_inn)
+
+
+def normalize_company_name_column(values) -> pd.Series:
+    """normalize_company_name для целой колонки (Series / массив / список)."""
+    return _map_column(values, _company_name_arrow, normalize_company_name)
+
+
+def _demo_pools() -> dict:
+    """Значения колонок из демо-выгрузок (с их аномалиями)."""
+    base = os.path.dirname(os.path.abspath(__file__))
+    billing = pd.read_csv(os.path.join(base, 'billing_q4_2025.csv'), sep=';', dtype=str, encoding='utf-8-sig')
+    crm = pd.read_csv(os.path.join(base, 'crm_clients.csv'), sep=';', dtype=str, encoding='utf-8-sig')
+    return {
+        'phone': pd.concat([billing['phone'], crm['phone']]).to_numpy(dtype=object),
+        'inn': pd.concat([billing['inn'], crm['inn']]).to_numpy(dtype=object),
+        'company_name': crm['company_name'].dropna().to_numpy(dtype=object),
+    }
+
+
+def _bench_values(n: int) -> dict:
+    """n значений каждой колонки, набранных из демо-выгрузок."""
+    return {name: pd.Series(np.resize(pool, n), dtype=object) for name, pool in _demo_pools().items()}
+
+
+JS_SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'utils', 'normalizers.js')
+_JS_FUNCTIONS = {'phone': 'normalizePhone', 'inn': 'normalizeInn', 'company_name': 'normalizeCompanyName'}
+_JS_RUNNER = """
+import { readFileSync } from 'node:fs';
+import * as normalizers from %s;
+const input = JSON.parse(readFileSync(0, 'utf8'));
+const out = {};
+for (const [name, fn] of Object.entries(input.functions)) out[name] = input.values[name].map(v => normalizers[fn](v));
+process.stdout.write(JSON.stringify(out));
+"""
+
+# Крайние случаи сверх демо-данных: разделители, чужие цифры, пробелы Unicode, регистр
+_EDGE_CASES = {
+    'phone': [
+        '', ' ', '8 (903) 123-45-67', '+7 (903) 123-45-67', '89031234567', '79031234567', '9031234567',
+        '903123456', '+44 20 7946 0958', '8-800-555-35-35 доб. 12', 'нет', '٨٩٠٣١٢٣٤٥٦٧', '８９０３１２３４５６７',
+        '\u00a089031234567', '0',
+    ],
+    'inn': [
+        '', ' ', '7707083893', '007707083893', '7707083893 ', 'ИНН 7707083893', '123', '1234567890123',
+        '12-34-56', '٧٧٠٧٠٨٣٨٩٣', '0', '000',
+    ],
+    'company_name': [
+        '', ' ', 'ООО "Ромашка"', 'Ромашка, ООО', '«Ромашка» ао', "ИП 'Иванов'", 'Ромашка\u00a0ООО',
+        'Ромашка\u2003ИП', 'Рога и копыта , ЗАО ', 'ооо', ' ооо', 'ПАО', 'а\u0085б ооо', 'а\x1cб ооо',
+        'Ромашка\ufeffООО', 'İSTANBUL ЗАО', 'ΟΔΟΣ ΟΔΟΣ, ип', 'Ромашка\nООО', 'х\u2028ао', '"""',
+        'оао Рога, ООО', 'Ромашка,,ООО', 'Сбербанк ПАО\t', 'ао', 'Газпромао',
+    ],
+}
+
+
+def _run_js(values: dict) -> dict:
+    """Значения values ({колонка: [строка | None]}) через функции normalizers.js в node."""
+    node = shutil.which('node')
+    if node is None:
+        raise RuntimeError('Для сверки с JS нужен node в PATH')
+    script = _JS_RUNNER % json.dumps(Path(JS_SOURCE).resolve().as_uri())
+    payload = json.dumps({'functions': _JS_FUNCTIONS, 'values': values})
+    result = subprocess.run([node, '--input-type=module', '-e', script], input=payload, capture_output=True,
+                            text=True, encoding='utf-8', check=True)
+    return json.loads(result.stdout)
+
+
+def check_js() -> dict:
+    """Сверяет скалярные normalize_*, *_column и запасной путь без pyarrow с normalizers.js.
+
+    Значения — различные значения демо-выгрузок и _EDGE_CASES. Возвращает
+    {колонка: (число значений, [(значение, JS, скалярно, колонкой, без pyarrow) для расхождений])}.
+    """
+    pools = _demo_pools()
+    values = {}
+    for name in _JS_FUNCTIONS:
+        demo = [v for v in pd.unique(pools[name]) if isinstance(v, str)]
+        values[name] = list(dict.fromkeys(demo + _EDGE_CASES[name])) + [None]
+    expected = _run_js(values)
+
+    python = {
+        'phone': (normalize_phone, normalize_phone_column),
+        'inn': (normalize_inn, normalize_inn_column),
+        'company_name': (normalize_company_name, normalize_company_name_column),
+    }
+    report = {}
+    for name, (scalar, column) in python.items():
+        got = zip(values[name], expected[name], map(scalar, values[name]), column(values[name]),
+                  _map_scalar(values[name], scalar))
+        report[name] = (len(values[name]), [r for r in got if not r[1] == r[2] == r[3] == r[4]])
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Бенчмарк нормализаторов и сверка с normalizers.js')
+    parser.add_argument('--bench', type=int, default=1_000_000, help='число значений на колонку')
+    parser.add_argument('--check-js', action='store_true', help='сверить с src/utils/normalizers.js через node')
+    args = parser.parse_args()
+
+    if args.check_js:
+        try:
+            report = check_js()
+        except (RuntimeError, subprocess.CalledProcessError) as e:
+            parser.error(str(e))
+        print('=== Сверка с normalizers.js ===')
+        for name, (total, mismatches) in report.items():
+            print(f'{name}: {total:,} значений, расхождений {len(mismatches)}')
+            for value, js, scalar, column, fallback in mismatches[:10]:
+                print(f'  {value!r}: JS {js!r}, скалярно {scalar!r}, колонкой {column!r}, без pyarrow {fallback!r}')
+        raise SystemExit(1 if any(mismatches for _, mismatches in report.values()) else 0)
+
+    columns = _bench_values(args.bench)
+    cases = [
+        ('phone', normalize_phone, normalize_phone_column),
+        ('inn', normalize_inn, normalize_inn_column),
+        ('company_name', normalize_company_name, normalize_company_name_column),
+    ]
+    print(f'=== Нормализация колонок, {args.bench:,} значений ===')
+    for name, scalar, column in cases:
+        values = columns[name]
+        sample = values[:100_000]
+        started = time.perf_counter()
+        [scalar(v if isinstance(v, str) else None) for v in sample]
+        scalar_rate = len(sample) / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        column(values)
+        column_rate = len(values) / (time.perf_counter() - started)
+        print(f'{name}: {column_rate:,.0f} строк/с колонкой, {scalar_rate:,.0f} строк/с поштучно')
@@ -0,0 +1,117 @@
+"""
+Дополнительные форматы выгрузок рядом с основным CSV.
+
+    csv.gz, csv.br — тот же CSV, заранее сжатый для раздачи статикой
+                     (billing_q4_2025.csv.gz, billing_q4_2025.csv.br);
+    parquet, feather — колоночные копии для быстрой загрузки в pandas/Arrow
+                     (billing_q4_2025.parquet, billing_q4_2025.feather).
+
+В колоночных форматах tariff, status, region, segment и period пишутся
+словарём (category -> dictionary Arrow), ИНН и телефон — строками, чтобы
+ведущие нули и «+7(...)» не превращались в числа при чтении.
+
+Сжатые копии делаются из уже записанного CSV потоком, поэтому работают
+и для выгрузок, записанных чанками. Колоночным нужен готовый DataFrame.
+parquet/feather требуют pyarrow, csv.br — brotli; без них формат
+отклоняется до начала генерации.
+"""
+
+import gzip
+import importlib.util
+import os
+
+import pandas as pd
+
+FORMATS = ['csv.gz', 'csv.br', 'parquet', 'feather']
+COMPRESSED_FORMATS = ['csv.gz', 'csv.br']
+DICTIONARY_COLUMNS = ['tariff', 'status', 'region', 'segment', 'period']
+STRING_COLUMNS = ['inn', 'phone']
+
+# Формат -> модуль, без которого он не пишется
+_REQUIRES = {'csv.br': 'brotli', 'parquet': 'pyarrow', 'feather': 'pyarrow'}
+_COPY_CHUNK = 1 << 20
+
+
+def parse_formats(value) -> list:
+    """'parquet,csv.gz' или список -> список форматов без повторов.
+
+    Неизвестный формат или отсутствующая зависимость -> ValueError.
+    """
+    if isinstance(value, str):
+        value = [v.strip() for v in value.split(',')]
+    formats = list(dict.fromkeys(v for v in value if v and v != 'csv'))
+    unknown = [f for f in formats if f not in FORMATS]
+    if unknown:
+        raise ValueError(f'Неизвестные форматы: {", ".join(unknown)} (есть: {", ".join(FORMATS)})')
+    missing = sorted({_REQUIRES[f] for f in formats if f in _REQUIRES and importlib.util.find_spec(_REQUIRES[f]) is None})
+    if missing:
+        raise ValueError(f'Для выбранных форматов нужны пакеты: {", ".join(missing)}')
+    return formats
+
+
+def sibling_path(csv_path: str, fmt: str) -> str:
+    if fmt in COMPRESSED_FORMATS:
+        return csv_path + fmt[len('csv'):]
+    return os.path.splitext(csv_path)[0] + '.' + fmt
+
+
+def columnar_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Копия df с типами для parquet/feather: словарные колонки и строки."""
+    df = df.copy()
+    for column in DICTIONARY_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    for column in STRING_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('string')
+    return df
+
+
+def _compress(csv_path: str, fmt: str, path: str):
+    with open(csv_path, 'rb') as src, open(path, 'wb') as dst:
+        chunks = iter(lambda: src.read(_COPY_CHUNK), b'')
+        if fmt == 'csv.gz':
+            # mtime=0 — одинаковый CSV даёт побайтно одинаковый .gz
+            with gzip.GzipFile(filename='', mode='wb', fileobj=dst, compresslevel=9, mtime=0) as gz:
+                for chunk in chunks:
+                    gz.write(chunk)
+        else:
+            import brotli
+
+            compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=11)
+            for chunk in chunks:
+                dst.write(compressor.process(chunk))
+            dst.write(compressor.finish())
+
+
+def write_formats(csv_path: str, formats, df=None) -> list:
+    """Пишет выбранные форматы рядом с csv_path; возвращает пути записанных файлов.
+
+    df нужен для parquet/feather; сжатые копии берутся из файла csv_path.
+    """
+    formats = parse_formats(formats)
+    columnar = [f for f in formats if f not in COMPRESSED_FORMATS]
+    if columnar and df is None:
+        raise ValueError(f'Для {", ".join(columnar)} нужен DataFrame выгрузки целиком')
+
+    paths = []
+    if columnar:
+        table = columnar_frame(df)
+        for fmt in columnar:
+            path = sibling_path(csv_path, fmt)
+            if fmt == 'parquet':
+                table.to_parquet(path, index=False)
+            else:
+                table.to_feather(path)
+            paths.append(path)
+    for fmt in formats:
+        if fmt in COMPRESSED_FORMATS:
+            path = sibling_path(csv_path, fmt)
+            _compress(csv_path, fmt, path)
+            paths.append(path)
+    return paths
+
+
+def print_outputs(paths: list):
+    for path in paths:
+        print(f'Файл: {path} ({os.path.getsize(path) / (1024 * 1024):.2f} MB)')
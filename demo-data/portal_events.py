@@ -0,0 +1,285 @@
+"""
+Сырой журнал событий ЛК и потоковая свёртка его обратно в portal_activity.
+
+gen_portal сразу пишет агрегаты logins_count_q4 / tickets_count_q4 /
+payments_online_q4. В проде их считают из журнала событий; чтобы гонять
+такие конвейеры на демо-данных, здесь журнал восстанавливается из готовой
+выгрузки ЛК:
+
+    portal_events_q4_2025.csv — ts;user_id;event;account_number;amount
+        login   — logins_count_q4 входов в Q4, последний ровно в last_login_date;
+                  без входов в Q4 — один вход в last_login_date (до Q4);
+        ticket  — tickets_count_q4 обращений в Q4;
+        payment — payments_online_q4 оплат в Q4 по account_number; сумма —
+                  оплата (или начисление) счёта за месяц платежа из биллинга,
+                  без счёта в биллинге — пусто;
+    portal_users_q4_2025.csv  — пользователи без счётчиков и last_login_date;
+        user_id — номер строки (0-based), как в выгрузке ЛК.
+
+Выгрузка ЛК и журнал пишутся чанками по chunk_size пользователей, события
+внутри чанка отсортированы по времени. Журнал растёт с базой: на
+пользователя в среднем ~8 событий, так что сотни миллионов событий дают
+выгрузки ЛК на десятки миллионов строк (см. sharding.py).
+
+aggregate_events читает журнал один раз чанками и копит счётчики массивами
+на пользователя — память O(пользователей), а не O(событий), — затем
+потоком дописывает их к portal_users. Результат побайтно совпадает
+с исходной выгрузкой ЛК.
+
+    python portal_events.py generate
+    python portal_events.py aggregate --output /tmp/portal_from_events.csv
+"""
+
+import argparse
+import importlib.util
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from gen_portal import PORTAL_COLUMNS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EVENT_COLUMNS = ['ts', 'user_id', 'event', 'account_number', 'amount']
+# Событие -> счётчик выгрузки ЛК
+COUNTERS = {
+    'login': 'logins_count_q4',
+    'ticket': 'tickets_count_q4',
+    'payment': 'payments_online_q4',
+}
+USER_COLUMNS = [c for c in PORTAL_COLUMNS if c not in COUNTERS.values() and c != 'last_login_date']
+PERIODS = ['2025-10', '2025-11', '2025-12']
+Q4_START = np.datetime64('2025-10-01')
+Q4_DAYS = 92
+CHUNK_SIZE = 200_000
+
+_NO_DATE = np.iinfo(np.int64).min
+
+
+def _read_chunks(path: str, chunk_size: int, **kwargs):
+    # Пустое поле — None, остальное строками как есть ('---', '123' и т.п. из аномалий)
+    return pd.read_csv(path, sep=';', encoding='utf-8-sig', dtype=str, keep_default_na=False, na_values=[''],
+                       chunksize=chunk_size, **kwargs)
+
+
+def _billing_amounts(billing_path: str):
+    """Счёт -> суммы по месяцам Q4: оплата, а если её не было — начисление.
+
+    Возвращает (Index номеров счетов, массив (счета, месяцы)). Сторно
+    и корректировки (повторные строки счёта за период) не учитываются.
+    """
+    billing = pd.read_csv(billing_path, sep=';', encoding='utf-8-sig',
+                          usecols=['account_number', 'period', 'charged_amount', 'paid_amount'],
+                          dtype={'account_number': str, 'period': str})
+    billing = billing[billing['period'].isin(PERIODS)].drop_duplicates(['account_number', 'period'])
+    amount = billing['paid_amount'].where(billing['paid_amount'] > 0, billing['charged_amount'])
+    table = pd.Series(amount.to_numpy(), index=[billing['account_number'], billing['period']]).unstack('period')
+    table = table.reindex(columns=PERIODS)
+    return table.index, table.to_numpy()
+
+
+def _timestamps(days: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    return days.astype('datetime64[s]') + rng.integers(0, 86_400, size=len(days)).astype('timedelta64[s]')
+
+
+def _chunk_events(users: pd.DataFrame, first_id: int, rng: np.random.Generator, billing) -> pd.DataFrame:
+    """События пользователей одного чанка выгрузки ЛК, отсортированные по времени."""
+    n = len(users)
+    counts = {event: users[column].to_numpy(dtype=np.int64) for event, column in COUNTERS.items()}
+    last_login = users['last_login_date'].to_numpy().astype('datetime64[D]')
+
+    # Входы: последний — в last_login_date, остальные — от начала Q4 до него
+    n_logins = np.maximum(counts['login'], 1)
+    login_owner = np.repeat(np.arange(n), n_logins)
+    span = np.maximum((last_login - Q4_START).astype(np.int64) + 1, 1)
+    login_days = Q4_START + (rng.random(len(login_owner)) * span[login_owner]).astype(np.int64)
+    login_days[np.cumsum(n_logins) - n_logins] = last_login
+
+    ticket_owner = np.repeat(np.arange(n), counts['ticket'])
+    ticket_days = Q4_START + rng.integers(0, Q4_DAYS, size=len(ticket_owner))
+
+    # Оплаты: месяц Q4 и день 1-28, сумма — по счёту из биллинга за этот месяц
+    payment_owner = np.repeat(np.arange(n), counts['payment'])
+    month = rng.integers(0, len(PERIODS), size=len(payment_owner))
+    month_start = np.array(PERIODS, dtype='datetime64[M]').astype('datetime64[D]')
+    payment_days = month_start[month] + rng.integers(0, 28, size=len(payment_owner))
+    payment_accounts = users['account_number'].to_numpy(dtype=object)[payment_owner]
+    amounts = np.full(len(payment_owner), np.nan)
+    if billing is not None:
+        accounts, table = billing
+        row = accounts.get_indexer(payment_accounts)
+        known = row >= 0
+        amounts[known] = table[row[known], month[known]]
+
+    owner = np.concatenate([login_owner, ticket_owner, payment_owner])
+    ts = np.concatenate([_timestamps(login_days, rng), _timestamps(ticket_days, rng), _timestamps(payment_days, rng)])
+    event = np.repeat(np.array(list(COUNTERS), dtype=object), [len(login_owner), len(ticket_owner), len(payment_owner)])
+    account = np.concatenate([np.full(len(login_owner) + len(ticket_owner), None, dtype=object), payment_accounts])
+    amount = np.concatenate([np.full(len(login_owner) + len(ticket_owner), np.nan), amounts])
+
+    # Суммы — строкой с копейками: одинаково при записи через pandas и pyarrow
+    amount_text = np.full(len(amount), None, dtype=object)
+    paid = ~np.isnan(amount)
+    amount_text[paid] = np.char.mod('%.2f', amount[paid])
+
+    order = np.argsort(ts, kind='stable')
+    return pd.DataFrame({
+        'ts': np.datetime_as_string(ts[order]),
+        'user_id': owner[order] + first_id,
+        'event': event[order],
+        'account_number': account[order],
+        'amount': amount_text[order],
+    }, columns=EVENT_COLUMNS)
+
+
+def _write_events_csv(events: pd.DataFrame, f):
+    """Тело CSV журнала без заголовка. Кавычки не нужны: в значениях нет ';'
+    и кавычек. pyarrow, если есть, пишет в разы быстрее pandas; вывод тот же.
+    """
+    if importlib.util.find_spec('pyarrow') is None:
+        events.to_csv(f, sep=';', index=False, header=False, encoding='utf-8')
+        return
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    pa_csv.write_csv(pa.Table.from_pandas(events, preserve_index=False), f,
+                     pa_csv.WriteOptions(include_header=False, delimiter=';', quoting_style='none'))
+
+
+def write_events(portal_path=None, events_path=None, users_path=None, billing_path=None,
+                 chunk_size=CHUNK_SIZE, seed=42) -> dict:
+    """Журнал событий и пользователи ЛК по выгрузке portal_path.
+
+    billing_path — выгрузка биллинга для сумм оплат (None — рядом с
+    portal_path, если есть). Выгрузка читается и журнал пишется чанками
+    по chunk_size пользователей. Возвращает число пользователей и событий.
+    """
+    if portal_path is None:
+        portal_path = os.path.join(BASE_DIR, 'portal_activity_q4_2025.csv')
+    directory = os.path.dirname(os.path.abspath(portal_path))
+    if events_path is None:
+        events_path = os.path.join(directory, 'portal_events_q4_2025.csv')
+    if users_path is None:
+        users_path = os.path.join(directory, 'portal_users_q4_2025.csv')
+    if billing_path is None:
+        billing_path = os.path.join(directory, 'billing_q4_2025.csv')
+    billing = _billing_amounts(billing_path) if os.path.exists(billing_path) else None
+
+    rng = np.random.default_rng(seed)
+    n_users = n_events = 0
+    with open(events_path, 'wb') as events_file, \
+            open(users_path, 'w', encoding='utf-8-sig', newline='') as users_file:
+        events_file.write((';'.join(EVENT_COLUMNS) + '\n').encode())
+        for users in _read_chunks(portal_path, chunk_size):
+            events = _chunk_events(users, n_users, rng, billing)
+            _write_events_csv(events, events_file)
+            users[USER_COLUMNS].to_csv(users_file, sep=';', index=False, header=n_users == 0)
+            n_users += len(users)
+            n_events += len(events)
+    return {'events_path': events_path, 'users_path': users_path, 'users': n_users, 'events': n_events}
+
+
+class _Counters:
+    """Счётчики событий на user_id; массивы растут по мере появления новых id."""
+
+    def __init__(self):
+        self.counts = {event: np.zeros(0, dtype=np.int64) for event in COUNTERS}
+        self.last_login = np.zeros(0, dtype=np.int64)
+
+    def _grow(self, size: int):
+        if size <= len(self.last_login):
+            return
+        size = max(size, 2 * len(self.last_login))
+        for event, counts in self.counts.items():
+            self.counts[event] = np.concatenate([counts, np.zeros(size - len(counts), dtype=np.int64)])
+        self.last_login = np.concatenate([self.last_login, np.full(size - len(self.last_login), _NO_DATE)])
+
+    def add(self, chunk: pd.DataFrame):
+        user_id = chunk['user_id'].to_numpy(dtype=np.int64)
+        if len(user_id) == 0:
+            return
+        self._grow(int(user_id.max()) + 1)
+        # Тип события — коды категорий: сравнение int8 вместо строк
+        codes = chunk['event'].cat.codes.to_numpy()
+        categories = list(chunk['event'].cat.categories)
+        day = chunk['ts'].to_numpy().astype('datetime64[D]').astype(np.int64)
+        in_q4 = day >= Q4_START.astype(np.int64)
+
+        for name, counts in self.counts.items():
+            mask = codes == (categories.index(name) if name in categories else -2)
+            if name == 'login':
+                np.maximum.at(self.last_login, user_id[mask], day[mask])
+            counts += np.bincount(user_id[mask & in_q4], minlength=len(counts))
+
+    def columns(self, start: int, stop: int) -> dict:
+        """Колонки выгрузки ЛК для пользователей start..stop-1."""
+        self._grow(stop)
+        last_login = self.last_login[start:stop]
+        dates = last_login.astype('datetime64[D]').astype(str).astype(object)
+        dates[last_login == _NO_DATE] = None
+        columns = {'last_login_date': dates}
+        for event, column in COUNTERS.items():
+            columns[column] = self.counts[event][start:stop]
+        return columns
+
+
+def aggregate_events(events_path=None, users_path=None, output_path=None, chunk_size=1_000_000) -> dict:
+    """Свёртка журнала в выгрузку ЛК (PORTAL_COLUMNS) за один проход по событиям.
+
+    Журнал читается чанками по chunk_size событий; в памяти — чанк и
+    счётчики на пользователя. Возвращает число событий и пользователей.
+    """
+    if events_path is None:
+        events_path = os.path.join(BASE_DIR, 'portal_events_q4_2025.csv')
+    if users_path is None:
+        users_path = os.path.join(BASE_DIR, 'portal_users_q4_2025.csv')
+    if output_path is None:
+        output_path = os.path.join(BASE_DIR, 'portal_from_events_q4_2025.csv')
+
+    counters = _Counters()
+    n_events = 0
+    for chunk in pd.read_csv(events_path, sep=';', usecols=['ts', 'user_id', 'event'],
+                             dtype={'user_id': np.int64, 'event': 'category'},
+                             parse_dates=['ts'], date_format='ISO8601', chunksize=chunk_size):
+        counters.add(chunk)
+        n_events += len(chunk)
+
+    n_users = 0
+    with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+        for users in _read_chunks(users_path, CHUNK_SIZE):
+            users = users.assign(**counters.columns(n_users, n_users + len(users)))
+            users[PORTAL_COLUMNS].to_csv(f, sep=';', index=False, header=n_users == 0)
+            n_users += len(users)
+    return {'output_path': output_path, 'events': n_events, 'users': n_users}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Журнал событий ЛК и его свёртка в выгрузку ЛК')
+    commands = parser.add_subparsers(dest='command', required=True)
+    generate = commands.add_parser('generate', help='события и пользователи по выгрузке ЛК')
+    generate.add_argument('--portal', default=None, help='выгрузка ЛК (по умолчанию portal_activity_q4_2025.csv)')
+    generate.add_argument('--billing', default=None, help='выгрузка биллинга для сумм оплат')
+    generate.add_argument('--events', default=None)
+    generate.add_argument('--users', default=None)
+    generate.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='пользователей на чанк')
+    generate.add_argument('--seed', type=int, default=42)
+    aggregate = commands.add_parser('aggregate', help='свёртка событий в выгрузку ЛК')
+    aggregate.add_argument('--events', default=None)
+    aggregate.add_argument('--users', default=None)
+    aggregate.add_argument('--output', default=None)
+    aggregate.add_argument('--chunk-size', type=int, default=1_000_000, help='событий на чанк')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == 'generate':
+        result = write_events(args.portal, args.events, args.users, args.billing, args.chunk_size, args.seed)
+        print('=== Журнал событий ЛК ===')
+        print(f'Пользователей: {result["users"]:,}, событий: {result["events"]:,}')
+        print(f'Файлы: {result["events_path"]}, {result["users_path"]}')
+    else:
+        result = aggregate_events(args.events, args.users, args.output, args.chunk_size)
+        print('=== Свёртка журнала событий ЛК ===')
+        print(f'Событий: {result["events"]:,}, пользователей: {result["users"]:,}')
+        print(f'Файл: {result["output_path"]}')
+    elapsed = time.perf_counter() - started
+    print(f'Время: {elapsed:.2f} с ({result["events"] / elapsed:,.0f} событий/с)')
@@ -0,0 +1,198 @@
+"""
+Опциональные замеры по фазам внутри генераторов — без внешнего профилировщика.
+
+    profiler = PhaseProfiler()
+    with profiler.phase('payments') as phase:
+        ...
+        phase.rows += 3
+    profiler.report()  # -> dict для JSON
+
+На фазу пишутся: число входов, время (total — вся фаза, self — без вложенных
+фаз), процессорное время, строки, прирост живых блоков памяти
+(sys.getallocatedblocks) и, при trace_memory=True, чистый прирост и пик
+байт по tracemalloc (заметно замедляет код, поэтому по умолчанию выключено).
+
+Фазы вкладываются стеком. Это позволяет размечать генераторы строк: пока
+генератор стоит на yield, фазы потребителя (DataFrame, to_csv) открываются
+поверх его фазы и вычитаются из её self-времени.
+Когда профилирование не нужно, подставляется NULL_PROFILER: его phase()
+ничего не замеряет.
+"""
+
+import sys
+import time
+import tracemalloc
+
+
+class _Phase:
+    __slots__ = ('name', 'calls', 'total_s', 'child_s', 'cpu_s', 'rows', 'alloc_blocks',
+                 'traced_net_bytes', 'traced_peak_bytes')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.total_s = 0.0
+        self.child_s = 0.0
+        self.cpu_s = 0.0
+        self.rows = 0
+        self.alloc_blocks = 0
+        self.traced_net_bytes = 0
+        self.traced_peak_bytes = 0
+
+    def to_dict(self, trace_memory: bool) -> dict:
+        self_s = self.total_s - self.child_s
+        result = {
+            'name': self.name,
+            'calls': self.calls,
+            'total_s': round(self.total_s, 6),
+            'self_s': round(self_s, 6),
+            'cpu_s': round(self.cpu_s, 6),
+            'rows': self.rows,
+            'rows_per_s': round(self.rows / self_s, 1) if self.rows and self_s > 0 else None,
+            'alloc_blocks': self.alloc_blocks,
+        }
+        if trace_memory:
+            result['traced_net_bytes'] = self.traced_net_bytes
+            result['traced_peak_bytes'] = self.traced_peak_bytes
+        return result
+
+
+class _Frame:
+    """Открытый вход в фазу: стартовые отметки и накопленное время вложенных фаз."""
+
+    __slots__ = ('phase', 'started', 'cpu_started', 'blocks', 'traced', 'peak', 'child_s')
+
+    def __init__(self, phase: _Phase, trace_memory: bool):
+        self.phase = phase
+        self.child_s = 0.0
+        self.blocks = sys.getallocatedblocks()
+        self.traced = tracemalloc.get_traced_memory()[0] if trace_memory else 0
+        self.peak = 0
+        self.cpu_started = time.process_time()
+        self.started = time.perf_counter()
+
+
+class _PhaseContext:
+    __slots__ = ('profiler', 'name', 'frame')
+
+    def __init__(self, profiler: 'PhaseProfiler', name: str):
+        self.profiler = profiler
+        self.name = name
+        self.frame = None
+
+    def __enter__(self) -> _Phase:
+        self.frame = self.profiler._enter(self.name)
+        return self.frame.phase
+
+    def __exit__(self, *exc):
+        self.profiler._exit(self.frame)
+        return False
+
+
+class PhaseProfiler:
+    """Замеры по именованным фазам; фазы с одним именем суммируются."""
+
+    enabled = True
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self._phases = {}
+        self._stack = []
+        self._started = time.perf_counter()
+        self._own_tracemalloc = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracemalloc = True
+
+    def phase(self, name: str) -> _PhaseContext:
+        return _PhaseContext(self, name)
+
+    def _enter(self, name: str) -> _Frame:
+        phase = self._phases.get(name)
+        if phase is None:
+            phase = self._phases[name] = _Phase(name)
+        if self.trace_memory:
+            # Пик родителя до сих пор — сохраняется, дальше пик считается для новой фазы
+            if self._stack:
+                self._stack[-1].peak = max(self._stack[-1].peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        frame = _Frame(phase, self.trace_memory)
+        self._stack.append(frame)
+        return frame
+
+    def _exit(self, frame: _Frame):
+        elapsed = time.perf_counter() - frame.started
+        cpu = time.process_time() - frame.cpu_started
+        if self._stack and self._stack[-1] is frame:
+            self._stack.pop()
+        else:
+            self._stack.remove(frame)
+        phase = frame.phase
+        phase.calls += 1
+        phase.total_s += elapsed
+        phase.child_s += frame.child_s
+        phase.cpu_s += cpu
+        phase.alloc_blocks += sys.getallocatedblocks() - frame.blocks
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            frame.peak = max(frame.peak, peak)
+            phase.traced_net_bytes += current - frame.traced
+            phase.traced_peak_bytes = max(phase.traced_peak_bytes, frame.peak - frame.traced)
+        if self._stack:
+            parent = self._stack[-1]
+            parent.child_s += elapsed
+            parent.peak = max(parent.peak, frame.peak)
+
+    def report(self) -> dict:
+        """Профиль для JSON: фазы в порядке первого входа."""
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+            self._own_tracemalloc = False
+        return {
+            'total_s': round(time.perf_counter() - self._started, 6),
+            'trace_memory': self.trace_memory,
+            'phases': [phase.to_dict(self.trace_memory) for phase in self._phases.values()],
+        }
+
+
+class _NullPhase:
+    __slots__ = ('rows',)
+
+    def __init__(self):
+        self.rows = 0
+
+
+class _NullContext:
+    __slots__ = ()
+
+    def __enter__(self) -> _NullPhase:
+        return _NullPhase()
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _NullProfiler:
+    """Профилировщик-заглушка: phase() ничего не замеряет."""
+
+    enabled = False
+    _context = _NullContext()
+
+    def phase(self, name: str) -> _NullContext:
+        return self._context
+
+    def report(self) -> dict:
+        return {}
+
+
+NULL_PROFILER = _NullProfiler()
+
+
+def print_profile(report: dict):
+    """Таблица фаз по убыванию self-времени."""
+    print(f'--- Профиль по фазам (всего {report["total_s"]:.2f} с) ---')
+    for p in sorted(report['phases'], key=lambda p: -p['self_s']):
+        rows = f', {p["rows"]:,} строк ({p["rows_per_s"] or 0:,.0f}/с)' if p['rows'] else ''
+        memory = f', пик {p["traced_peak_bytes"] / (1024 * 1024):.1f} МБ' if 'traced_peak_bytes' in p else ''
+        print(f'  {p["name"]}: {p["self_s"]:.3f} с (всего {p["total_s"]:.3f} с, вызовов {p["calls"]}), '
+              f'блоков {p["alloc_blocks"]:+,}{rows}{memory}')
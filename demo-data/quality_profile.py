@@ -0,0 +1,305 @@
+"""
+Потоковый профиль качества данных выгрузок за один проход.
+
+Файл читается один раз кусками по chunk_size строк, на колонку держатся
+только скетчи фиксированного размера, поэтому память не зависит от
+размера выгрузки:
+
+  * доля пропусков (пустое поле);
+  * число различных значений — HyperLogLog (2^14 регистров, ошибка ~1%);
+  * гистограмма длин (ИНН: 10/12 цифр и обрезанные 9/11);
+  * шаблоны значений: цифра -> 9, слово -> a, прочие символы как есть
+    ('+7(915)689-90-72' -> '+9(999)999-99-99', '8 915...' и т.д.) —
+    частые шаблоны по Мишре — Грису, не больше MAX_PATTERNS;
+  * для числовых колонок — t-digest квантилей, сумма, min/max, число
+    отрицательных и нулевых значений (charged_amount < 0 в биллинге).
+
+Числовые колонки — float/int схемы выгрузки (export_schema.py, по имени
+файла или --schema): ИНН и телефон из одних цифр остаются строками. У файла
+без схемы колонка числовая, если числом читается весь первый кусок и среди
+его значений нет кодов (целых от 10 цифр или с ведущим нулём).
+
+Скетчи сливаются (merge), так что профили шардов можно объединять.
+
+    python quality_profile.py                            # три демо-выгрузки -> JSON в stdout
+    python quality_profile.py shards/billing.csv -o billing_profile.json
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from export_schema import SCHEMAS, column_types, schema_for_path
+
+CHUNK_SIZE = 200_000
+# Точность HyperLogLog: 2^HLL_PRECISION однобайтовых регистров на колонку
+HLL_PRECISION = 14
+# Сжатие t-digest: ~TDIGEST_COMPRESSION / 2 центроидов на колонку
+TDIGEST_COMPRESSION = 200
+# Шаблонов на колонку; при переполнении счётчики становятся нижними оценками
+MAX_PATTERNS = 32
+# Длины от MAX_LENGTH и выше — в одном последнем столбце гистограммы
+MAX_LENGTH = 64
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+class HyperLogLog:
+    """Оценка числа различных значений по 64-битным хэшам."""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values: np.ndarray):
+        if len(values):
+            self.update_hashes(pd.util.hash_array(np.asarray(values, dtype=object)))
+
+    def update_hashes(self, hashes: np.ndarray):
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - p)) - 1)
+        # Ранг — позиция старшей единицы в оставшихся 64 - p битах (они точны во float64)
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rank = (64 - p + 1 - bit_length).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: 'HyperLogLog'):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        zeros = int((self.registers == 0).sum())
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting для малых значений
+        return int(round(estimate))
+
+
+class TDigest:
+    """Квантили потока чисел: центроиды (среднее, вес), мельче к хвостам (шкала k1)."""
+
+    def __init__(self, compression=TDIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = np.zeros(0)
+        self.weights = np.zeros(0)
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+            self._compress(np.concatenate([self.means, values]),
+                           np.concatenate([self.weights, np.ones(len(values))]))
+
+    def merge(self, other: 'TDigest'):
+        if len(other.means):
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self._compress(np.concatenate([self.means, other.means]),
+                           np.concatenate([self.weights, other.weights]))
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        q = (np.cumsum(weights) - weights / 2) / total
+        # k1(q) = δ/2π · asin(2q - 1): центроид покрывает не больше единицы шкалы k
+        k = np.floor(self.compression / (2 * math.pi) * np.arcsin(2 * q - 1))
+        starts = np.flatnonzero(np.diff(k, prepend=k[0] - 1))
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q: float) -> float:
+        if not len(self.means):
+            return math.nan
+        mids = np.cumsum(self.weights) - self.weights / 2
+        xp = np.concatenate([[0.0], mids, [self.weights.sum()]])
+        fp = np.concatenate([[self.min], self.means, [self.max]])
+        return float(np.interp(q * self.weights.sum(), xp, fp))
+
+
+# Явные классы: у строк pandas 3 регулярки идут через pyarrow (RE2), где \w — только ASCII
+_WORD = '[A-Za-zА-Яа-яЁё]+'
+_DIGIT = '[0-9]'
+
+
+def _patterns(values: pd.Series) -> pd.Series:
+    """Шаблон значения: цифра -> 9, слово латиницей или кириллицей -> a."""
+    return values.str.replace(_WORD, 'a', regex=True).str.replace(_DIGIT, '9', regex=True)
+
+
+def _merge_counts(counts: dict, update: dict, capacity: int) -> bool:
+    """Слияние частот по Мишре — Грису; True, если счётчики пришлось урезать."""
+    for key, value in update.items():
+        counts[key] = counts.get(key, 0) + value
+    if len(counts) <= capacity:
+        return False
+    cut = sorted(counts.values(), reverse=True)[capacity]
+    for key in [key for key, value in counts.items() if value <= cut]:
+        del counts[key]
+    for key in counts:
+        counts[key] -= cut
+    return True
+
+
+class ColumnProfile:
+    """Скетчи одной колонки.
+
+    numeric — True/False по схеме выгрузки; None — определить по первому куску со значениями.
+    """
+
+    def __init__(self, name: str, numeric=None):
+        self.name = name
+        self.rows = 0
+        self.nulls = 0
+        self.distinct = HyperLogLog()
+        self.lengths = np.zeros(MAX_LENGTH + 1, dtype=np.int64)
+        self.patterns = {}
+        self.patterns_truncated = False
+        self.numeric = numeric
+        self.digest = TDigest()
+        self.non_numeric = 0
+        self.negative = 0
+        self.zero = 0
+        self.sum = 0.0
+
+    def update(self, values: pd.Series):
+        self.rows += len(values)
+        present = values.notna().to_numpy()
+        self.nulls += int((~present).sum())
+        values = values[present]
+        if not len(values):
+            return
+        self.distinct.update(values.to_numpy(dtype=object))
+        self.lengths += np.bincount(np.minimum(values.str.len().to_numpy(dtype=np.int64), MAX_LENGTH),
+                                    minlength=MAX_LENGTH + 1)
+        # Шаблоны — по различным значениям куска (даты, счета, телефоны сильно повторяются)
+        counts = values.value_counts()
+        counts = counts.groupby(_patterns(counts.index.to_series())).sum()
+        self.patterns_truncated |= _merge_counts(self.patterns, dict(zip(counts.index, counts.to_numpy().tolist())),
+                                                 MAX_PATTERNS)
+
+        if self.numeric is False:
+            return
+        numbers = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+        parsed = ~np.isnan(numbers)
+        if self.numeric is None:
+            # Без схемы: целые из одних цифр с ведущим нулём или от 10 знаков — коды (ИНН, телефон), не числа
+            lengths = values.str.len().to_numpy()
+            digits = values.str.fullmatch('[0-9]+').to_numpy(dtype=bool)
+            code_like = digits & ((lengths >= 10) | (values.str.startswith('0').to_numpy(dtype=bool) & (lengths > 1)))
+            self.numeric = bool(parsed.all()) and not code_like.any()
+        if self.numeric:
+            numbers = numbers[parsed]
+            self.non_numeric += int((~parsed).sum())
+            self.negative += int((numbers < 0).sum())
+            self.zero += int((numbers == 0).sum())
+            self.sum += float(numbers.sum())
+            self.digest.update(numbers)
+
+    def report(self) -> dict:
+        present = self.rows - self.nulls
+        histogram = {str(length): int(count) for length, count in enumerate(self.lengths[:MAX_LENGTH]) if count}
+        if self.lengths[MAX_LENGTH]:
+            histogram[f'{MAX_LENGTH}+'] = int(self.lengths[MAX_LENGTH])
+        result = {
+            'name': self.name,
+            'nulls': self.nulls,
+            'null_rate': round(self.nulls / self.rows, 6) if self.rows else 0.0,
+            'distinct_estimate': self.distinct.estimate() if present else 0,
+            'lengths': histogram,
+            'patterns': dict(sorted(self.patterns.items(), key=lambda item: (-item[1], item[0]))),
+            'patterns_exact': not self.patterns_truncated,
+        }
+        if self.numeric:
+            count = int(self.digest.count)
+            result['numeric'] = {
+                'count': count,
+                'non_numeric': self.non_numeric,
+                'negative': self.negative,
+                'zero': self.zero,
+                'sum': round(self.sum, 2),
+                'mean': round(self.sum / count, 4) if count else None,
+                'min': self.digest.min if count else None,
+                'max': self.digest.max if count else None,
+                'quantiles': {f'p{round(q * 100):02d}': round(self.digest.quantile(q), 4) for q in QUANTILES},
+            }
+        return result
+
+
+def _numeric_columns(path: str, schema=None) -> tuple:
+    """(имя схемы | None, {колонка: числовая ли}) — по schema или имени файла."""
+    if schema is None:
+        try:
+            schema = schema_for_path(path)
+        except ValueError:
+            return None, {}
+    return schema, {column: kind in ('float', 'int') for column, kind in column_types(schema).items()}
+
+
+def profile_csv(path: str, chunk_size=CHUNK_SIZE, sep=';', encoding='utf-8-sig', schema=None) -> dict:
+    """Профиль CSV (или .csv.gz) за один последовательный проход.
+
+    schema — 'billing' | 'crm' | 'portal' (по умолчанию по имени файла); колонки
+    не из схемы и файлы без схемы получают числовой тип по первому куску.
+    """
+    started = time.perf_counter()
+    schema, numeric = _numeric_columns(path, schema)
+    profiles = None
+    rows = chunks = 0
+    reader = pd.read_csv(path, sep=sep, encoding=encoding, dtype=str, keep_default_na=False, na_values=[''],
+                         chunksize=chunk_size)
+    for chunk in reader:
+        if profiles is None:
+            profiles = [ColumnProfile(name, numeric.get(name)) for name in chunk.columns]
+        for profile, name in zip(profiles, chunk.columns):
+            profile.update(chunk[name])
+        rows += len(chunk)
+        chunks += 1
+    elapsed = time.perf_counter() - started
+    return {
+        'file': os.path.basename(path),
+        'schema': schema,
+        'bytes': os.path.getsize(path),
+        'rows': rows,
+        'chunks': chunks,
+        'seconds': round(elapsed, 3),
+        'rows_per_s': round(rows / elapsed, 1) if elapsed > 0 else None,
+        'columns': [profile.report() for profile in profiles or []],
+    }
+
+
+if __name__ == '__main__':
+    base = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Потоковый профиль качества CSV-выгрузок')
+    parser.add_argument('paths', nargs='*', help='CSV (по умолчанию — три демо-выгрузки)')
+    parser.add_argument('-o', '--output', default=None, help='куда записать JSON (по умолчанию stdout)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='строк в куске чтения')
+    parser.add_argument('--schema', choices=sorted(SCHEMAS), help='схема выгрузки (по умолчанию — по имени файла)')
+    args = parser.parse_args()
+
+    paths = args.paths or [os.path.join(base, name) for name in
+                           ('billing_q4_2025.csv', 'crm_clients.csv', 'portal_activity_q4_2025.csv')]
+    report = {'files': [profile_csv(path, args.chunk_size, schema=args.schema) for path in paths]}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        for r in report['files']:
+            print(f'{r["file"]}: {r["rows"]:,} строк за {r["seconds"]:.2f} с', file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
@@ -0,0 +1,378 @@
+"""
+Серверная сверка двух CSV — Python-аналог src/utils/reconcileData.js.
+Тот же конфиг (keyA, keyB, compareFields с режимами exact|fuzzy|numeric|phone|inn,
+normalizeKey) и тот же результат matched/onlyInA/onlyInB/stats, но в виде
+потокового hash join по файлам, а не по массивам в памяти браузера:
+  1. проход по B — индекс "нормализованный ключ -> первая строка B";
+  2. проход по A — matched/onlyInA пишутся сразу, по мере чтения;
+  3. второй проход по B — onlyInB для ключей, не встреченных в A.
+В памяти живёт только индекс B. При partitions > 1 оба файла сначала
+раскладываются по хэшу ключа на partitions временных файлов (grace hash join),
+и в памяти одновременно держится индекс лишь одной партиции.
+
+Запуск (бенчмарк на демо-выгрузках, конфиг как у кнопки "Демо" на странице сверки):
+    python reconcile.py --demo
+    python reconcile.py billing_q4_2025.csv crm_clients.csv --key inn --normalize-key inn --compare phone:phone:phone
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import zlib
+
+from normalizers import _JS_SPACES, normalize_inn, normalize_phone
+
+_QUOTES = re.compile('["«»\']')
+# \s, \d и trim() — в смысле JS: без \x1c-\x1f и \x85 среди пробелов и без не-ASCII цифр
+_SPACES = re.compile(f'[{_JS_SPACES}]+')
+# parseFloat: регистр важен только у Infinity, экспонента — e или E
+_FLOAT_PREFIX = re.compile(r'[+-]?(?:Infinity|(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?)')
+
+DEMO_CONFIG = {
+    'keyA': 'inn',
+    'keyB': 'inn',
+    'normalizeKey': 'inn',
+    'compareFields': [
+        {'fieldA': 'phone', 'fieldB': 'phone', 'mode': 'phone', 'tolerance': 0},
+    ],
+}
+
+EMPTY_KEY = '(пусто)'
+
+
+def _parse_float(s: str):
+    """parseFloat из JS: число из начала строки или None (NaN)."""
+    match = _FLOAT_PREFIX.match(s)
+    if not match:
+        return None
+    return float(match.group(0))
+
+
+def _normalize_key(val, normalize_key: str):
+    s = val.strip(_JS_SPACES) if val else ''
+    if s == '':
+        return None
+    if normalize_key == 'phone':
+        return normalize_phone(s)
+    if normalize_key == 'inn':
+        return normalize_inn(s)
+    return s.lower()
+
+
+def compare_values(a, b, mode: str, tolerance=0):
+    """Тип расхождения ('mismatch' | 'tolerance_exceeded') или None, если совпало."""
+    str_a = '' if a is None else str(a).strip(_JS_SPACES)
+    str_b = '' if b is None else str(b).strip(_JS_SPACES)
+
+    if str_a == '' and str_b == '':
+        return None
+
+    if mode == 'exact':
+        return None if str_a.lower() == str_b.lower() else 'mismatch'
+    if mode == 'fuzzy':
+        norm_a = _SPACES.sub(' ', _QUOTES.sub('', str_a.lower()))
+        norm_b = _SPACES.sub(' ', _QUOTES.sub('', str_b.lower()))
+        return None if norm_a == norm_b else 'mismatch'
+    if mode == 'numeric':
+        num_a, num_b = _parse_float(str_a), _parse_float(str_b)
+        if num_a is None and num_b is None:
+            return None
+        if num_a is None or num_b is None:
+            return 'mismatch'
+        return 'tolerance_exceeded' if abs(num_a - num_b) > float(tolerance or 0) else None
+    if mode == 'phone':
+        p_a, p_b = normalize_phone(str_a), normalize_phone(str_b)
+        if not p_a and not p_b:
+            return None
+        return None if p_a == p_b else 'mismatch'
+    if mode == 'inn':
+        i_a, i_b = normalize_inn(str_a), normalize_inn(str_b)
+        if not i_a and not i_b:
+            return None
+        return None if i_a == i_b else 'mismatch'
+    return None if str_a == str_b else 'mismatch'
+
+
+class _ResultSink:
+    """Копит результат в списках, как reconcileData. Считает stats на лету.
+
+    В add_* приходят и номера строк (0-based, пустые строки не считаются, как
+    в Papa.parse с skipEmptyLines): этим sink'ам они не нужны, их использует
+    reconcile_summary.py.
+    """
+
+    def __init__(self):
+        self.matched = []
+        self.only_in_a = []
+        self.only_in_b = []
+        self.total_a = 0
+        self.total_b = 0
+        self.matched_count = 0
+        self.matched_ok = 0
+        self.only_in_a_count = 0
+        self.only_in_b_count = 0
+        self.field_diff_counts = {}
+
+    def add_matched(self, item: dict, index_a=None, index_b=None):
+        self.matched_count += 1
+        if item['status'] == 'ok':
+            self.matched_ok += 1
+        for diff in item['diffs']:
+            self.field_diff_counts[diff['field']] = self.field_diff_counts.get(diff['field'], 0) + 1
+        self._emit('matched', item)
+
+    def add_only_in_a(self, item: dict, index=None):
+        self.only_in_a_count += 1
+        self._emit('onlyInA', item)
+
+    def add_only_in_b(self, item: dict, index=None):
+        self.only_in_b_count += 1
+        self._emit('onlyInB', item)
+
+    def _emit(self, kind: str, item: dict):
+        {'matched': self.matched, 'onlyInA': self.only_in_a, 'onlyInB': self.only_in_b}[kind].append(item)
+
+    def stats(self) -> dict:
+        top_diff_fields = sorted(
+            ({'field': field, 'count': count} for field, count in self.field_diff_counts.items()),
+            key=lambda d: -d['count'],
+        )
+        return {
+            'totalA': self.total_a,
+            'totalB': self.total_b,
+            'matchedCount': self.matched_count,
+            'matchedOk': self.matched_ok,
+            'matchedDiff': self.matched_count - self.matched_ok,
+            'onlyInACount': self.only_in_a_count,
+            'onlyInBCount': self.only_in_b_count,
+            'topDiffFields': top_diff_fields,
+        }
+
+    def result(self) -> dict:
+        return {'matched': self.matched, 'onlyInA': self.only_in_a, 'onlyInB': self.only_in_b, 'stats': self.stats()}
+
+    def close(self):
+        pass
+
+
+class _JsonlSink(_ResultSink):
+    """Пишет matched/onlyInA/onlyInB построчно в JSONL — память не растёт с объёмом."""
+
+    def __init__(self, out_dir: str):
+        super().__init__()
+        self.out_dir = out_dir
+        os.makedirs(out_dir, exist_ok=True)
+        self._files = {
+            kind: open(os.path.join(out_dir, f'{kind}.jsonl'), 'w', encoding='utf-8')
+            for kind in ('matched', 'onlyInA', 'onlyInB')
+        }
+
+    def _emit(self, kind: str, item: dict):
+        self._files[kind].write(json.dumps(item, ensure_ascii=False) + '\n')
+
+    def result(self) -> dict:
+        return {'stats': self.stats()}
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        with open(os.path.join(self.out_dir, 'stats.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.stats(), f, ensure_ascii=False, indent=2)
+
+
+def _read_rows(path: str, delimiter: str, skip_header=True):
+    """Строки CSV как списки значений; пустые строки пропускаются, как в Papa.parse."""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        if skip_header:
+            next(reader, None)
+        for values in reader:
+            if values:
+                yield values
+
+
+def _read_header(path: str, delimiter: str) -> list:
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        return next(csv.reader(f, delimiter=delimiter), [])
+
+
+def _numbered_rows(path: str, delimiter: str):
+    """(номер строки, значения) для исходного файла."""
+    return enumerate(_read_rows(path, delimiter))
+
+
+def _numbered_partition(path: str, delimiter: str):
+    """(номер строки, значения) для файла партиции: номер лежит первой колонкой."""
+    for values in _read_rows(path, delimiter, skip_header=False):
+        yield int(values[0]), values[1:]
+
+
+def _join(rows_a, rows_b_factory, header_a, header_b, config, sink):
+    """Hash join одной пары потоков (номер строки, значения). rows_b_factory читается дважды."""
+    key_a = config['keyA']
+    key_b = config['keyB']
+    compare_fields = config.get('compareFields', [])
+    normalize_key = config.get('normalizeKey', 'none')
+    pos_b = {name: i for i, name in enumerate(header_b)}
+
+    def field(values, pos, name):
+        i = pos.get(name)
+        return values[i] if i is not None and i < len(values) else None
+
+    index_b = {}
+    for n, values in rows_b_factory():
+        key = _normalize_key(field(values, pos_b, key_b), normalize_key)
+        if key and key not in index_b:
+            index_b[key] = (n, values)
+
+    used_b_keys = set()
+    for n, values in rows_a:
+        sink.total_a += 1
+        row_a = dict(zip(header_a, values))
+        raw_key = row_a.get(key_a)
+        key = _normalize_key(raw_key, normalize_key)
+        if not key:
+            sink.add_only_in_a({'keyValue': raw_key or EMPTY_KEY, 'row': row_a}, n)
+            continue
+        hit = index_b.get(key)
+        if hit is None:
+            sink.add_only_in_a({'keyValue': raw_key, 'row': row_a}, n)
+            continue
+        n_b, values_b = hit
+
+        used_b_keys.add(key)
+        row_b = dict(zip(header_b, values_b))
+        diffs = []
+        for cf in compare_fields:
+            val_a, val_b = row_a.get(cf['fieldA']), row_b.get(cf['fieldB'])
+            diff = compare_values(val_a, val_b, cf.get('mode'), cf.get('tolerance', 0))
+            if diff:
+                diffs.append({'field': cf['fieldA'], 'valueA': val_a, 'valueB': val_b, 'diffType': diff})
+        sink.add_matched({
+            'keyValue': raw_key, 'rowA': row_a, 'rowB': row_b,
+            'diffs': diffs, 'status': 'ok' if not diffs else 'diff',
+        }, n, n_b)
+    del index_b
+
+    for n, values in rows_b_factory():
+        sink.total_b += 1
+        raw_key = field(values, pos_b, key_b)
+        key = _normalize_key(raw_key, normalize_key)
+        if not key or key not in used_b_keys:
+            sink.add_only_in_b({'keyValue': raw_key or EMPTY_KEY, 'row': dict(zip(header_b, values))}, n)
+
+
+def _partition(path: str, delimiter: str, key_name: str, normalize_key: str, partitions: int, tmp_dir: str, prefix: str):
+    """Раскладывает строки по партициям по crc32 нормализованного ключа.
+
+    Строки без ключа попадают в партицию 0: в join они всё равно уходят в onlyIn*.
+    Первой колонкой пишется номер строки в исходном файле.
+    """
+    header = _read_header(path, delimiter)
+    key_pos = header.index(key_name) if key_name in header else None
+    files = [open(os.path.join(tmp_dir, f'{prefix}{k}.csv'), 'w', encoding='utf-8', newline='') for k in range(partitions)]
+    writers = [csv.writer(f, delimiter=delimiter) for f in files]
+    try:
+        for n, values in _numbered_rows(path, delimiter):
+            raw = values[key_pos] if key_pos is not None and key_pos < len(values) else None
+            key = _normalize_key(raw, normalize_key)
+            writers[zlib.crc32(key.encode()) % partitions if key else 0].writerow([n] + values)
+    finally:
+        for f in files:
+            f.close()
+    return header
+
+
+def reconcile_files(path_a: str, path_b: str, config: dict, out_dir=None, partitions=1, delimiter=';',
+                    sink=None) -> dict:
+    """Сверяет CSV-файлы A и B по конфигу reconcileData.
+
+    out_dir=None — возвращает {'matched', 'onlyInA', 'onlyInB', 'stats'} целиком;
+    иначе пишет <out_dir>/{matched,onlyInA,onlyInB}.jsonl и stats.json
+    и возвращает только {'stats'}. При partitions == 1 порядок записей
+    совпадает с reconcileData; при partitions > 1 записи сгруппированы по партициям.
+    sink — свой приёмник результата вместо двух выше (см. _ResultSink).
+    """
+    if sink is None:
+        sink = _JsonlSink(out_dir) if out_dir else _ResultSink()
+    try:
+        if partitions <= 1:
+            _join(
+                _numbered_rows(path_a, delimiter), lambda: _numbered_rows(path_b, delimiter),
+                _read_header(path_a, delimiter), _read_header(path_b, delimiter), config, sink,
+            )
+        else:
+            tmp_dir = tempfile.mkdtemp(prefix='reconcile-')
+            try:
+                normalize_key = config.get('normalizeKey', 'none')
+                header_a = _partition(path_a, delimiter, config['keyA'], normalize_key, partitions, tmp_dir, 'a')
+                header_b = _partition(path_b, delimiter, config['keyB'], normalize_key, partitions, tmp_dir, 'b')
+                for k in range(partitions):
+                    part_b = os.path.join(tmp_dir, f'b{k}.csv')
+                    _join(
+                        _numbered_partition(os.path.join(tmp_dir, f'a{k}.csv'), delimiter),
+                        lambda: _numbered_partition(part_b, delimiter),
+                        header_a, header_b, config, sink,
+                    )
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+    finally:
+        sink.close()
+    return sink.result()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Потоковая сверка двух CSV')
+    parser.add_argument('file_a', nargs='?')
+    parser.add_argument('file_b', nargs='?')
+    parser.add_argument('--demo', action='store_true', help='billing_q4_2025.csv x crm_clients.csv по ИНН')
+    parser.add_argument('--key', help='ключ в обоих файлах')
+    parser.add_argument('--key-a')
+    parser.add_argument('--key-b')
+    parser.add_argument('--normalize-key', choices=['none', 'phone', 'inn'], default='none')
+    parser.add_argument('--compare', action='append', default=[], help='fieldA:fieldB:mode[:tolerance]')
+    parser.add_argument('--partitions', type=int, default=1)
+    parser.add_argument('--out-dir')
+    args = parser.parse_args()
+
+    if args.demo:
+        base = os.path.dirname(os.path.abspath(__file__))
+        file_a = os.path.join(base, 'billing_q4_2025.csv')
+        file_b = os.path.join(base, 'crm_clients.csv')
+        config = DEMO_CONFIG
+    else:
+        if not args.file_a or not args.file_b:
+            parser.error('нужны file_a и file_b или --demo')
+        file_a, file_b = args.file_a, args.file_b
+        compare_fields = []
+        for spec in args.compare:
+            parts = spec.split(':')
+            compare_fields.append({
+                'fieldA': parts[0], 'fieldB': parts[1], 'mode': parts[2],
+                'tolerance': float(parts[3]) if len(parts) > 3 else 0,
+            })
+        config = {
+            'keyA': args.key_a or args.key, 'keyB': args.key_b or args.key,
+            'normalizeKey': args.normalize_key, 'compareFields': compare_fields,
+        }
+
+    started = time.perf_counter()
+    result = reconcile_files(file_a, file_b, config, out_dir=args.out_dir or None, partitions=args.partitions)
+    elapsed = time.perf_counter() - started
+    stats = result['stats']
+    total_rows = stats['totalA'] + stats['totalB']
+
+    print('=== Сверка ===')
+    print(f'A: {file_a} ({stats["totalA"]} строк)')
+    print(f'B: {file_b} ({stats["totalB"]} строк)')
+    print(f'Совпало: {stats["matchedCount"]} (ok: {stats["matchedOk"]}, расхождения: {stats["matchedDiff"]})')
+    print(f'Только в A: {stats["onlyInACount"]}')
+    print(f'Только в B: {stats["onlyInBCount"]}')
+    for item in stats['topDiffFields']:
+        print(f'  {item["field"]}: {item["count"]}')
+    print(f'Время: {elapsed:.2f} с ({total_rows / max(elapsed, 1e-9):,.0f} строк/с)')
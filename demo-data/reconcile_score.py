@@ -0,0 +1,290 @@
+"""
+Точность и полнота сверки по манифестам аномалий генераторов.
+
+Генераторы пишут рядом с выгрузкой <выгрузка>.manifest.npz (manifest.py):
+какие строки и ключи получили какую аномалию. Здесь результат сверки
+(reconcile.py, конфиги из reconcile_summary.SUMMARY_CONFIGS) сводится к
+битовым картам строк по видам:
+
+    onlyInA, onlyInB     — строки A / B без пары;
+    diff:<поле>          — строки A, сопоставленные с расхождением в поле,
+
+а истина для каждого вида — объединение аномалий из SCORING:
+
+    'billing:null_inn'                  — строки аномалии в самой выгрузке;
+    'crm:excluded_b2c@account_number'   — строки выгрузки, у которых колонка
+                                          account_number входит в ключи аномалии
+                                          другой выгрузки.
+
+Истина для diff:* пересекается со строками matched: расхождение в поле
+бывает только у сопоставленной строки. Precision и recall — popcount
+пересечения упакованных карт, так что оценка миллионов строк занимает
+доли секунды поверх самой сверки.
+
+Манифесты в git не хранятся: на свежем checkout сначала запустите генераторы
+(python generate_all.py), иначе оценивать не по чему.
+
+    python reconcile_score.py                         # три конфига по демо-выгрузкам
+    python reconcile_score.py --summary-dir ../public/demo-data/reconciliation
+    python reconcile_score.py --bench 10000000        # время оценки на синтетических картах
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from generate_all import GENERATORS
+from manifest import Manifest, bitmap_count, manifest_path, to_bitmap
+from reconcile import _ResultSink, reconcile_files
+from reconcile_summary import BASE_DIR, SUMMARY_CONFIGS
+
+# Строк колонки ключа за одно чтение при поиске по ключам аномалии
+KEY_CHUNK = 500_000
+
+# Конфиг сверки -> вид результата -> аномалии, которые должны в него попасть.
+# inn_trimmed (срезанные ведущие нули) normalize_inn восстанавливает — его здесь нет.
+# В onlyInB сверок с CRM сверх prospects попадают клиенты, у которых ключ стёрт
+# во всех строках биллинга: это следствие null_inn / null_phone, а не своя аномалия
+SCORING = {
+    'billing-crm-inn': {
+        'onlyInA': ['billing:null_inn', 'billing:orphans', 'crm:excluded_b2c@account_number'],
+        'onlyInB': ['crm:prospects'],
+        'diff:phone': ['billing:null_phone'],
+    },
+    'billing-crm-phone': {
+        'onlyInA': ['billing:null_phone', 'billing:orphans', 'crm:excluded_b2c@account_number'],
+        'onlyInB': ['crm:prospects'],
+        'diff:inn': ['billing:null_inn'],
+    },
+    'portal-billing-account': {
+        'onlyInA': ['portal:no_account'],
+        'onlyInB': ['billing:orphans', 'portal:not_registered@account_number',
+                    'portal:other_accounts@account_number', 'portal:no_account@account_number'],
+        'diff:phone': ['billing:null_phone@account_number'],
+    },
+}
+
+# Имя выгрузки -> генератор (для поиска манифеста по файлу сверки)
+_FILE_GENERATORS = {filename: name for name, (_, _, filename) in GENERATORS.items()}
+
+
+class _RowSink(_ResultSink):
+    """Копит только номера строк по видам результата — сами записи не нужны."""
+
+    def __init__(self):
+        super().__init__()
+        self.rows = {'matched': array('q'), 'onlyInA': array('q'), 'onlyInB': array('q')}
+        self.diff_rows = {}
+
+    def add_matched(self, item: dict, index_a=None, index_b=None):
+        super().add_matched(item)
+        self.rows['matched'].append(index_a)
+        for diff in item['diffs']:
+            self.diff_rows.setdefault(diff['field'], array('q')).append(index_a)
+
+    def add_only_in_a(self, item: dict, index=None):
+        super().add_only_in_a(item)
+        self.rows['onlyInA'].append(index)
+
+    def add_only_in_b(self, item: dict, index=None):
+        super().add_only_in_b(item)
+        self.rows['onlyInB'].append(index)
+
+    def _emit(self, kind: str, item: dict):
+        pass
+
+    def result(self) -> dict:
+        return {'stats': self.stats()}
+
+
+def predicted_rows(sink: _RowSink) -> dict:
+    """{вид: номера строк}: onlyInA, onlyInB, matched и diff:<поле>."""
+    result = {kind: np.frombuffer(rows, dtype=np.int64) for kind, rows in sink.rows.items()}
+    for field, rows in sink.diff_rows.items():
+        result[f'diff:{field}'] = np.frombuffer(rows, dtype=np.int64)
+    return result
+
+
+def load_summary_rows(summary_dir: str) -> tuple:
+    """Номера строк из готовых страниц reconcile_summary.py -> (summary, {вид: номера})."""
+    with open(os.path.join(summary_dir, 'summary.json'), encoding='utf-8') as f:
+        summary = json.load(f)
+    rows = {'matched': [], 'onlyInA': [], 'onlyInB': []}
+    diff_rows = {}
+    for kind in rows:
+        for page in range(summary['pages'][kind]['count']):
+            with open(os.path.join(summary_dir, f'{kind}-{page}.json'), encoding='utf-8') as f:
+                for entry in json.load(f):
+                    if kind != 'matched':
+                        rows[kind].append(entry['index'])
+                        continue
+                    rows[kind].append(entry['indexA'])
+                    for diff in entry.get('diffs', []):
+                        diff_rows.setdefault(diff['field'], []).append(entry['indexA'])
+    result = {kind: np.array(values, dtype=np.int64) for kind, values in rows.items()}
+    for field, values in diff_rows.items():
+        result[f'diff:{field}'] = np.array(values, dtype=np.int64)
+    return summary, result
+
+
+def _rows_with_keys(path: str, column: str, keys: np.ndarray) -> np.ndarray:
+    """Номера строк CSV, у которых значение column входит в keys (чтение одной колонки кусками)."""
+    found = []
+    offset = 0
+    reader = pd.read_csv(path, sep=';', encoding='utf-8-sig', usecols=[column], dtype=str,
+                         keep_default_na=False, chunksize=KEY_CHUNK)
+    for chunk in reader:
+        found.append(np.flatnonzero(chunk[column].isin(keys).to_numpy()) + offset)
+        offset += len(chunk)
+    return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+
+class _Truth:
+    """Истинные строки выгрузок по термам SCORING; манифесты читаются по разу."""
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        self._manifests = {}
+
+    def manifest(self, generator: str) -> Manifest:
+        if generator not in self._manifests:
+            path = manifest_path(os.path.join(self.data_dir, GENERATORS[generator][2]))
+            if not os.path.exists(path):
+                raise FileNotFoundError(f'Нет манифеста {path}: перегенерируйте выгрузку {generator}')
+            self._manifests[generator] = Manifest.load(path)
+        return self._manifests[generator]
+
+    def rows(self, term: str, filename: str) -> np.ndarray:
+        """Строки файла filename, которые по терму должны попасть в вид результата."""
+        generator, _, anomaly = term.partition(':')
+        anomaly, _, column = anomaly.partition('@')
+        manifest = self.manifest(generator)
+        if anomaly not in manifest.names:
+            raise KeyError(f'В манифесте {generator} нет аномалии {anomaly}')
+        if column:
+            return _rows_with_keys(os.path.join(self.data_dir, filename), column, manifest.keys(anomaly, column))
+        if _FILE_GENERATORS.get(filename) != generator:
+            raise ValueError(f'{term}: строки аномалии относятся не к {filename} — укажите @колонку')
+        return manifest.rows(anomaly)
+
+
+def _score(predicted_bits: np.ndarray, truth_bits: np.ndarray) -> dict:
+    predicted = bitmap_count(predicted_bits)
+    truth = bitmap_count(truth_bits)
+    hits = bitmap_count(predicted_bits & truth_bits)
+    return {
+        'predicted': predicted,
+        'truth': truth,
+        'hits': hits,
+        'precision': round(hits / predicted, 4) if predicted else None,
+        'recall': round(hits / truth, 4) if truth else None,
+    }
+
+
+def score_rows(name: str, rows: dict, totals: tuple, truth: _Truth) -> dict:
+    """Precision/recall видов результата конфига name; rows — {вид: номера строк}, totals — (строк A, строк B)."""
+    spec = SUMMARY_CONFIGS[name]
+    matched_bits = to_bitmap(rows['matched'], totals[0])
+    scores = {}
+    for kind, terms in SCORING[name].items():
+        side = 1 if kind == 'onlyInB' else 0
+        filename = spec['fileB'] if side else spec['fileA']
+        truth_bits = to_bitmap(np.concatenate([truth.rows(term, filename) for term in terms]), totals[side])
+        if kind.startswith('diff:'):
+            truth_bits &= matched_bits
+        predicted = rows.get(kind, np.zeros(0, dtype=np.int64))
+        scores[kind] = dict(_score(to_bitmap(predicted, totals[side]), truth_bits), terms=terms)
+    return scores
+
+
+def score_config(name: str, data_dir=BASE_DIR) -> dict:
+    """Сверка по конфигу name на выгрузках data_dir и её оценка по манифестам."""
+    spec = SUMMARY_CONFIGS[name]
+    started = time.perf_counter()
+    sink = _RowSink()
+    stats = reconcile_files(os.path.join(data_dir, spec['fileA']), os.path.join(data_dir, spec['fileB']),
+                            spec['config'], sink=sink)['stats']
+    reconciled = time.perf_counter()
+    scores = score_rows(name, predicted_rows(sink), (stats['totalA'], stats['totalB']), _Truth(data_dir))
+    return {
+        'name': name,
+        'scores': scores,
+        'reconcile_seconds': round(reconciled - started, 3),
+        'score_seconds': round(time.perf_counter() - reconciled, 3),
+    }
+
+
+def score_summary(summary_dir: str, data_dir=BASE_DIR) -> dict:
+    """Оценка готовых итогов reconcile_summary.py (<out>/<config>/) без повторной сверки."""
+    started = time.perf_counter()
+    summary, rows = load_summary_rows(summary_dir)
+    stats = summary['stats']
+    scores = score_rows(summary['name'], rows, (stats['totalA'], stats['totalB']), _Truth(data_dir))
+    return {'name': summary['name'], 'scores': scores, 'score_seconds': round(time.perf_counter() - started, 3)}
+
+
+def _bench(n_rows: int, seed=42) -> dict:
+    """Время битовой оценки одного вида на n_rows строк: 1% истины, 90% найдено, 0.2% ложных."""
+    rng = np.random.default_rng(seed)
+    truth = np.flatnonzero(rng.random(n_rows) < 0.01)
+    predicted = np.union1d(truth[rng.random(len(truth)) < 0.9], np.flatnonzero(rng.random(n_rows) < 0.002))
+    started = time.perf_counter()
+    result = _score(to_bitmap(predicted, n_rows), to_bitmap(truth, n_rows))
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    result['rows'] = n_rows
+    return result
+
+
+def _print_scores(result: dict):
+    print(f'=== {result["name"]} ===')
+    for kind, s in result['scores'].items():
+        precision = '—' if s['precision'] is None else f'{s["precision"]:.3f}'
+        recall = '—' if s['recall'] is None else f'{s["recall"]:.3f}'
+        print(f'  {kind:<12} найдено {s["predicted"]:>7}, истина {s["truth"]:>7}, '
+              f'precision {precision}, recall {recall}')
+    timing = f'оценка {result["score_seconds"]:.3f} с'
+    if 'reconcile_seconds' in result:
+        timing = f'сверка {result["reconcile_seconds"]:.2f} с, ' + timing
+    print(f'  {timing}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Точность и полнота сверки по манифестам аномалий')
+    parser.add_argument('--configs', default=','.join(SCORING), help='конфиги через запятую')
+    parser.add_argument('--data-dir', default=BASE_DIR, help='каталог с CSV и манифестами')
+    parser.add_argument('--summary-dir', help='каталог итогов reconcile_summary.py вместо новой сверки')
+    parser.add_argument('--bench', type=int, default=0, help='только замер оценки на N синтетических строк')
+    parser.add_argument('-o', '--output', help='записать оценки в JSON')
+    args = parser.parse_args()
+
+    if args.bench:
+        r = _bench(args.bench)
+        print(f'{r["rows"]:,} строк: precision {r["precision"]:.4f}, recall {r["recall"]:.4f} за {r["seconds"]:.3f} с')
+        raise SystemExit
+
+    names = args.configs.split(',')
+    unknown = set(names) - set(SCORING)
+    if unknown:
+        parser.error(f'неизвестные конфиги: {", ".join(sorted(unknown))}')
+    try:
+        if args.summary_dir:
+            available = {os.path.basename(os.path.dirname(p)) for p in
+                         glob.glob(os.path.join(args.summary_dir, '*', 'summary.json'))}
+            results = [score_summary(os.path.join(args.summary_dir, name), args.data_dir)
+                       for name in names if name in available]
+        else:
+            results = [score_config(name, args.data_dir) for name in names]
+    except (FileNotFoundError, KeyError) as e:
+        # Манифесты в git не хранятся — на свежем checkout их ещё нет
+        parser.error(e.args[-1] if isinstance(e, KeyError) else str(e))
+    for result in results:
+        _print_scores(result)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,182 @@
+"""
+Готовые итоги сверки для страницы «Сверка данных».
+
+Сейчас страница по кнопке «Демо» скачивает CSV целиком, разбирает их
+и прогоняет reconcileData в браузере. Здесь та же сверка (reconcile.py)
+считается заранее для каждого поддерживаемого конфига и раскладывается
+в маленькие JSON:
+
+    <out>/<config>/summary.json      — stats (с topDiffFields), конфиг,
+                                        число записей и страниц по видам;
+    <out>/<config>/matched-0.json    — страницы по page_size записей:
+    <out>/<config>/onlyInA-0.json      номера строк в CSV и keyValue,
+    <out>/<config>/onlyInB-0.json      для matched — ещё status и diffs.
+
+summary.json хватает, чтобы сразу нарисовать дашборд; страницы
+подгружаются по мере прокрутки, а строки целиком берутся из CSV по номеру
+(0-based, пустые строки не считаются — как в Papa.parse с skipEmptyLines).
+Страницы пишутся по мере сверки, в памяти держится одна страница на вид.
+
+    python reconcile_summary.py                   # по public/demo-data/
+    python reconcile_summary.py --data-dir . --out-dir /tmp/summary
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+
+from reconcile import DEMO_CONFIG, _ResultSink, reconcile_files
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PUBLIC_DIR = os.path.join(os.path.dirname(BASE_DIR), 'public', 'demo-data')
+PAGE_SIZE = 500
+KINDS = ['matched', 'onlyInA', 'onlyInB']
+
+# Имя конфига -> файлы и конфиг reconcileData. billing-crm-inn — кнопка «Демо»
+SUMMARY_CONFIGS = {
+    'billing-crm-inn': {
+        'fileA': 'billing_q4_2025.csv',
+        'fileB': 'crm_clients.csv',
+        'config': DEMO_CONFIG,
+    },
+    'billing-crm-phone': {
+        'fileA': 'billing_q4_2025.csv',
+        'fileB': 'crm_clients.csv',
+        'config': {
+            'keyA': 'phone',
+            'keyB': 'phone',
+            'normalizeKey': 'phone',
+            'compareFields': [
+                {'fieldA': 'inn', 'fieldB': 'inn', 'mode': 'inn', 'tolerance': 0},
+            ],
+        },
+    },
+    'portal-billing-account': {
+        'fileA': 'portal_activity_q4_2025.csv',
+        'fileB': 'billing_q4_2025.csv',
+        'config': {
+            'keyA': 'account_number',
+            'keyB': 'account_number',
+            'normalizeKey': 'none',
+            'compareFields': [
+                {'fieldA': 'phone', 'fieldB': 'phone', 'mode': 'phone', 'tolerance': 0},
+            ],
+        },
+    },
+}
+
+
+class _SummarySink(_ResultSink):
+    """Пишет записи страницами по page_size в <out_dir>/<вид>-<номер>.json."""
+
+    def __init__(self, out_dir: str, page_size: int):
+        super().__init__()
+        self.out_dir = out_dir
+        self.page_size = page_size
+        self._pages = {kind: [] for kind in KINDS}
+        self.page_counts = {kind: 0 for kind in KINDS}
+
+    def add_matched(self, item: dict, index_a=None, index_b=None):
+        super().add_matched(item)
+        entry = {'keyValue': item['keyValue'], 'indexA': index_a, 'indexB': index_b, 'status': item['status']}
+        if item['diffs']:
+            entry['diffs'] = item['diffs']
+        self._add('matched', entry)
+
+    def add_only_in_a(self, item: dict, index=None):
+        super().add_only_in_a(item)
+        self._add('onlyInA', {'keyValue': item['keyValue'], 'index': index})
+
+    def add_only_in_b(self, item: dict, index=None):
+        super().add_only_in_b(item)
+        self._add('onlyInB', {'keyValue': item['keyValue'], 'index': index})
+
+    def _emit(self, kind: str, item: dict):
+        pass  # полные записи не копятся — на страницы идут компактные _add
+
+    def _add(self, kind: str, entry: dict):
+        page = self._pages[kind]
+        page.append(entry)
+        if len(page) >= self.page_size:
+            self._flush(kind)
+
+    def _flush(self, kind: str):
+        path = os.path.join(self.out_dir, f'{kind}-{self.page_counts[kind]}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self._pages[kind], f, ensure_ascii=False, separators=(',', ':'))
+        self.page_counts[kind] += 1
+        self._pages[kind] = []
+
+    def result(self) -> dict:
+        return {'stats': self.stats()}
+
+    def close(self):
+        for kind in KINDS:
+            if self._pages[kind]:
+                self._flush(kind)
+
+
+def write_summary(name: str, data_dir=PUBLIC_DIR, out_dir=None, page_size=PAGE_SIZE) -> dict:
+    """Сверка по конфигу name из SUMMARY_CONFIGS -> <out_dir>/<name>/; возвращает summary."""
+    spec = SUMMARY_CONFIGS[name]
+    if out_dir is None:
+        out_dir = os.path.join(data_dir, 'reconciliation')
+    target = os.path.join(out_dir, name)
+    # Страницы прошлого прогона могли быть длиннее — каталог конфига пишется заново
+    shutil.rmtree(target, ignore_errors=True)
+    os.makedirs(target)
+
+    sink = _SummarySink(target, page_size)
+    result = reconcile_files(os.path.join(data_dir, spec['fileA']), os.path.join(data_dir, spec['fileB']),
+                             spec['config'], sink=sink)
+    stats = result['stats']
+    summary = {
+        'name': name,
+        'fileA': spec['fileA'],
+        'fileB': spec['fileB'],
+        'config': spec['config'],
+        'stats': stats,
+        'pageSize': page_size,
+        'pages': {
+            kind: {'count': sink.page_counts[kind], 'items': stats[f'{kind}Count']}
+            for kind in KINDS
+        },
+    }
+    # summary.json — последним: если он есть, страницы уже на месте
+    with open(os.path.join(target, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def write_summaries(names=tuple(SUMMARY_CONFIGS), data_dir=PUBLIC_DIR, out_dir=None, page_size=PAGE_SIZE) -> list:
+    """Итоги по нескольким конфигам; конфиги без нужных CSV в data_dir пропускаются."""
+    summaries = []
+    for name in names:
+        spec = SUMMARY_CONFIGS[name]
+        if all(os.path.exists(os.path.join(data_dir, spec[f])) for f in ('fileA', 'fileB')):
+            summaries.append(write_summary(name, data_dir, out_dir, page_size))
+    return summaries
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Итоги сверки для фронтенда')
+    parser.add_argument('--configs', default=','.join(SUMMARY_CONFIGS), help='конфиги через запятую')
+    parser.add_argument('--data-dir', default=PUBLIC_DIR, help='каталог с CSV')
+    parser.add_argument('--out-dir', help='по умолчанию <data-dir>/reconciliation')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    args = parser.parse_args()
+
+    names = args.configs.split(',')
+    unknown = set(names) - set(SUMMARY_CONFIGS)
+    if unknown:
+        parser.error(f'неизвестные конфиги: {", ".join(sorted(unknown))}')
+
+    print('=== Итоги сверки ===')
+    started = time.perf_counter()
+    for summary in write_summaries(names, args.data_dir, args.out_dir, args.page_size):
+        stats = summary['stats']
+        print(f'{summary["name"]}: совпало {stats["matchedCount"]} (расхождения: {stats["matchedDiff"]}), '
+              f'только в A {stats["onlyInACount"]}, только в B {stats["onlyInBCount"]}')
+    print(f'Время: {time.perf_counter() - started:.2f} с')
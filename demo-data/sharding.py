@@ -0,0 +1,230 @@
+"""
+Шардированная генерация демо-данных на ProcessPoolExecutor.
+База клиентов делится на N шардов; каждый шард генерируется в отдельном
+процессе со своим seed, выведенным из (базовый seed, номер шарда), а результаты
+склеиваются в порядке шардов. Для заданных (seed, число шардов) вывод
+побайтово одинаков от запуска к запуску и не зависит от числа воркеров.
+С engine='counter' шард — диапазон позиций одной общей базы (см.
+counter_clients.py), так что сама база не зависит и от числа шардов.
+
+Аномалии с фиксированным количеством (сироты, дубли, prospects и т.п.)
+считаются на шард, поэтому их общее число растёт вместе с числом шардов.
+Дубли и prospects CRM нумеруются после всей базы клиентов, у каждого
+шарда — свой блок номеров, так что client_id в выгрузке не повторяются.
+Перемешивание строк CRM и ЛК тоже происходит внутри шарда.
+Манифесты аномалий шардов склеиваются со сдвигом номеров строк и пишутся
+рядом с выгрузкой (см. manifest.py).
+
+Запуск: python sharding.py billing --shards 8 --n-b2c 700000 --n-b2b 300000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import anomalies
+import gen_billing
+import gen_crm
+import gen_portal
+import name_pools
+from client_table import ClientTable
+from manifest import Manifest, manifest_path
+from shared_clients import generate_shared_clients
+
+# Меньше клиентов в шарде — и аномалии с фиксированным количеством (дубли CRM и т.п.) урезаются
+MIN_SHARD_CLIENTS = gen_crm.DUPLICATES
+
+OUTPUT_NAMES = {
+    'billing': 'billing_q4_2025.csv',
+    'crm': 'crm_clients.csv',
+    'portal': 'portal_activity_q4_2025.csv',
+}
+
+
+def shard_seed(seed: int, shard_id: int) -> int:
+    """Независимый seed шарда, детерминированно выведенный из базового."""
+    return int(np.random.SeedSequence([seed, shard_id]).generate_state(1)[0])
+
+
+def _split(total: int, n_shards: int, shard_id: int) -> int:
+    """Размер шарда shard_id при равномерном делении total на n_shards частей."""
+    return total // n_shards + (1 if shard_id < total % n_shards else 0)
+
+
+def check_shards(n_b2c: int, n_b2b: int, n_shards: int, min_size: int = MIN_SHARD_CLIENTS):
+    """ValueError, если при n_shards самый маленький шард получает меньше min_size клиентов."""
+    total = n_b2c + n_b2b
+    min_size = max(min_size, 1)
+    if n_shards < 1:
+        raise ValueError(f'Число шардов должно быть положительным: {n_shards}')
+    if total // n_shards < min_size:
+        raise ValueError(f'{n_shards} шардов на {total} клиентов: в шарде меньше {min_size} клиентов '
+                         f'(допустимо не больше {total // min_size} шардов)')
+
+
+def _shard_clients(n_b2c, n_b2b, seed, n_shards, shard_id, engine, valid_inn=False):
+    """Клиенты одного шарда (ClientTable); client_id сквозные по всем шардам.
+
+    engine='counter' — шард это диапазон позиций одной общей базы, поэтому
+    клиенты не зависят от числа шардов; остальные движки генерируют
+    каждый шард своим seed.
+    """
+    id_offset = sum(_split(n_b2c, n_shards, k) + _split(n_b2b, n_shards, k) for k in range(shard_id))
+    if engine == 'counter':
+        size = _split(n_b2c, n_shards, shard_id) + _split(n_b2b, n_shards, shard_id)
+        base = generate_shared_clients(n_b2c=n_b2c, n_b2b=n_b2b, seed=seed, engine=engine, valid_inn=valid_inn)
+        return ClientTable.from_records(base.clients_in_range(id_offset, id_offset + size))
+    return ClientTable.from_records(generate_shared_clients(
+        n_b2c=_split(n_b2c, n_shards, shard_id),
+        n_b2b=_split(n_b2b, n_shards, shard_id),
+        seed=shard_seed(seed, shard_id),
+        engine=engine,
+        id_offset=id_offset,
+        valid_inn=valid_inn,
+    ))
+
+
+def _shard_rows(kind: str, clients, crm_id_base=None):
+    """Строки, колонки, stats и манифест аномалий выгрузки kind для клиентов шарда.
+
+    crm_id_base — номер CLT-, после которого идут дубли и prospects CRM шарда.
+    """
+    manifest = Manifest()
+    if kind == 'billing':
+        stats = gen_billing._new_stats()
+        rows = list(gen_billing._billing_rows(clients.account_rows(), stats, manifest=manifest))
+        manifest.n_rows = len(rows)
+        return rows, gen_billing.BILLING_COLUMNS, stats, manifest
+    if kind == 'crm':
+        stats = gen_crm._new_stats()
+        rows = gen_crm._crm_rows(clients, stats, manifest, id_base=crm_id_base)
+        return rows, gen_crm.CRM_COLUMNS, stats, manifest
+    if kind == 'portal':
+        stats = gen_portal._new_stats()
+        return gen_portal._portal_rows(clients, stats, manifest), gen_portal.PORTAL_COLUMNS, stats, manifest
+    raise ValueError(f'Неизвестная выгрузка: {kind}')
+
+
+def shard_path(output_path: str, shard_id: int) -> str:
+    """Временный файл с телом CSV шарда shard_id рядом с выгрузкой."""
+    return f'{output_path}.shard-{shard_id}'
+
+
+def _shard_worker(kind, n_b2c, n_b2b, seed, n_shards, shard_id, engine, valid_inn=False, output_path=None):
+    """Генерирует шард в процессе-воркере и пишет тело CSV без заголовка в shard_path;
+    возвращает путь к нему, колонки, stats и манифест."""
+    clients = _shard_clients(n_b2c, n_b2b, seed, n_shards, shard_id, engine, valid_inn)
+    # generate_shared_clients пересеял random под клиентов — сеем строки шарда заново
+    random.seed(shard_seed(seed, shard_id))
+    name_pools.seed(shard_seed(seed, shard_id))
+    anomalies.seed(shard_seed(seed, shard_id))
+    # Настоящие клиенты — CLT-1..n_b2c+n_b2b, дальше блоки дублей и prospects по шардам
+    crm_id_base = n_b2c + n_b2b + shard_id * (gen_crm.DUPLICATES + gen_crm.PROSPECTS)
+    rows, columns, stats, manifest = _shard_rows(kind, clients, crm_id_base)
+    path = shard_path(output_path, shard_id)
+    pd.DataFrame(rows, columns=columns).to_csv(path, sep=';', index=False, header=False, encoding='utf-8',
+                                               lineterminator='\n')
+    return path, columns, stats, manifest
+
+
+def _shard_client_list(n_b2c, n_b2b, seed, n_shards, shard_id, engine, valid_inn=False) -> list:
+    clients = _shard_clients(n_b2c, n_b2b, seed, n_shards, shard_id, engine, valid_inn)
+    return [client.to_dict() for client in clients]
+
+
+def generate_clients_sharded(n_b2c=700, n_b2b=300, seed=42, n_shards=4, workers=None, engine='python',
+                             valid_inn=False) -> list:
+    """Общая база клиентов, собранная из n_shards независимых шардов."""
+    check_shards(n_b2c, n_b2b, n_shards, min_size=1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_shard_client_list, n_b2c, n_b2b, seed, n_shards, shard_id, engine, valid_inn)
+            for shard_id in range(n_shards)
+        ]
+        clients = []
+        for future in futures:
+            clients.extend(future.result())
+    return clients
+
+
+def generate_sharded(kind, n_b2c=700, n_b2b=300, seed=42, n_shards=4, workers=None,
+                     engine='python', output_path=None, valid_inn=False) -> dict:
+    """Генерирует выгрузку kind ('billing' | 'crm' | 'portal') по шардам.
+
+    Воркер пишет тело своего шарда во временный файл shard_path, а
+    родитель дописывает их в выгрузку строго по порядку shard_id и удаляет,
+    поэтому результат не зависит от того, какой воркер закончил первым; манифест аномалий
+    пишется рядом (manifest_path). Возвращает суммарные stats.
+    """
+    if kind not in OUTPUT_NAMES:
+        raise ValueError(f'Неизвестная выгрузка: {kind}')
+    check_shards(n_b2c, n_b2b, n_shards)
+    if output_path is None:
+        output_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), OUTPUT_NAMES[kind])
+
+    total_stats = {}
+    total_manifest = Manifest()
+    # Тела шардов лежат во временных файлах: в родителе — только манифесты и stats,
+    # память не растёт с размером выгрузки
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_shard_worker, kind, n_b2c, n_b2b, seed, n_shards, shard_id, engine, valid_inn,
+                            output_path)
+                for shard_id in range(n_shards)
+            ]
+            with open(output_path, 'wb') as f:
+                for shard_id in range(n_shards):
+                    path, columns, stats, manifest = futures[shard_id].result()
+                    futures[shard_id] = None
+                    if shard_id == 0:
+                        f.write((';'.join(columns) + '\n').encode('utf-8-sig'))
+                    with open(path, 'rb') as shard:
+                        shutil.copyfileobj(shard, f)
+                    os.remove(path)
+                    total_manifest.extend(manifest, total_manifest.n_rows)
+                    for key, value in stats.items():
+                        total_stats[key] = total_stats.get(key, 0) + value
+    finally:
+        for shard_id in range(n_shards):
+            if os.path.exists(shard_path(output_path, shard_id)):
+                os.remove(shard_path(output_path, shard_id))
+    total_manifest.save(manifest_path(output_path))
+    return total_stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Шардированная генерация демо-данных')
+    parser.add_argument('kind', choices=sorted(OUTPUT_NAMES))
+    parser.add_argument('--shards', type=int, default=os.cpu_count())
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--n-b2c', type=int, default=700)
+    parser.add_argument('--n-b2b', type=int, default=300)
+    parser.add_argument('--engine', choices=['python', 'vectorized', 'counter'], default='python')
+    parser.add_argument('--valid-inn', action='store_true', help='ИНН с верными контрольными цифрами')
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+    try:
+        check_shards(args.n_b2c, args.n_b2b, args.shards)
+    except ValueError as e:
+        parser.error(str(e))
+
+    started = time.perf_counter()
+    stats = generate_sharded(
+        args.kind, n_b2c=args.n_b2c, n_b2b=args.n_b2b, seed=args.seed, n_shards=args.shards,
+        workers=args.workers, engine=args.engine, output_path=args.output, valid_inn=args.valid_inn,
+    )
+    elapsed = time.perf_counter() - started
+
+    print(f'=== Шардированная генерация: {args.kind} ===')
+    print(f'Шардов: {args.shards}, seed: {args.seed}')
+    for key, value in stats.items():
+        print(f'  {key}: {value}')
+    print(f'Время: {elapsed:.1f} с')
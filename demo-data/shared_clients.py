@@ -4,13 +4,21 @@
 Используется как основа для gen_billing.py, gen_crm.py, gen_portal.py.
 """
 
+import argparse
+import math
 import os
-import pickle
 import random
+from contextlib import contextmanager
 from datetime import date, timedelta
-from faker import Faker
 
-fake = Faker('ru_RU')
+import numpy as np
+import pandas as pd
+
+from client_cache import cache_path as client_cache_path, open_client_cache, write_client_cache
+from identities import (
+    PHONE_CODES, random_account_number, random_b2b_email, random_b2c_email, random_inn, random_phone, transliterate,
+)
+from name_pools import load_name_pools
 
 REGIONS = {
     'Москва': '77',
@@ -36,91 +44,74 @@ B2B_DOMAINS = ['tech', 'group', 'pro', 'corp', 'biz', 'company', 'solutions']
 EMAIL_DOMAINS_B2C = ['mail.ru', 'yandex.ru', 'gmail.com', 'inbox.ru', 'bk.ru']
 
 
-def _generate_inn(is_b2b: bool) -> str:
-    length = 10 if is_b2b else 12
-    first_digit = str(random.randint(1, 9))
-    rest = ''.join([str(random.randint(0, 9)) for _ in range(length - 1)])
-    return first_digit + rest
-
-
-def _generate_phone() -> str:
-    code = random.choice(['903', '905', '906', '909', '910', '915', '916', '917', '925', '926', '950', '951', '960', '961', '980', '981'])
-    n1 = random.randint(100, 999)
-    n2 = random.randint(10, 99)
-    n3 = random.randint(10, 99)
-    return f'+7({code}){n1}-{n2}-{n3}'
-
-
-def _generate_account_number(region_code: str) -> str:
-    digits = ''.join([str(random.randint(0, 9)) for _ in range(7)])
-    return f'ЛС-{region_code}{digits}'
-
-
-def _transliterate(text: str) -> str:
-    mapping = {
-        'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
-        'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
-        'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
-        'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
-        'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
-    }
-    result = ''
-    for ch in text.lower():
-        result += mapping.get(ch, ch)
-    return result
-
-
-def _make_email_b2c(last_name: str) -> str:
-    domain = random.choice(EMAIL_DOMAINS_B2C)
-    translit = _transliterate(last_name)
-    suffix = random.randint(1, 999)
-    return f'{translit}{suffix}@{domain}'
-
-
-def _make_email_b2b(last_name: str, company_name: str) -> str:
-    translit_name = _transliterate(last_name)
+def _company_slug(company_name: str) -> str:
+    """Латинский slug компании для домена email."""
     # Извлечь "чистое" название компании
     clean = company_name
     for form in B2B_COMPANY_FORMS:
         clean = clean.replace(form, '').strip()
     clean = clean.strip(' "«»')
-    translit_company = _transliterate(clean).replace(' ', '').replace('-', '')
-    if not translit_company:
-        translit_company = 'company'
-    domain_suffix = random.choice(B2B_DOMAINS)
-    return f'{translit_name}@{translit_company}.{domain_suffix}'
+    translit_company = transliterate(clean).replace(' ', '').replace('-', '')
+    return translit_company or 'company'
+
+
+def generate_shared_clients(n_b2c=700, n_b2b=300, seed=42, engine='python', id_offset=0, valid_inn=False):
+    """Генерирует базу клиентов. Seed для воспроизводимости.
+
+    engine='python' — исходный построчный генератор на random (list of dict);
+    ФИО и слова компаний — выборки из словарей name_pools.py, сразу на всех.
+    engine='vectorized' — массивный движок на NumPy для миллионов клиентов
+    (см. vectorized_clients.py); возвращает ленивую последовательность dict'ов.
+    engine='counter' — каждый клиент вычисляется по (seed, позиции) через
+    Philox (см. counter_clients.py): client_at(i) и clients_in_range(a, b)
+    без генерации остальной базы.
+    Движки статистически эквивалентны, но не побайтово: у них разные ГСЧ.
+    id_offset сдвигает нумерацию client_id (для шардов, см. sharding.py).
+    valid_inn=True — ИНН с верными контрольными цифрами (см. identities.py);
+    остальные поля от этого не меняются.
+    """
+    if engine == 'vectorized':
+        from vectorized_clients import generate_vectorized_clients
+        return generate_vectorized_clients(n_b2c=n_b2c, n_b2b=n_b2b, seed=seed, id_offset=id_offset,
+                                           valid_inn=valid_inn)
+    if engine == 'counter':
+        from counter_clients import generate_counter_clients
+        return generate_counter_clients(n_b2c=n_b2c, n_b2b=n_b2b, seed=seed, id_offset=id_offset,
+                                        valid_inn=valid_inn)
+    if engine != 'python':
+        raise ValueError(f'Неизвестный движок генерации: {engine}')
 
-
-def generate_shared_clients(n_b2c=700, n_b2b=300, seed=42) -> list:
-    """Генерирует базу клиентов. Seed для воспроизводимости."""
     random.seed(seed)
-    Faker.seed(seed)
+    names_rng = np.random.default_rng(seed)
+    pools = load_name_pools(seed)
+    b2b_contacts = pools.full_names(names_rng, n_b2b)
+    ip_names = pools.short_names(names_rng, n_b2b, male=True)
+    company_words = pools.company_words(names_rng, n_b2b)
+    b2c_last, b2c_first, b2c_middle = pools.fio(names_rng, n_b2c)
 
     clients = []
-    client_counter = 0
+    client_counter = id_offset
 
     # --- B2B ---
-    for _ in range(n_b2b):
+    for i in range(n_b2b):
         client_counter += 1
         region_name = random.choice(list(REGIONS.keys()))
         region_code = REGIONS[region_name]
 
         form = random.choice(B2B_COMPANY_FORMS)
         if form == 'ИП':
-            raw_name = fake.last_name_male() + ' ' + fake.first_name_male()[0] + '.' + fake.middle_name_male()[0] + '.'
-            company_name = f'ИП {raw_name}'
+            company_name = f'ИП {ip_names[i]}'
         else:
-            company_word = fake.company().split(',')[0].split(' ')[-1]
-            company_name = f'{form} "{company_word}"'
+            company_name = f'{form} "{company_words[i]}"'
 
-        contact_name = fake.last_name() + ' ' + fake.first_name() + ' ' + fake.middle_name()
-        inn = _generate_inn(is_b2b=True)
-        phone = _generate_phone()
+        contact_name = b2b_contacts[i]
+        inn = random_inn(random, is_b2b=True, valid=valid_inn)
+        phone = random_phone(random)
 
         n_accounts = random.randint(1, 5)
-        accounts = [_generate_account_number(region_code) for _ in range(n_accounts)]
+        accounts = [random_account_number(random, region_code) for _ in range(n_accounts)]
 
-        email = _make_email_b2b(contact_name.split()[0], company_name)
+        email = random_b2b_email(random, contact_name.split()[0], _company_slug(company_name), B2B_DOMAINS)
         manager = random.choice(MANAGERS)
         tariff = random.choice(TARIFFS_B2B)
 
@@ -144,22 +135,20 @@ def generate_shared_clients(n_b2c=700, n_b2b=300, seed=42) -> list:
         })
 
     # --- B2C ---
-    for _ in range(n_b2c):
+    for i in range(n_b2c):
         client_counter += 1
         region_name = random.choice(list(REGIONS.keys()))
         region_code = REGIONS[region_name]
 
-        last_name = fake.last_name()
-        first_name = fake.first_name()
-        middle_name = fake.middle_name()
+        last_name, first_name, middle_name = b2c_last[i], b2c_first[i], b2c_middle[i]
         contact_name = f'{last_name} {first_name} {middle_name}'
 
-        inn = _generate_inn(is_b2b=False)
-        phone = _generate_phone()
-        email = _make_email_b2c(last_name)
+        inn = random_inn(random, is_b2b=False, valid=valid_inn)
+        phone = random_phone(random)
+        email = random_b2c_email(random, last_name, EMAIL_DOMAINS_B2C)
         tariff = random.choice(TARIFFS_B2C)
 
-        account = _generate_account_number(region_code)
+        account = random_account_number(random, region_code)
 
         start_date = date(2019, 1, 1)
         end_date = date(2025, 6, 30)
@@ -184,27 +173,157 @@ def generate_shared_clients(n_b2c=700, n_b2b=300, seed=42) -> list:
     return clients
 
 
-def get_or_create_clients(cache_dir=None) -> list:
-    """Загружает из кэша или генерирует заново."""
+@contextmanager
+def _preserved_random_state():
+    """Генерация базы пересеивает random — вернуть его состояние вызывающему."""
+    state = random.getstate()
+    try:
+        yield
+    finally:
+        random.setstate(state)
+
+
+def get_or_create_clients(cache_dir=None, n_b2c=700, n_b2b=300, seed=42, engine='python', valid_inn=False):
+    """Открывает кэш базы для этих параметров или генерирует и кэширует её.
+
+    Кэш колоночный и memory-mapped (см. client_cache.py), ключ — параметры
+    генерации и версия формата. Генерация при промахе кэша не сдвигает
+    random вызывающего генератора: выгрузки не зависят от того, был ли кэш.
+    """
     if cache_dir is None:
         cache_dir = os.path.dirname(os.path.abspath(__file__))
-    cache_path = os.path.join(cache_dir, 'shared_clients.pkl')
+    params = {'n_b2c': n_b2c, 'n_b2b': n_b2b, 'seed': seed, 'engine': engine}
+    if valid_inn:
+        # Только при True: ключи кэшей с обычными ИНН остаются прежними
+        params['valid_inn'] = True
+
+    clients = open_client_cache(cache_dir, params)
+    if clients is None:
+        with _preserved_random_state():
+            generated = generate_shared_clients(**params)
+        clients = write_client_cache(cache_dir, params, generated)
+    return clients
 
-    if os.path.exists(cache_path):
-        with open(cache_path, 'rb') as f:
-            return pickle.load(f)
 
-    clients = generate_shared_clients()
-    with open(cache_path, 'wb') as f:
-        pickle.dump(clients, f)
-    return clients
+# Уровень значимости проверок эквивалентности движков
+CHECK_ALPHA = 0.001
+
+
+def _chi2_p_value(chi2: float, df: int) -> float:
+    """P(χ²(df) > chi2) по приближению Уилсона-Хилферти (scipy не нужен)."""
+    if df <= 0:
+        return 1.0
+    z = ((chi2 / df) ** (1 / 3) - (1 - 2 / (9 * df))) / math.sqrt(2 / (9 * df))
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def _chi2_test(a, b) -> tuple:
+    """χ² однородности двух выборок категорий: (статистика, p-value)."""
+    table = pd.crosstab(np.repeat([0, 1], [len(a), len(b)]), np.concatenate([a, b])).to_numpy(dtype=np.float64)
+    expected = table.sum(axis=1, keepdims=True) * table.sum(axis=0, keepdims=True) / table.sum()
+    chi2 = float(((table - expected) ** 2 / expected).sum())
+    return chi2, _chi2_p_value(chi2, table.shape[1] - 1)
+
+
+def _ks_test(a, b) -> tuple:
+    """Двухвыборочный критерий Колмогорова-Смирнова: (D, асимптотическое p-value)."""
+    a, b = np.sort(a), np.sort(b)
+    grid = np.concatenate([a, b])
+    d = float(np.abs(np.searchsorted(a, grid, side='right') / len(a)
+                     - np.searchsorted(b, grid, side='right') / len(b)).max())
+    ne = math.sqrt(len(a) * len(b) / (len(a) + len(b)))
+    lam = (ne + 0.12 + 0.11 / ne) * d
+    if lam < 0.2:
+        return d, 1.0
+    p = 2 * sum((-1) ** (k - 1) * math.exp(-2 * k * k * lam * lam) for k in range(1, 101))
+    return d, min(max(p, 0.0), 1.0)
+
+
+def _engine_frame(clients) -> pd.DataFrame:
+    """Поля базы, по которым сравниваются движки."""
+    rows = [(c['segment'], c['region'], c['tariff'], len(c['accounts']), len(c['inn']), c['inn'][0], c['inn'][5],
+             PHONE_CODES.index(c['phone'][3:6]), c['manager'], c['contract_date'])
+            for c in clients]
+    df = pd.DataFrame(rows, columns=['segment', 'region', 'tariff', 'accounts', 'inn_length', 'inn_digit0',
+                                     'inn_digit5', 'phone_code', 'manager', 'contract_date'])
+    df['contract_date'] = pd.to_datetime(df['contract_date']).to_numpy().astype('datetime64[D]').astype(np.int64)
+    return df
+
+
+def check_engines(n_b2c=70_000, n_b2b=30_000, seed=42, engines=('python', 'vectorized', 'counter'),
+                  alpha=CHECK_ALPHA) -> list:
+    """Статистическая эквивалентность движков: каждый из engines[1:] против engines[0].
+
+    По сегментам сравниваются регион, тариф, число счетов на клиента, длина ИНН,
+    его первая и шестая цифры, код оператора телефона и (у B2B) менеджер
+    (χ² однородности), дата договора (Колмогоров-Смирнов и диапазон дат);
+    число клиентов в сегментах должно совпадать точно. Движки тянут разные
+    ГСЧ, поэтому совпадают распределения, а не значения. Возвращает список
+    проверок {'engine', 'check', 'statistic', 'p_value', 'ok'} (у точных проверок
+    statistic и p_value — None).
+    """
+    from vectorized_clients import B2B_CONTRACT_RANGE, B2C_CONTRACT_RANGE
+
+    reference = _engine_frame(generate_shared_clients(n_b2c=n_b2c, n_b2b=n_b2b, seed=seed, engine=engines[0]))
+    ranges = {'B2B': B2B_CONTRACT_RANGE, 'B2C': B2C_CONTRACT_RANGE}
+    results = []
+    for engine in engines[1:]:
+        other = _engine_frame(generate_shared_clients(n_b2c=n_b2c, n_b2b=n_b2b, seed=seed, engine=engine))
+
+        def add(check, statistic=None, p_value=None, ok=None):
+            results.append({'engine': engine, 'check': check, 'statistic': statistic, 'p_value': p_value,
+                            'ok': p_value >= alpha if ok is None else ok})
+
+        counts = (reference['segment'].value_counts().to_dict(), other['segment'].value_counts().to_dict())
+        add('segment: клиентов в сегментах', ok=counts[0] == counts[1] == {'B2B': n_b2b, 'B2C': n_b2c})
+        for segment, (start, end) in ranges.items():
+            a, b = reference[reference['segment'] == segment], other[other['segment'] == segment]
+            if not len(a) or not len(b):
+                continue
+            columns = ['region', 'tariff', 'accounts', 'inn_length', 'inn_digit0', 'inn_digit5', 'phone_code']
+            if segment == 'B2B':
+                columns.append('manager')
+            for column in columns:
+                add(f'{column} {segment}', *_chi2_test(a[column].to_numpy(), b[column].to_numpy()))
+            add(f'contract_date {segment}', *_ks_test(a['contract_date'].to_numpy(), b['contract_date'].to_numpy()))
+            bounds = np.array([start.isoformat(), end.isoformat()], dtype='datetime64[D]').astype(np.int64)
+            inside = all(bounds[0] <= df['contract_date'].min() and df['contract_date'].max() <= bounds[1]
+                         for df in (a, b))
+            add(f'contract_date {segment}: в {start}..{end}', ok=inside)
+    return results
 
 
 if __name__ == '__main__':
-    clients = generate_shared_clients()
-    cache_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shared_clients.pkl')
-    with open(cache_path, 'wb') as f:
-        pickle.dump(clients, f)
+    parser = argparse.ArgumentParser(description='Общая база клиентов')
+    parser.add_argument('--check', action='store_true', help='проверить статистическую эквивалентность движков')
+    parser.add_argument('--engines', default='python,vectorized,counter',
+                        help='движки для --check через запятую, первый — эталон')
+    parser.add_argument('--n-b2c', type=int, default=None)
+    parser.add_argument('--n-b2b', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if args.check:
+        engines = args.engines.split(',')
+        unknown = sorted(set(engines) - {'python', 'vectorized', 'counter'})
+        if len(engines) < 2 or unknown:
+            parser.error('--engines: не меньше двух из python, vectorized, counter')
+        n_b2c = 70_000 if args.n_b2c is None else args.n_b2c
+        n_b2b = 30_000 if args.n_b2b is None else args.n_b2b
+        results = check_engines(n_b2c=n_b2c, n_b2b=n_b2b, seed=args.seed, engines=engines)
+        print(f'=== Эквивалентность движков: {n_b2c:,} B2C + {n_b2b:,} B2B, эталон {engines[0]}, '
+              f'α = {CHECK_ALPHA} ===')
+        for r in results:
+            test = '' if r['p_value'] is None else f'статистика {r["statistic"]:<10.4g} p = {r["p_value"]:.4f}'
+            print(f'  {"OK  " if r["ok"] else "FAIL"} {r["engine"]:<10} {r["check"]:<42} {test}'.rstrip())
+        failed = sum(not r['ok'] for r in results)
+        print(f'Проверок: {len(results)}, не пройдено: {failed}')
+        raise SystemExit(1 if failed else 0)
+
+    cache_dir = os.path.dirname(os.path.abspath(__file__))
+    params = {'n_b2c': args.n_b2c or 700, 'n_b2b': args.n_b2b or 300, 'seed': args.seed, 'engine': 'python'}
+    clients = write_client_cache(cache_dir, params, generate_shared_clients(**params))
+    cache_path = client_cache_path(cache_dir, params)
 
     b2b = [c for c in clients if c['segment'] == 'B2B']
     b2c = [c for c in clients if c['segment'] == 'B2C']